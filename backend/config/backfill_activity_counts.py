@@ -0,0 +1,93 @@
+"""Fill emotion_history.recommendations_count for rows written before the column existed.
+
+init_database adds the column with NULL for existing rows; the activity
+feed counts those rows' recommendations on read until this tool has
+stored their counts. New rows start at 0 and are incremented when
+recommendations are saved for them.
+
+Rows are processed by id range, --batch-size ids per transaction, so the
+API keeps writing while it runs. It is safe to re-run or interrupt; only
+rows still NULL are touched.
+
+--check compares every stored count with music_recommendations and
+reports the rows that differ (exit status 1 if any).
+
+Usage (from the repository root, with the same DB settings as the app):
+    python -m backend.config.backfill_activity_counts
+    python -m backend.config.backfill_activity_counts --batch-size 5000
+    python -m backend.config.backfill_activity_counts --check
+"""
+import argparse
+import sys
+
+from backend.config.database import get_db_connection, init_database
+from backend.persistence import activity
+
+
+def backfill(batch_size=10000):
+    # Adds the column (and the emotion_history_id index) if they do not exist yet
+    init_database()
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT MIN(id), MAX(id) FROM emotion_history WHERE recommendations_count IS NULL")
+        first, last = cursor.fetchone()
+        if first is None:
+            print("Nothing to backfill")
+            return
+
+        updated = 0
+        for start in range(first, last + 1, batch_size):
+            updated += activity.backfill_counts(cursor, start, start + batch_size - 1)
+            connection.commit()
+            print(f"  ids up to {min(start + batch_size - 1, last)}/{last}: {updated} rows filled")
+
+        print("Backfill complete!")
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def check():
+    """Number of rows whose stored recommendations_count differs from music_recommendations"""
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(
+            """SELECT eh.id, eh.recommendations_count, COUNT(mr.id)
+               FROM emotion_history eh
+               LEFT JOIN music_recommendations mr ON mr.emotion_history_id = eh.id
+               WHERE eh.recommendations_count IS NOT NULL
+               GROUP BY eh.id, eh.recommendations_count
+               HAVING eh.recommendations_count <> COUNT(mr.id)"""
+        )
+        mismatched = cursor.fetchall()
+        for history_id, stored, expected in mismatched:
+            print(f"  emotion_history {history_id}: stored {stored}, expected {expected}")
+        print(f"{len(mismatched)} mismatched rows")
+        return len(mismatched)
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill emotion_history.recommendations_count')
+    parser.add_argument('--batch-size', type=int, default=10000, help='emotion_history ids per transaction')
+    parser.add_argument('--check', action='store_true', help='Only report rows whose stored count differs')
+    args = parser.parse_args()
+
+    if args.check:
+        if check():
+            sys.exit(1)
+        return
+    backfill(args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
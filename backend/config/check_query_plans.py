@@ -0,0 +1,153 @@
+"""Check the query plans of the activity feed against a real database.
+
+Runs the same functions the API uses (backend.persistence.activity,
+backend.persistence.rollups) through a cursor that EXPLAINs each
+statement instead of executing it, for a sample user, and fails when a
+plan regresses:
+
+    - a full table scan (type ALL)
+    - a key other than the expected index
+    - a temporary table or filesort (e.g. a JOIN + GROUP BY over all of
+      a user's history creeping back into the page query)
+
+Exit status is 1 if any check fails, so it can run after migrations
+against a production-sized database. tests/test_query_plans.py runs the
+same checks automatically against a seeded scratch database.
+
+Usage (from the repository root, with the same DB settings as the app):
+    python -m backend.config.check_query_plans
+    python -m backend.config.check_query_plans --user-id 42 --verbose
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from backend.config.database import get_db_connection
+from backend.persistence import activity, rollups
+from backend.persistence.pagination import PageCursor
+
+# Extra notes that mean the query reads more than the rows it returns
+FORBIDDEN_EXTRA = ('Using temporary', 'Using filesort')
+
+
+class ExplainCursor:
+    """Cursor stand-in that records EXPLAIN output for every statement and returns no rows"""
+
+    description = None
+    rowcount = 0
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.plans = []
+
+    def execute(self, sql, params=()):
+        self.cursor.execute('EXPLAIN ' + sql, params)
+        self.plans.append((sql, self.cursor.fetchall()))
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+
+def sample(cursor, user_id=None):
+    """(user_id, a few of its emotion_history rows) to build realistic parameters from"""
+    if user_id is None:
+        cursor.execute("SELECT user_id FROM emotion_history ORDER BY id DESC LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            raise Exception('emotion_history is empty; seed the database first')
+        user_id = row['user_id']
+    cursor.execute(
+        "SELECT id, created_at FROM emotion_history WHERE user_id = %s ORDER BY created_at DESC, id DESC LIMIT 20",
+        (user_id,)
+    )
+    return user_id, cursor.fetchall()
+
+
+def checks(user_id, rows):
+    """(name, call(cursor), {table: acceptable keys}) for every hot query"""
+    middle = rows[len(rows) // 2] if rows else {'created_at': datetime.now(), 'id': 0}
+    history_ids = [row['id'] for row in rows] or [0]
+    now = datetime.now()
+    return [
+        ('activity first page', lambda c: activity.activity_page(c, user_id, 20),
+         {'emotion_history': ('idx_user_created',)}),
+        ('activity next page', lambda c: activity.activity_page(c, user_id, 20, PageCursor.from_row(middle, 'next')),
+         {'emotion_history': ('idx_user_created',)}),
+        ('activity previous page', lambda c: activity.activity_page(c, user_id, 20, PageCursor.from_row(middle, 'prev')),
+         {'emotion_history': ('idx_user_created',)}),
+        ('recommendation counts for a page', lambda c: activity.recommendation_counts(c, history_ids),
+         # Older tables may have the index InnoDB created for the foreign key instead
+         {'music_recommendations': ('idx_emotion_history', 'emotion_history_id')}),
+        ('mood timeline (day, 30 days)', lambda c: rollups.timeline(c, user_id, 'day', now - timedelta(days=30), now),
+         {'emotion_rollups': ('PRIMARY',)}),
+    ]
+
+
+def problems(plan, expected):
+    """Why an EXPLAIN result is not acceptable (empty list if it is)"""
+    found = []
+    for row in plan:
+        table, extra = row['table'], row.get('Extra') or ''
+        if row['type'] == 'ALL':
+            found.append(f"full scan of {table}")
+        if table in expected and row['key'] not in expected[table]:
+            found.append(f"{table} uses key {row['key']} instead of {' or '.join(expected[table])}")
+        found.extend(f"{table}: {note}" for note in FORBIDDEN_EXTRA if note in extra)
+    return found
+
+
+def explain_all(cursor, user_id, rows):
+    """[(name, problems, [(sql, plan)])] for every check, EXPLAINed through a dictionary cursor"""
+    results = []
+    for name, call, expected in checks(user_id, rows):
+        explain = ExplainCursor(cursor)
+        call(explain)
+        found = [problem for _, plan in explain.plans for problem in problems(plan, expected)]
+        results.append((name, found, explain.plans))
+    return results
+
+
+def run(user_id=None, verbose=False):
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    failed = 0
+
+    try:
+        user_id, rows = sample(cursor, user_id)
+        print(f"Checking query plans for user {user_id}")
+        results = explain_all(cursor, user_id, rows)
+        for name, found, plans in results:
+            print(f"  {'FAIL' if found else 'ok':>4}  {name}")
+            for problem in found:
+                print(f"        {problem}")
+            if verbose or found:
+                for sql, plan in plans:
+                    print('        ' + ' '.join(sql.split()))
+                    for row in plan:
+                        print(f"          {row['table']}: type={row['type']} key={row['key']} "
+                              f"rows={row['rows']} extra={row.get('Extra')}")
+            failed += bool(found)
+
+        print(f"{failed} of {len(results)} checks failed")
+        return failed
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN the activity feed queries and fail on plan regressions')
+    parser.add_argument('--user-id', type=int, help='User to build the queries for (default: most recent detection)')
+    parser.add_argument('--verbose', action='store_true', help='Print every plan, not only failing ones')
+    args = parser.parse_args()
+
+    if run(args.user_id, args.verbose):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
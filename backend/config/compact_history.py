@@ -0,0 +1,89 @@
+"""Delete old emotion_history rows once their counts live in the rollups.
+
+Every detection is added to emotion_rollups (hour and day buckets) when it
+is written, so raw rows older than the retention period only serve the
+history/activity listings. This tool:
+
+    1. moves the compaction watermark (history_compaction) to midnight
+       --older-than-days ago; statistics rebuilds count everything before
+       it from the rollups from then on
+    2. deletes the raw rows before the watermark in batches of --batch-size,
+       one transaction each (recommendations keep their row with
+       emotion_history_id set to NULL)
+
+--rebuild-rollups first recomputes the rollups after the current watermark
+from the raw rows (e.g. after restoring a backup of emotion_history).
+
+It is safe to re-run or interrupt; the watermark never moves backwards.
+
+Usage (from the repository root, with the same DB settings as the app):
+    python -m backend.config.compact_history --older-than-days 180
+    python -m backend.config.compact_history --dry-run
+    python -m backend.config.compact_history --rebuild-rollups --older-than-days 365
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+
+from backend.config.database import get_db_connection, init_database
+from backend.persistence import rollups
+
+# Raw detections kept for the history and activity listings
+HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', 180))
+
+
+def compact(older_than_days=HISTORY_RETENTION_DAYS, batch_size=10000, rebuild_rollups=False, dry_run=False):
+    # Creates the rollup tables (and backfills them) if they do not exist yet
+    init_database()
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        if rebuild_rollups:
+            print(f"Rebuilding rollups after {rollups.compacted_before(cursor)}...")
+            rollups.rebuild(cursor)
+            connection.commit()
+
+        # Midnight, so no hour or day bucket is split by the watermark
+        cutoff = rollups.bucket_start(datetime.now() - timedelta(days=older_than_days), 'day')
+        cursor.execute("SELECT COUNT(*) FROM emotion_history WHERE created_at < %s", (cutoff,))
+        pending = cursor.fetchone()[0]
+        print(f"{pending} emotion_history rows before {cutoff}")
+        if dry_run or not pending:
+            return
+
+        rollups.set_compacted_before(cursor, cutoff)
+        connection.commit()
+
+        deleted = 0
+        while True:
+            cursor.execute("DELETE FROM emotion_history WHERE created_at < %s LIMIT %s", (cutoff, batch_size))
+            connection.commit()
+            if cursor.rowcount == 0:
+                break
+            deleted += cursor.rowcount
+            print(f"  {deleted}/{pending} rows deleted")
+
+        print("Compaction complete!")
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact old emotion_history rows into the rollups')
+    parser.add_argument('--older-than-days', type=int, default=HISTORY_RETENTION_DAYS,
+                        help='Keep raw rows for this many days')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Rows deleted per transaction')
+    parser.add_argument('--rebuild-rollups', action='store_true',
+                        help='Recompute the rollups after the current watermark first')
+    parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be deleted')
+    args = parser.parse_args()
+
+    compact(args.older_than_days, args.batch_size, args.rebuild_rollups, args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,8 @@
 import mysql.connector
-from mysql.connector import pooling
 import os
 from dotenv import load_dotenv
+from backend.config.db_pool import ConnectionPool
+from backend.persistence import rollups, user_stats
 
 load_dotenv()
 
@@ -14,20 +15,95 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME', 'emotune')
 }
 
-# Connection pool
-connection_pool = pooling.MySQLConnectionPool(
-    pool_name="emotune_pool",
-    pool_size=5,
-    pool_reset_session=True,
-    **DB_CONFIG
+# Connection pool: connections kept open, extra ones opened under load, and seconds a
+# checkout waits for a free connection before failing
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+# Reset session state on every return (one extra round trip); when off, only an
+# open transaction is rolled back
+DB_POOL_RESET_SESSION = os.getenv('DB_POOL_RESET_SESSION', 'true').lower() in ('1', 'true', 'yes', 'on')
+
+# consume_results: a cursor left with unread rows must not break the next user of the connection
+connection_pool = ConnectionPool(
+    lambda: mysql.connector.connect(consume_results=True, **DB_CONFIG),
+    size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_MAX_OVERFLOW,
+    timeout=DB_POOL_TIMEOUT,
+    reset_session=DB_POOL_RESET_SESSION,
+    name='emotune'
 )
 
+# Indexes added to tables created before they were part of the schema: (table, name, columns)
+INDEXES = [
+    # Keyset pagination of history and activity (user_id, then newest first)
+    ('emotion_history', 'idx_user_created', ('user_id', 'created_at', 'id')),
+    ('music_recommendations', 'idx_user_created', ('user_id', 'created_at', 'id')),
+    # Recommendation counts per detection (activity feed, recommendations_count backfill)
+    ('music_recommendations', 'idx_emotion_history', ('emotion_history_id',)),
+]
+
 def get_db_connection():
-    """Get a connection from the pool"""
-    return connection_pool.get_connection()
+    """Get a connection from the pool (inside a request, the same one until the request ends)"""
+    return connection_pool.connection()
+
+def ensure_indexes(cursor):
+    """Add any index from INDEXES that an existing table is missing.
+
+    An index is also considered present when another one starts with the
+    same columns (e.g. the one InnoDB creates for a foreign key).
+    """
+    for table, name, columns in INDEXES:
+        cursor.execute(
+            """SELECT index_name, GROUP_CONCAT(column_name ORDER BY seq_in_index) FROM information_schema.statistics
+               WHERE table_schema = %s AND table_name = %s
+               GROUP BY index_name""",
+            (DB_CONFIG['database'], table)
+        )
+        existing = {index_name: tuple(index_columns.split(',')) for index_name, index_columns in cursor.fetchall()}
+        if name in existing or any(index_columns[:len(columns)] == columns for index_columns in existing.values()):
+            continue
+        print(f"Adding index {name} ({', '.join(columns)}) to {table}...")
+        cursor.execute(f"ALTER TABLE {table} ADD INDEX {name} ({', '.join(columns)})")
+
+def ensure_recommendations_count(cursor):
+    """Add emotion_history.recommendations_count to tables created before it existed.
+
+    Existing rows are left NULL (counted on read until
+    backend.config.backfill_activity_counts fills them); new rows start at 0.
+    """
+    cursor.execute(
+        """SELECT COUNT(*) FROM information_schema.columns
+           WHERE table_schema = %s AND table_name = 'emotion_history' AND column_name = 'recommendations_count'""",
+        (DB_CONFIG['database'],)
+    )
+    if cursor.fetchone()[0] == 0:
+        print("Adding recommendations_count to emotion_history...")
+        cursor.execute("ALTER TABLE emotion_history ADD COLUMN recommendations_count INT NULL")
+        cursor.execute("ALTER TABLE emotion_history ALTER COLUMN recommendations_count SET DEFAULT 0")
 
-def init_database():
-    """Initialize database tables"""
+def check_tracks_migrated(cursor):
+    """Refuse to run on a music_recommendations table that still has the per-row track columns.
+
+    The API writes only track_id (details live in tracks); on the old layout
+    every insert would fail on track_name NOT NULL, so fail at startup instead.
+    """
+    cursor.execute(
+        """SELECT COUNT(*) FROM information_schema.columns
+           WHERE table_schema = %s AND table_name = 'music_recommendations' AND column_name = 'track_name'""",
+        (DB_CONFIG['database'],)
+    )
+    if cursor.fetchone()[0]:
+        raise Exception("music_recommendations still has the old track detail columns (track_name, ...). "
+                        "Run 'python -m backend.config.migrate_tracks' before starting the API.")
+
+def init_database(require_tracks_migrated=True):
+    """Initialize database tables
+
+    With require_tracks_migrated (the default, used by the API) an old
+    music_recommendations layout raises instead of starting; migrate_tracks
+    passes False so it can create the catalog and then migrate.
+    """
     connection = get_db_connection()
     cursor = connection.cursor()
     
@@ -55,31 +131,106 @@ def init_database():
                 image_path VARCHAR(500),
                 detection_type ENUM('image', 'webcam') DEFAULT 'webcam',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                recommendations_count INT NULL DEFAULT 0,
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_id (user_id),
+                INDEX idx_user_created (user_id, created_at, id),
                 INDEX idx_created_at (created_at)
             )
         """)
+        ensure_recommendations_count(cursor)
+        
+        # Track catalog: one row per track, shared by every recommendation of it
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                track_id VARCHAR(64) PRIMARY KEY,
+                name VARCHAR(500) NOT NULL,
+                artist VARCHAR(500),
+                album VARCHAR(500),
+                preview_url TEXT,
+                spotify_url TEXT,
+                image_url TEXT,
+                duration_ms INT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
         
-        # Music recommendations table
+        # Music recommendations table (track details live in tracks, see migrate_tracks for old tables)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS music_recommendations (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 user_id INT NOT NULL,
                 emotion_history_id INT,
-                track_name VARCHAR(500) NOT NULL,
-                artist_name VARCHAR(500),
-                track_id VARCHAR(255),
-                album_name VARCHAR(500),
-                preview_url TEXT,
-                spotify_url TEXT,
-                image_url TEXT,
+                track_id VARCHAR(64) NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
                 FOREIGN KEY (emotion_history_id) REFERENCES emotion_history(id) ON DELETE SET NULL,
-                INDEX idx_user_id (user_id)
+                FOREIGN KEY (track_id) REFERENCES tracks(track_id),
+                INDEX idx_user_created (user_id, created_at, id),
+                INDEX idx_emotion_history (emotion_history_id)
             )
         """)
+        if require_tracks_migrated:
+            check_tracks_migrated(cursor)
+        
+        # ID blocks handed out to the API so rows can get their id before they are written
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS id_sequences (
+                name VARCHAR(64) PRIMARY KEY,
+                next_id BIGINT NOT NULL
+            )
+        """)
+        
+        # Hour/day emotion counts per user, updated with every history insert (see backend.persistence.rollups)
+        cursor.execute("SHOW TABLES LIKE 'emotion_rollups'")
+        backfill_rollups = cursor.fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS emotion_rollups (
+                user_id INT NOT NULL,
+                granularity ENUM('hour', 'day') NOT NULL,
+                bucket_start DATETIME NOT NULL,
+                emotion VARCHAR(50) NOT NULL,
+                detections INT NOT NULL DEFAULT 0,
+                confidence_sum DOUBLE NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, granularity, bucket_start, emotion),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        """)
+        # emotion_history rows before compacted_before were deleted by compact_history (rollups keep their counts)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS history_compaction (
+                id TINYINT PRIMARY KEY,
+                compacted_before DATETIME NOT NULL
+            )
+        """)
+        if backfill_rollups:
+            print("Computing emotion rollups from existing history...")
+            rollups.rebuild(cursor)
+        
+        # Per-user aggregates, updated with every history/recommendation insert (see backend.persistence.user_stats)
+        cursor.execute("SHOW TABLES LIKE 'user_stats'")
+        backfill_stats = cursor.fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_stats (
+                user_id INT PRIMARY KEY,
+                total_detections INT NOT NULL DEFAULT 0,
+                total_recommendations INT NOT NULL DEFAULT 0,
+                last_detected_at TIMESTAMP NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_emotion_counts (
+                user_id INT NOT NULL,
+                emotion VARCHAR(50) NOT NULL,
+                detections INT NOT NULL DEFAULT 0,
+                last_detected_at TIMESTAMP NULL,
+                PRIMARY KEY (user_id, emotion),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        """)
+        if backfill_stats:
+            print("Computing user statistics from existing history...")
+            user_stats.rebuild(cursor)
         
         # User sessions table (for tracking active sessions)
         cursor.execute("""
@@ -95,6 +246,8 @@ def init_database():
             )
         """)
         
+        ensure_indexes(cursor)
+        
         connection.commit()
         print("Database tables initialized successfully!")
         
@@ -0,0 +1,291 @@
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context
+
+# Number of recent checkouts / queries kept for wait-time and latency percentiles
+LATENCY_SAMPLE_SIZE = 1000
+# Idle connections unused for longer than this are pinged before being handed out
+IDLE_PING_SECONDS = 30
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool's timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of database connections with overflow and bounded waits.
+
+    Up to size connections are kept open once created (lazily, so importing
+    the app does not need the database); up to max_overflow more are opened
+    under load and closed again when returned. When all of them are checked
+    out, callers wait (first come, first served) up to timeout seconds for
+    one to be returned and then get PoolTimeout, instead of failing right
+    away.
+
+    Inside a Flask request, connection() hands out the same connection for
+    the whole request: close() on it is a no-op and the connection goes back
+    when the request is torn down (init_app), even if the handler raised
+    before closing it. Outside requests (background writers, CLI tools)
+    every connection() is its own checkout and close() returns it.
+
+    On return the session is reset (reset_session=True, a round trip per
+    checkout) or, when skipped, only an open transaction is rolled back.
+    Checkout waits, utilization and query latency are recorded for stats().
+
+    connect() returns a mysql.connector connection (or anything with its
+    cursor/commit/rollback/close/ping/reset_session/is_connected/in_transaction).
+    """
+
+    def __init__(self, connect, size=10, max_overflow=10, timeout=5.0, reset_session=True, name='db'):
+        self.connect = connect
+        self.size = max(1, size)
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.reset_session = reset_session
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._idle = []  # (connection, returned at), most recently returned last
+        self._open = 0
+        self._waiters = deque()  # checkouts waiting for a connection, served first come first served
+        self._g_key = f'_pool_connection_{name}'
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'checkouts': 0, 'waits': 0, 'timeouts': 0, 'opened': 0, 'closed': 0, 'broken': 0,
+                       'queries': 0, 'peak_in_use': 0}
+        self._wait_times = deque(maxlen=LATENCY_SAMPLE_SIZE)
+        self._query_times = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+    def init_app(self, app):
+        """Return each request's connection to the pool when the request ends"""
+        app.teardown_request(self._teardown)
+
+    def connection(self):
+        """The current request's connection, or a new checkout outside requests"""
+        if not has_request_context():
+            return self.checkout()
+        connection = g.get(self._g_key)
+        if connection is None:
+            connection = self.checkout(request_scoped=True)
+            setattr(g, self._g_key, connection)
+        return connection
+
+    def checkout(self, request_scoped=False):
+        started = time.perf_counter()
+        waiter = None
+        with self._lock:
+            # Nobody may take a connection ahead of a caller that is already waiting
+            if self._waiters:
+                waiter = self._wait()
+            elif self._idle:
+                grant = self._idle.pop()
+            elif self._open < self.size + self.max_overflow:
+                self._open += 1
+                grant = (None, None)
+            else:
+                waiter = self._wait()
+
+        if waiter is not None:
+            waiter.event.wait(self.timeout)
+            with self._lock:
+                if waiter.grant is None:
+                    self._waiters.remove(waiter)
+                    self._count('timeouts')
+                    raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a database connection "
+                                      f"({self._open} open, {len(self._waiters)} waiting)")
+                grant = waiter.grant
+
+        raw, returned_at = grant
+        try:
+            if raw is None:
+                raw = self.connect()
+                self._count('opened')
+            elif time.monotonic() - returned_at > IDLE_PING_SECONDS:
+                # The server may have dropped it (wait_timeout, restart)
+                raw.ping(reconnect=True, attempts=1)
+        except Exception:
+            self._discard(None)
+            raise
+
+        with self._lock:
+            in_use = self._open - len(self._idle)
+        with self._stats_lock:
+            self._stats['checkouts'] += 1
+            self._stats['waits'] += waiter is not None
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], in_use)
+            self._wait_times.append(time.perf_counter() - started)
+        return PooledConnection(self, raw, request_scoped)
+
+    def release(self, raw, broken=False):
+        """Put a checked-out connection back (called by PooledConnection)"""
+        if not broken:
+            try:
+                if self.reset_session:
+                    raw.reset_session()
+                elif raw.in_transaction:
+                    # Not reset: never hand out a connection in the middle of someone else's transaction
+                    raw.rollback()
+            except Exception:
+                broken = True
+        if broken:
+            self._count('broken')
+            self._discard(raw)
+            return
+
+        with self._lock:
+            if self._waiters:
+                self._grant((raw, time.monotonic()))
+                return
+            if self._open <= self.size:
+                self._idle.append((raw, time.monotonic()))
+                return
+            # Overflow connection nobody is waiting for
+            self._open -= 1
+        self._close(raw)
+
+    def record_query(self, seconds):
+        with self._stats_lock:
+            self._stats['queries'] += 1
+            self._query_times.append(seconds)
+
+    def stats(self):
+        """Utilization, checkout wait-time and query latency percentiles"""
+        with self._lock:
+            open_, idle, waiting = self._open, len(self._idle), len(self._waiters)
+        in_use = open_ - idle
+        with self._stats_lock:
+            counters = dict(self._stats)
+            waits = sorted(self._wait_times)
+            queries = sorted(self._query_times)
+
+        def percentiles(values):
+            def percentile(p):
+                if not values:
+                    return None
+                index = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+                return round(values[index] * 1000, 3)
+            return {'p50': percentile(50), 'p90': percentile(90), 'p99': percentile(99),
+                    'max': round(values[-1] * 1000, 3) if values else None}
+
+        return dict(
+            counters,
+            size=self.size,
+            max_overflow=self.max_overflow,
+            timeout_s=self.timeout,
+            reset_session=self.reset_session,
+            open=open_,
+            in_use=in_use,
+            idle=idle,
+            waiting=waiting,
+            utilization=round(in_use / (self.size + self.max_overflow), 3),
+            wait_ms=percentiles(waits),
+            query_ms=percentiles(queries)
+        )
+
+    def _teardown(self, exception=None):
+        connection = g.pop(self._g_key, None)
+        if connection is not None:
+            connection.release()
+
+    def _discard(self, raw):
+        with self._lock:
+            if self._waiters:
+                # The slot is free again: the first waiter opens a new connection in it
+                self._grant((None, None))
+            else:
+                self._open -= 1
+        if raw is not None:
+            self._close(raw)
+
+    def _wait(self):
+        waiter = _Waiter()
+        self._waiters.append(waiter)
+        return waiter
+
+    def _grant(self, grant):
+        waiter = self._waiters.popleft()
+        waiter.grant = grant
+        waiter.event.set()
+
+    def _close(self, raw):
+        self._count('closed')
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+
+class _Waiter:
+    __slots__ = ('event', 'grant')
+
+    def __init__(self):
+        self.event = threading.Event()
+        # (connection, returned at) handed over by release(), or (None, None) to open a new one
+        self.grant = None
+
+
+class PooledConnection:
+    """Checked-out connection; close() returns it to the pool (or, request-scoped, waits for teardown)"""
+
+    def __init__(self, pool, raw, request_scoped=False):
+        self._pool = pool
+        self._raw = raw
+        self._request_scoped = request_scoped
+        self.broken = False
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self, self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        if not self._request_scoped:
+            self.release()
+
+    def release(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw, self.broken)
+
+    def __getattr__(self, name):
+        # commit, rollback, start_transaction, ... on the underlying connection
+        if self._raw is None:
+            raise Exception('Connection was returned to the pool')
+        return getattr(self._raw, name)
+
+
+class TimedCursor:
+    """Cursor wrapper that records each statement's latency in the pool's stats"""
+
+    def __init__(self, connection, cursor):
+        self._connection = connection
+        self._cursor = cursor
+
+    def execute(self, *args, **kwargs):
+        return self._timed(self._cursor.execute, args, kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(self._cursor.executemany, args, kwargs)
+
+    def _timed(self, method, args, kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            # Lost connections are discarded on release instead of going back to the pool
+            raw = self._connection._raw
+            if raw is not None and not raw.is_connected():
+                self._connection.broken = True
+            raise
+        finally:
+            self._connection._pool.record_query(time.perf_counter() - started)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
@@ -0,0 +1,133 @@
+"""Move track details from music_recommendations into the tracks catalog.
+
+Older databases store the full track name, artist, album and URLs on every
+music_recommendations row. This tool:
+
+    1. gives rows without a Spotify track_id a content-hash key
+       ('legacy:' + MD5 of name|artist|album, same as backend.music.tracks)
+    2. backfills the tracks table from those rows, in id batches
+    3. drops the per-row detail columns and adds the track_id foreign key
+       (skipped with --backfill-only, e.g. while old API workers still run)
+
+It is safe to re-run; a migrated table is left untouched. The API refuses
+to start (init_database) until the full migration has run.
+
+Usage (from the repository root, with the same DB settings as the app):
+    python -m backend.config.migrate_tracks
+    python -m backend.config.migrate_tracks --backfill-only --batch-size 5000
+"""
+import argparse
+
+from backend.config.database import DB_CONFIG, get_db_connection, init_database
+
+DETAIL_COLUMNS = ('track_name', 'artist_name', 'album_name', 'preview_url', 'spotify_url', 'image_url')
+
+
+def table_columns(cursor, table):
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = %s AND table_name = %s",
+        (DB_CONFIG['database'], table)
+    )
+    return {row[0].lower() for row in cursor.fetchall()}
+
+
+def table_size(cursor, table):
+    """(rows, data bytes, index bytes) as estimated by information_schema"""
+    cursor.execute(
+        """SELECT table_rows, data_length, index_length FROM information_schema.tables
+           WHERE table_schema = %s AND table_name = %s""",
+        (DB_CONFIG['database'], table)
+    )
+    return cursor.fetchone()
+
+
+def id_batches(cursor, batch_size):
+    cursor.execute("SELECT MIN(id), MAX(id) FROM music_recommendations")
+    low, high = cursor.fetchone()
+    if low is None:
+        return
+    for start in range(low, high + 1, batch_size):
+        yield start, start + batch_size - 1
+
+
+def migrate(batch_size=10000, backfill_only=False):
+    # Creates the tracks table if it does not exist yet (without refusing the old layout this migrates)
+    init_database(require_tracks_migrated=False)
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        columns = table_columns(cursor, 'music_recommendations')
+        if 'track_name' not in columns:
+            print("music_recommendations is already migrated")
+            return
+
+        print("Before:", table_size(cursor, 'music_recommendations'))
+
+        keyed = 0
+        backfilled = 0
+        for start, end in id_batches(cursor, batch_size):
+            cursor.execute(
+                """UPDATE music_recommendations
+                   SET track_id = CONCAT('legacy:', MD5(CONCAT_WS('|', track_name, artist_name, album_name)))
+                   WHERE id BETWEEN %s AND %s AND (track_id IS NULL OR track_id = '')""",
+                (start, end)
+            )
+            keyed += cursor.rowcount
+
+            cursor.execute(
+                """INSERT IGNORE INTO tracks (track_id, name, artist, album, preview_url, spotify_url, image_url)
+                   SELECT track_id, track_name, artist_name, album_name, preview_url, spotify_url, image_url
+                   FROM music_recommendations
+                   WHERE id BETWEEN %s AND %s
+                   ORDER BY id DESC""",
+                (start, end)
+            )
+            backfilled += cursor.rowcount
+            connection.commit()
+            print(f"  ids {start}-{end}: {keyed} rows keyed, {backfilled} tracks added so far")
+
+        if backfill_only:
+            print("Backfill done; run again without --backfill-only to drop the old columns")
+            return
+
+        cursor.execute(
+            """SELECT COUNT(*) FROM music_recommendations mr
+               LEFT JOIN tracks t ON t.track_id = mr.track_id
+               WHERE t.track_id IS NULL"""
+        )
+        missing = cursor.fetchone()[0]
+        if missing:
+            raise Exception(f"{missing} recommendations have no catalog entry, not dropping columns")
+
+        drops = ', '.join(f"DROP COLUMN {column}" for column in DETAIL_COLUMNS if column in columns)
+        cursor.execute(
+            f"""ALTER TABLE music_recommendations
+                {drops},
+                MODIFY track_id VARCHAR(64) NOT NULL,
+                ADD CONSTRAINT fk_music_recommendations_track FOREIGN KEY (track_id) REFERENCES tracks(track_id)"""
+        )
+        connection.commit()
+
+        cursor.execute("ANALYZE TABLE music_recommendations, tracks")
+        cursor.fetchall()
+        print("After:", table_size(cursor, 'music_recommendations'))
+        print("Catalog:", table_size(cursor, 'tracks'))
+        print("Migration complete!")
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill the tracks catalog from music_recommendations')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Recommendation ids per transaction')
+    parser.add_argument('--backfill-only', action='store_true', help='Keep the old detail columns')
+    args = parser.parse_args()
+    migrate(args.batch_size, args.backfill_only)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Check or rebuild the materialized per-user statistics.
+
+user_stats and user_emotion_counts are updated together with every
+emotion_history / music_recommendations insert. This tool compares them
+with aggregates computed from the raw tables and can recompute them:
+
+    --check     report users whose stored numbers differ (exit status 1 if any)
+    --repair    check, then rebuild only the users that differ
+    (default)   rebuild every user (or --user-id ones)
+
+Users are processed in batches of --batch-size, one transaction each, so
+the API keeps writing while it runs.
+
+Usage (from the repository root, with the same DB settings as the app):
+    python -m backend.config.rebuild_user_stats --check
+    python -m backend.config.rebuild_user_stats --repair
+    python -m backend.config.rebuild_user_stats --user-id 42
+"""
+import argparse
+import sys
+
+from backend.config.database import get_db_connection, init_database
+from backend.persistence import user_stats
+
+
+def user_batches(cursor, batch_size, only=None):
+    if only:
+        yield sorted(only)
+        return
+    last = 0
+    while True:
+        batch = user_stats.next_user_ids(cursor, last, batch_size)
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def run(batch_size=1000, only=None, check=False, repair=False):
+    # Creates the statistics tables if they do not exist yet
+    init_database()
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    users = mismatched = rebuilt = 0
+
+    try:
+        for batch in user_batches(cursor, batch_size, only):
+            users += len(batch)
+            if check or repair:
+                differences = user_stats.check(cursor, batch)
+                connection.commit()
+                mismatched += len(differences)
+                for user_id, difference in differences.items():
+                    print(f"  user {user_id}: stored {difference['stored']}, expected {difference['expected']}")
+                batch = sorted(differences) if repair else []
+
+            if batch:
+                user_stats.rebuild(cursor, batch)
+                connection.commit()
+                rebuilt += len(batch)
+            print(f"  {users} users checked, {mismatched} mismatched, {rebuilt} rebuilt so far")
+
+        print(f"Done: {users} users, {mismatched} mismatched, {rebuilt} rebuilt")
+        return mismatched
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check or rebuild user_stats and user_emotion_counts')
+    parser.add_argument('--check', action='store_true', help='Only report users whose statistics differ')
+    parser.add_argument('--repair', action='store_true', help='Rebuild only the users whose statistics differ')
+    parser.add_argument('--user-id', type=int, action='append', help='Limit to this user (repeatable)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Users per transaction')
+    args = parser.parse_args()
+
+    mismatched = run(args.batch_size, args.user_id, args.check, args.repair)
+    if args.check and mismatched:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
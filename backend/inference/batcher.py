@@ -0,0 +1,178 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+# Batching knobs (tune against p99 latency)
+MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 32))
+MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', 5))
+# How long a request waits for its prediction before giving up (seconds)
+INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', 10))
+
+# Number of recent requests kept for wait-time percentiles
+WAIT_SAMPLE_SIZE = 1000
+
+
+class _Request:
+    """A single face tensor waiting to be batched"""
+
+    __slots__ = ('tensor', 'future', 'enqueued_at')
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Collect single-face predictions into one batched forward pass.
+
+    Request handlers call predict() with one preprocessed face tensor
+    (48x48x1). A background worker drains the queue until either
+    max_batch_size faces are collected or max_wait_ms has passed since the
+    first face arrived, runs predict_fn once on the stacked batch and hands
+    every caller its own row of the result.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = {}
+        self._wait_times = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._requests = 0
+        self._batches = 0
+
+        self._stopped = threading.Event()
+        # Orders submit() against stop(): nothing is queued behind the stop sentinel
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name='emotion-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, tensor):
+        """Queue a face tensor and return a Future for its prediction row"""
+        request = _Request(tensor)
+        with self._submit_lock:
+            if self._stopped.is_set():
+                raise Exception("Batcher is stopped")
+            self._queue.put(request)
+        return request.future
+
+    def predict(self, tensor, timeout=INFERENCE_TIMEOUT):
+        """Blocking helper: submit a face tensor and wait for its prediction row"""
+        return self.predict_many([tensor], timeout)[0]
+
+    def predict_many(self, tensors, timeout=INFERENCE_TIMEOUT):
+        """Submit several face tensors together so they share a forward pass"""
+        futures = [self.submit(tensor) for tensor in tensors]
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        try:
+            return [future.result(timeout=None if deadline is None else max(0.0, deadline - time.perf_counter()))
+                    for future in futures]
+        except FutureTimeout:
+            raise Exception(f"Inference timed out after {timeout}s")
+
+    def stop(self, timeout=1.0):
+        """Stop the worker thread after draining queued requests"""
+        with self._submit_lock:
+            self._stopped.set()
+            self._queue.put(None)
+        self._worker.join(timeout)
+
+    def _collect(self):
+        """Block for the first request, then gather more until size or time limit"""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-queue the sentinel so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                if self._stopped.is_set():
+                    self._fail_queued()
+                    return
+                continue
+
+            started = time.perf_counter()
+            try:
+                inputs = np.stack([item.tensor for item in batch])
+                outputs = self.predict_fn(inputs)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+            else:
+                for i, item in enumerate(batch):
+                    item.future.set_result(outputs[i])
+
+            self._record(batch, started)
+
+    def _fail_queued(self):
+        """Fail whatever is still queued when the worker exits, so no caller waits forever"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item.future.set_exception(Exception("Batcher is stopped"))
+
+    def _record(self, batch, started):
+        with self._stats_lock:
+            self._requests += len(batch)
+            self._batches += 1
+            size = len(batch)
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+            for item in batch:
+                self._wait_times.append(started - item.enqueued_at)
+
+    def stats(self):
+        """Queue depth, batch-size histogram and request wait-time percentiles"""
+        with self._stats_lock:
+            waits = sorted(self._wait_times)
+            histogram = dict(sorted(self._batch_sizes.items()))
+            requests, batches = self._requests, self._batches
+
+        def percentile(p):
+            if not waits:
+                return None
+            index = min(len(waits) - 1, int(round(p / 100.0 * (len(waits) - 1))))
+            return round(waits[index] * 1000, 3)
+
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'requests': requests,
+            'batches': batches,
+            'avg_batch_size': round(requests / batches, 2) if batches else 0,
+            'batch_size_histogram': histogram,
+            'wait_ms': {
+                'p50': percentile(50),
+                'p90': percentile(90),
+                'p99': percentile(99),
+                'max': round(waits[-1] * 1000, 3) if waits else None
+            }
+        }
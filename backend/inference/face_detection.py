@@ -0,0 +1,123 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Detector selection
+FACE_DETECTOR_BACKEND = os.getenv('FACE_DETECTOR_BACKEND', 'haar').lower()
+HAAR_CASCADE_PATH = os.getenv(
+    'HAAR_CASCADE_PATH',
+    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+)
+YUNET_MODEL_PATH = os.getenv(
+    'YUNET_MODEL_PATH',
+    os.path.join(BASE_DIR, 'ml', 'models', 'face_detection_yunet_2023mar.onnx')
+)
+
+
+class FaceDetector:
+    """Base class for face detection backends.
+
+    detect() takes a BGR (or already grayscale) frame and returns a list of
+    (x, y, w, h) boxes. Callers that have already converted the frame to
+    grayscale can pass it as `gray` to avoid a second conversion.
+    """
+
+    name = None
+
+    def detect(self, image, gray=None):
+        raise NotImplementedError
+
+
+class HaarFaceDetector(FaceDetector):
+    """OpenCV Haar cascade detector (XML parsed once per instance)"""
+
+    name = 'haar'
+
+    def __init__(self, cascade_path=HAAR_CASCADE_PATH, scale_factor=1.3, min_neighbors=5):
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise Exception(f"Failed to load Haar cascade from {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detect(self, image, gray=None):
+        if gray is None:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        faces = self.cascade.detectMultiScale(gray, self.scale_factor, self.min_neighbors)
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class YuNetFaceDetector(FaceDetector):
+    """OpenCV DNN YuNet detector loaded from a local ONNX file"""
+
+    name = 'yunet'
+
+    def __init__(self, model_path=YUNET_MODEL_PATH, score_threshold=0.8, nms_threshold=0.3):
+        if not os.path.exists(model_path):
+            raise Exception(f"YuNet model not found at {model_path}")
+        self.detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), score_threshold, nms_threshold)
+        self._input_size = None
+
+    def detect(self, image, gray=None):
+        if len(image.shape) == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+        height, width = image.shape[:2]
+        if self._input_size != (width, height):
+            self.detector.setInputSize((width, height))
+            self._input_size = (width, height)
+
+        _, faces = self.detector.detect(image)
+        if faces is None:
+            return []
+
+        boxes = []
+        for face in faces:
+            x, y, w, h = np.round(face[:4]).astype(int)
+            x, y = max(0, x), max(0, y)
+            boxes.append((int(x), int(y), int(min(w, width - x)), int(min(h, height - y))))
+        return boxes
+
+
+# Available backends (register new ones with register_backend)
+BACKENDS = {
+    HaarFaceDetector.name: HaarFaceDetector,
+    YuNetFaceDetector.name: YuNetFaceDetector
+}
+
+_local = threading.local()
+
+
+def register_backend(name, factory):
+    """Register a face detector backend under the given name"""
+    BACKENDS[name.lower()] = factory
+
+
+def create_face_detector(backend=None):
+    """Create a new detector instance for the given backend name"""
+    backend = (backend or FACE_DETECTOR_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise Exception(f"Unknown face detector backend: {backend}")
+    return BACKENDS[backend]()
+
+
+def get_face_detector(backend=None):
+    """Get this thread's detector for the backend, creating it on first use.
+
+    Cascade and DNN detectors are not safe to share between threads, so each
+    thread keeps its own instance; the model file is only parsed once per
+    thread instead of once per request.
+    """
+    backend = (backend or FACE_DETECTOR_BACKEND).lower()
+    detectors = getattr(_local, 'detectors', None)
+    if detectors is None:
+        detectors = _local.detectors = {}
+
+    detector = detectors.get(backend)
+    if detector is None:
+        detector = detectors[backend] = create_face_detector(backend)
+    return detector
@@ -0,0 +1,36 @@
+import base64
+import binascii
+
+import cv2
+import numpy as np
+
+# Content types accepted as a raw binary frame body
+FRAME_CONTENT_TYPES = ('image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'application/octet-stream')
+
+
+def decode_image_buffer(buffer):
+    """Decode an encoded image (JPEG/PNG/WebP bytes or memoryview) to BGR without copying the input"""
+    if not buffer:
+        return None
+    return cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+
+
+def data_url_bytes(image_data):
+    """Encoded image bytes of a base64 image or data URL, None if it is not valid base64"""
+    comma = image_data.find(',')
+    if comma != -1:
+        image_data = image_data[comma + 1:]
+    try:
+        return base64.b64decode(image_data)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def decode_data_url(image_data):
+    """Decode a base64 image or data URL ("data:image/jpeg;base64,...") to BGR"""
+    return decode_image_buffer(data_url_bytes(image_data))
+
+
+def is_frame_content_type(content_type):
+    """Whether a request Content-Type is a supported raw frame body"""
+    return (content_type or '').split(';')[0].strip().lower() in FRAME_CONTENT_TYPES
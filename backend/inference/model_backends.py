@@ -0,0 +1,132 @@
+import os
+import threading
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Model runtime selection ('keras' or 'tflite')
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'keras').lower()
+KERAS_MODEL_PATH = os.getenv(
+    'MODEL_PATH',
+    os.path.join(BASE_DIR, 'ml', 'models', 'emotion_detection_model_final.keras')
+)
+TFLITE_MODEL_PATH = os.getenv(
+    'TFLITE_MODEL_PATH',
+    os.path.join(BASE_DIR, 'ml', 'models', 'emotion_detection_model_int8.tflite')
+)
+TFLITE_NUM_THREADS = int(os.getenv('TFLITE_NUM_THREADS', 1))
+# Fixed batch sizes the TFLite runtime pads to (one allocated interpreter each); the largest
+# defaults to the micro-batcher's INFERENCE_MAX_BATCH_SIZE
+TFLITE_BATCH_SIZES = [int(size) for size in os.getenv(
+    'TFLITE_BATCH_SIZES', f"1,4,8,{os.getenv('INFERENCE_MAX_BATCH_SIZE', 32)}"
+).split(',') if size.strip()]
+
+
+class KerasEmotionModel:
+    """Full TensorFlow/Keras runtime"""
+
+    name = 'keras'
+
+    def __init__(self, model_path=KERAS_MODEL_PATH):
+        from tensorflow import keras
+        self.model_path = model_path
+        self.model = keras.models.load_model(model_path)
+
+    def predict(self, batch):
+        """Return class probabilities (N x classes) for a N x 48 x 48 x 1 batch"""
+        return self.model.predict(batch, verbose=0)
+
+
+class TFLiteEmotionModel:
+    """TFLite interpreter runtime (float16 or int8 models from ml/utils/export_tflite.py)
+
+    Resizing an interpreter's input re-plans its tensors, so instead of
+    resizing for every batch size the batcher produces, batches are padded
+    up to the next of a few fixed sizes (TFLITE_BATCH_SIZES), each with its
+    own interpreter allocated once at load, and the padding rows are sliced off the
+    output. Batches above the largest size run in chunks of it.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path=TFLITE_MODEL_PATH, num_threads=TFLITE_NUM_THREADS, batch_sizes=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.model_path = model_path
+        self.batch_sizes = sorted(set(batch_sizes or TFLITE_BATCH_SIZES))
+        # Batch size -> (interpreter, input details, output details, lock); each interpreter
+        # keeps internal state between invoke() calls, so one call at a time per size
+        self._runners = {size: self._allocate(Interpreter, num_threads, size) for size in self.batch_sizes}
+
+    def _allocate(self, interpreter_class, num_threads, batch_size):
+        interpreter = interpreter_class(model_path=self.model_path, num_threads=num_threads)
+        input_details = interpreter.get_input_details()[0]
+        if int(input_details['shape'][0]) != batch_size:
+            shape = list(input_details['shape'])
+            shape[0] = batch_size
+            interpreter.resize_tensor_input(input_details['index'], shape)
+        interpreter.allocate_tensors()
+        return interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0], threading.Lock()
+
+    def _padded_size(self, count):
+        return next((size for size in self.batch_sizes if size >= count), self.batch_sizes[-1])
+
+    def predict(self, batch):
+        """Return class probabilities (N x classes) for a N x 48 x 48 x 1 batch"""
+        batch = np.asarray(batch, dtype=np.float32)
+        largest = self.batch_sizes[-1]
+        if len(batch) > largest:
+            return np.concatenate([self.predict(batch[i:i + largest]) for i in range(0, len(batch), largest)])
+
+        count = len(batch)
+        size = self._padded_size(count)
+        if size > count:
+            batch = np.concatenate([batch, np.zeros((size - count,) + batch.shape[1:], dtype=np.float32)])
+
+        interpreter, input_details, output_details, lock = self._runners[size]
+        input_dtype = input_details['dtype']
+        if input_dtype != np.float32:
+            # Fully-quantized input: float -> int using the tensor's scale/zero point
+            scale, zero_point = input_details['quantization']
+            info = np.iinfo(input_dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(input_dtype)
+
+        with lock:
+            interpreter.set_tensor(input_details['index'], batch)
+            interpreter.invoke()
+            output = interpreter.get_tensor(output_details['index'])[:count]
+
+            if output.dtype != np.float32:
+                scale, zero_point = output_details['quantization']
+                output = (output.astype(np.float32) - zero_point) * scale
+            return output.copy()
+
+
+BACKENDS = {
+    KerasEmotionModel.name: (KerasEmotionModel, KERAS_MODEL_PATH),
+    TFLiteEmotionModel.name: (TFLiteEmotionModel, TFLITE_MODEL_PATH)
+}
+
+
+def resolve_model_path(backend=None):
+    """Model file used by a runtime (defaults to INFERENCE_BACKEND)"""
+    backend = (backend or INFERENCE_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise Exception(f"Unknown inference backend: {backend}")
+    return BACKENDS[backend][1]
+
+
+def load_emotion_model(backend=None, model_path=None):
+    """Load the emotion model with the configured runtime (None if the file is missing)"""
+    backend = (backend or INFERENCE_BACKEND).lower()
+    model_path = model_path or resolve_model_path(backend)
+    model_class = BACKENDS[backend][0]
+    print(f"Loading {backend} model from:", model_path)
+    if not os.path.exists(model_path):
+        print(f"Model not found at {model_path}")
+        return None
+    return model_class(model_path)
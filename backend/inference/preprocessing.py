@@ -0,0 +1,104 @@
+import threading
+
+import cv2
+import numpy as np
+
+# Model input size (48x48 grayscale)
+IMG_SIZE = (48, 48)
+
+# Emotion labels in model output order (alphabetical class folders used in training).
+# Shared by the API and the ml/utils tools so every consumer decodes predictions the same way.
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+
+_SCALE = np.float32(1.0 / 255.0)
+
+
+class FacePreprocessor:
+    """Turn grayscale face crops into float32 model input using reusable buffers.
+
+    The returned batch is a view into a buffer owned by this instance and is
+    overwritten by the next call, so copy it (np.stack / model.predict both do)
+    before preprocessing the next frame. Instances are not thread-safe; use
+    get_preprocessor() for a per-thread instance.
+    """
+
+    def __init__(self, capacity=32):
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self._pixels = np.empty((capacity,) + IMG_SIZE, dtype=np.uint8)
+        self._output = np.empty((capacity,) + IMG_SIZE + (1,), dtype=np.float32)
+
+    def _reserve(self, count):
+        if count > self.capacity:
+            self._allocate(max(count, self.capacity * 2))
+
+    def normalize(self, pixels):
+        """Scale a uint8 (N, 48, 48) batch to float32 [0, 1] with shape (N, 48, 48, 1)"""
+        count = len(pixels)
+        self._reserve(count)
+        out = self._output[:count]
+        np.multiply(pixels, _SCALE, out=out[..., 0], dtype=np.float32)
+        return out
+
+    def faces(self, gray, boxes):
+        """Crop every (x, y, w, h) box from a grayscale frame, resize and normalize in one batch"""
+        count = len(boxes)
+        self._reserve(count)
+        pixels = self._pixels[:count]
+        for i, (x, y, w, h) in enumerate(boxes):
+            cv2.resize(gray[y:y+h, x:x+w], IMG_SIZE, dst=pixels[i], interpolation=cv2.INTER_LINEAR)
+        return self.normalize(pixels)
+
+    def image(self, image):
+        """Preprocess a whole (BGR or grayscale) image as one face, shape (1, 48, 48, 1)"""
+        gray = to_gray(image)
+        return self.faces(gray, [(0, 0, gray.shape[1], gray.shape[0])])
+
+
+_local = threading.local()
+
+
+def get_preprocessor():
+    """Get this thread's FacePreprocessor"""
+    preprocessor = getattr(_local, 'preprocessor', None)
+    if preprocessor is None:
+        preprocessor = _local.preprocessor = FacePreprocessor()
+    return preprocessor
+
+
+def to_gray(image):
+    """Convert a BGR image to grayscale (grayscale images are returned as-is)"""
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+
+
+def read_face(path):
+    """Read an image file as a uint8 48x48 grayscale face (None if unreadable)"""
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    if img.shape != IMG_SIZE:
+        img = cv2.resize(img, IMG_SIZE)
+    return img
+
+
+def preprocess_faces(gray, boxes):
+    """Batch-preprocess face boxes from a grayscale frame (per-thread buffers, see FacePreprocessor)"""
+    return get_preprocessor().faces(gray, boxes)
+
+
+def preprocess_image(image):
+    """Preprocess one face image to a (1, 48, 48, 1) float32 tensor"""
+    return get_preprocessor().image(image)
+
+
+def format_detection(box, prediction):
+    """Detection dict for a face box and its class probabilities"""
+    x, y, w, h = box
+    emotion_idx = int(np.argmax(prediction))
+    return {
+        'box': {'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)},
+        'emotion': EMOTION_LABELS[emotion_idx],
+        'confidence': float(prediction[emotion_idx])
+    }
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', 1024))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', 30))
+# Face crop cache: short-lived, and a hash hit only counts when the crops' contrast-normalized
+# thumbnails differ by at most FACE_CACHE_MAX_DIFF standard deviations on average
+FACE_CACHE_TTL = float(os.getenv('FACE_CACHE_TTL', 3))
+FACE_CACHE_MAX_DIFF = float(os.getenv('FACE_CACHE_MAX_DIFF', 0.3))
+FACE_THUMBNAIL_SIZE = 16
+
+
+class ResultCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'rejections': 0}
+
+    def get(self, key, accept=None):
+        """Return the cached value, or None if missing, expired or not accepted by accept(value)"""
+        if self.max_entries <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            value, expires_at = entry
+            if expires_at < now:
+                del self._entries[key]
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            if accept is not None and not accept(value):
+                self._counters['rejections'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        lookups = counters['hits'] + counters['misses']
+        return dict(
+            counters,
+            size=size,
+            max_entries=self.max_entries,
+            ttl_seconds=self.ttl,
+            hit_rate=round(counters['hits'] / lookups, 4) if lookups else None
+        )
+
+
+def content_key(payload, *extra):
+    """Key for an exact payload (raw image bytes or base64 string) plus request options"""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    digest = hashlib.blake2b(payload, digest_size=16)
+    for value in extra:
+        digest.update(repr(value).encode('utf-8'))
+    return 'c:' + digest.hexdigest()
+
+
+def face_key(gray, box, scope):
+    """Perceptual (difference) hash of a face crop: 64 bits from a 9x8 downscale.
+
+    Near-identical crops (sensor noise, re-encoding, a pixel of jitter) map to
+    the same key, so their model prediction can be reused. Keys are scoped
+    (e.g. per user) so one user's frames never answer another's; different
+    faces can still share a hash, so hits are confirmed with same_face().
+    """
+    x, y, w, h = box
+    small = cv2.resize(gray[y:y+h, x:x+w], (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return f'p:{scope}:' + np.packbits(bits).tobytes().hex()
+
+
+def face_thumbnail(gray, box):
+    """Small downscaled face crop stored with a cached prediction to confirm hash hits.
+
+    Normalized to zero mean and unit contrast, so two different low-contrast
+    faces are not "close" just because both are nearly flat.
+    """
+    x, y, w, h = box
+    small = cv2.resize(gray[y:y+h, x:x+w], (FACE_THUMBNAIL_SIZE, FACE_THUMBNAIL_SIZE),
+                       interpolation=cv2.INTER_AREA).astype(np.float32)
+    return (small - small.mean()) / max(float(small.std()), 1.0)
+
+
+def same_face(thumbnail, other, max_diff=FACE_CACHE_MAX_DIFF):
+    """Whether two face thumbnails differ by at most max_diff (in standard deviations) on average"""
+    return float(np.mean(np.abs(thumbnail - other))) <= max_diff
@@ -0,0 +1,230 @@
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+
+# Max emotion updates pushed to the client per second
+SESSION_TARGET_FPS = float(os.getenv('SESSION_TARGET_FPS', 5))
+# Persist the current emotion at least this often even when it does not change
+SESSION_SUMMARY_SECONDS = float(os.getenv('SESSION_SUMMARY_SECONDS', 60))
+# Sessions without frames or listeners for this long are closed
+SESSION_IDLE_TIMEOUT = float(os.getenv('SESSION_IDLE_TIMEOUT', 60))
+# Live sessions one user may have open on a worker at the same time (0 = no limit)
+SESSION_MAX_PER_USER = int(os.getenv('SESSION_MAX_PER_USER', 3))
+# Keep-alive comment interval for the event stream
+SESSION_HEARTBEAT_SECONDS = 15
+
+
+class SessionLimitExceeded(Exception):
+    """The user already has the maximum number of open sessions"""
+
+
+class EmotionSession:
+    """A live webcam session: frames in, throttled emotion updates out.
+
+    Only the most recent frame is kept. If a new frame arrives while the
+    previous one is still waiting for inference, the older one is dropped, so
+    a slow model never builds up a backlog. Results are persisted when the
+    emotion changes or every summary_interval seconds.
+    """
+
+    def __init__(self, user_id, process_frame, persist, target_fps=SESSION_TARGET_FPS,
+                 summary_interval=SESSION_SUMMARY_SECONDS):
+        self.id = uuid.uuid4().hex
+        self.token = secrets.token_urlsafe(24)
+        self.user_id = user_id
+        self.process_frame = process_frame
+        self.persist = persist
+        self.min_interval = 1.0 / target_fps if target_fps > 0 else 0.0
+        self.summary_interval = summary_interval
+
+        self.created_at = time.time()
+        self.last_activity = time.time()
+        self.closed = False
+
+        self._cond = threading.Condition()
+        self._pending = None
+        self._result = None
+        self._version = 0
+
+        self._last_persisted_emotion = None
+        self._last_persisted_at = 0.0
+        self.stats = {'received': 0, 'processed': 0, 'dropped': 0, 'persisted': 0, 'errors': 0}
+
+        self._worker = threading.Thread(target=self._run, name=f'emotion-session-{self.id[:8]}', daemon=True)
+        self._worker.start()
+
+    def check_token(self, token):
+        return bool(token) and hmac.compare_digest(self.token, token)
+
+    def submit_frame(self, buffer):
+        """Queue an encoded frame, replacing any frame not yet processed"""
+        with self._cond:
+            if self.closed:
+                raise Exception("Session is closed")
+            self.stats['received'] += 1
+            if self._pending is not None:
+                self.stats['dropped'] += 1
+            self._pending = buffer
+            self.last_activity = time.time()
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._pending = None
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    break
+                buffer, self._pending = self._pending, None
+
+            try:
+                result = self.process_frame(buffer)
+            except Exception as e:
+                result = {'error': str(e)}
+            self._handle_result(result)
+
+        self._persist_summary()
+
+    def _handle_result(self, result):
+        now = time.time()
+        if 'error' in result:
+            self.stats['errors'] += 1
+        else:
+            self.stats['processed'] += 1
+            emotion = result['emotion']
+            changed = emotion != self._last_persisted_emotion
+            if changed or now - self._last_persisted_at >= self.summary_interval:
+                self._save(result, now)
+            result['changed'] = changed
+
+        with self._cond:
+            self._result = result
+            self._version += 1
+            self._cond.notify_all()
+
+    def _save(self, result, now):
+        try:
+            result['history_id'] = self.persist(self.user_id, result)
+            self._last_persisted_emotion = result['emotion']
+            self._last_persisted_at = now
+            self.stats['persisted'] += 1
+        except Exception as e:
+            print(f"Error persisting session {self.id} result: {e}")
+
+    def _persist_summary(self):
+        """Store the final emotion on close if it was not stored yet"""
+        result = self._result
+        if result and 'error' not in result and 'history_id' not in result:
+            self._save(result, time.time())
+
+    def events(self):
+        """Yield server-sent events with the latest result, at most target_fps per second"""
+        version = 0
+        last_sent = 0.0
+        while True:
+            with self._cond:
+                deadline = time.time() + SESSION_HEARTBEAT_SECONDS
+                while self._version == version and not self.closed:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self.closed:
+                    yield f"event: closed\ndata: {json.dumps(self.stats)}\n\n"
+                    return
+                self.last_activity = time.time()
+                if self._version == version:
+                    yield ": keep-alive\n\n"
+                    continue
+
+            # Throttle: results published while waiting are coalesced into one event
+            wait = last_sent + self.min_interval - time.time()
+            if wait > 0:
+                time.sleep(wait)
+
+            with self._cond:
+                version, result = self._version, dict(self._result)
+            last_sent = time.time()
+
+            payload = dict(result, stats=dict(self.stats))
+            yield f"event: emotion\ndata: {json.dumps(payload)}\n\n"
+
+
+class SessionRegistry:
+    """In-process registry of live sessions (clients must stay on the same worker).
+
+    A reaper thread closes idle sessions every few seconds, so a client
+    that disconnects does not keep its inference thread, tracker and last
+    frame alive until someone else opens a session.
+    """
+
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT, max_per_user=SESSION_MAX_PER_USER):
+        self.idle_timeout = idle_timeout
+        self.max_per_user = max_per_user
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def create(self, user_id, process_frame, persist, **kwargs):
+        """Open a session; raises SessionLimitExceeded when the user already has max_per_user open"""
+        self._ensure_reaper()
+        self.reap()
+        with self._lock:
+            open_sessions = sum(1 for s in self._sessions.values() if s.user_id == user_id)
+            if self.max_per_user and open_sessions >= self.max_per_user:
+                raise SessionLimitExceeded(f"Too many open sessions (at most {self.max_per_user})")
+            session = EmotionSession(user_id, process_frame, persist, **kwargs)
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+        return session
+
+    def reap(self):
+        """Close sessions idle for longer than idle_timeout"""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            idle = [s for s in self._sessions.values() if s.last_activity < cutoff]
+            for session in idle:
+                del self._sessions[session.id]
+        for session in idle:
+            session.close()
+
+    def _ensure_reaper(self):
+        if self._reaper is not None:
+            return
+        with self._lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_forever, name='emotion-session-reaper', daemon=True)
+                self._reaper.start()
+
+    def _reap_forever(self):
+        interval = min(max(self.idle_timeout / 4, 1), 15)
+        while True:
+            time.sleep(interval)
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"Error reaping sessions: {e}")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
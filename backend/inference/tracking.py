@@ -0,0 +1,132 @@
+import os
+
+import cv2
+import numpy as np
+
+from backend.inference.face_detection import get_face_detector
+
+# Run the full face detector every N frames (tracking in between)
+TRACKER_REDETECT_INTERVAL = int(os.getenv('TRACKER_REDETECT_INTERVAL', 5))
+# Weight of the newest prediction in the probability moving average (1 = no smoothing)
+TRACKER_EMA_ALPHA = float(os.getenv('TRACKER_EMA_ALPHA', 0.4))
+
+# Optical flow settings
+MIN_TRACK_POINTS = 6
+MAX_TRACK_POINTS = 40
+LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+)
+
+
+class FaceTracker:
+    """Follow one face across webcam frames and smooth its emotion probabilities.
+
+    The face detector runs on the first frame, every redetect_interval frames
+    and whenever tracking fails. In between, the box is moved by the median
+    Lucas-Kanade optical flow of feature points inside it, which is much
+    cheaper than a full detectMultiScale pass. Not thread-safe: use one
+    tracker per session.
+    """
+
+    def __init__(self, redetect_interval=TRACKER_REDETECT_INTERVAL, ema_alpha=TRACKER_EMA_ALPHA, detector=None):
+        self.redetect_interval = max(1, redetect_interval)
+        self.ema_alpha = min(1.0, max(0.0, ema_alpha))
+        self.detector = detector
+        self.stats = {'frames': 0, 'detections': 0, 'tracked': 0, 'track_failures': 0}
+        self.reset()
+
+    def reset(self):
+        self.box = None
+        self.probabilities = None
+        self.last_tracked = False
+        self._prev_gray = None
+        self._points = None
+        self._since_detect = 0
+
+    def locate(self, image, gray):
+        """Return the face box (x, y, w, h) for this frame, or None when no face is found"""
+        self.stats['frames'] += 1
+        self.last_tracked = False
+
+        can_track = (
+            self.box is not None
+            and self._prev_gray is not None
+            and self._prev_gray.shape == gray.shape
+            and self._since_detect < self.redetect_interval
+        )
+        if can_track:
+            box = self._track(gray)
+            if box is not None:
+                self.box = box
+                self.last_tracked = True
+                self._since_detect += 1
+                self.stats['tracked'] += 1
+                self._prev_gray = gray
+                return box
+            self.stats['track_failures'] += 1
+
+        return self._detect(image, gray)
+
+    def smooth(self, probabilities):
+        """Exponential moving average of the class probabilities for the tracked face"""
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        if self.probabilities is None:
+            self.probabilities = probabilities.copy()
+        else:
+            self.probabilities = self.ema_alpha * probabilities + (1.0 - self.ema_alpha) * self.probabilities
+        return self.probabilities
+
+    def _detect(self, image, gray):
+        detector = self.detector or get_face_detector()
+        faces = detector.detect(image, gray)
+        self.stats['detections'] += 1
+
+        if len(faces) == 0:
+            # Face lost: start smoothing afresh for whoever appears next
+            self.reset()
+            return None
+
+        if self.box is None:
+            # Largest face first
+            box = max(faces, key=lambda f: f[2] * f[3])
+        else:
+            # Stay on the face closest to the one we were following
+            cx, cy = self.box[0] + self.box[2] / 2.0, self.box[1] + self.box[3] / 2.0
+            box = min(faces, key=lambda f: (f[0] + f[2] / 2.0 - cx) ** 2 + (f[1] + f[3] / 2.0 - cy) ** 2)
+
+        self.box = tuple(int(v) for v in box)
+        self._prev_gray = gray
+        self._points = self._features(gray, self.box)
+        self._since_detect = 0
+        return self.box
+
+    def _features(self, gray, box):
+        x, y, w, h = box
+        mask = np.zeros(gray.shape, dtype=np.uint8)
+        mask[y:y+h, x:x+w] = 255
+        return cv2.goodFeaturesToTrack(gray, MAX_TRACK_POINTS, 0.01, 3, mask=mask)
+
+    def _track(self, gray):
+        points = self._points
+        if points is None or len(points) < MIN_TRACK_POINTS:
+            points = self._features(self._prev_gray, self.box)
+            if points is None or len(points) < MIN_TRACK_POINTS:
+                return None
+
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, points, None, **LK_PARAMS)
+        if moved is None:
+            return None
+        good = status.reshape(-1) == 1
+        if good.sum() < MIN_TRACK_POINTS:
+            return None
+
+        dx, dy = np.median((moved[good] - points[good]).reshape(-1, 2), axis=0)
+        x, y, w, h = self.box
+        height, width = gray.shape[:2]
+        x = int(round(min(max(x + dx, 0), width - w)))
+        y = int(round(min(max(y + dy, 0), height - h)))
+
+        self._points = moved[good].reshape(-1, 1, 2)
+        return (x, y, w, h)
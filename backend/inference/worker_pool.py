@@ -0,0 +1,390 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Number of inference worker processes (0 = run inference in the request thread)
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 0))
+# Core pinning: "auto" (one core per worker), "0,1;2,3" (cores per worker) or empty for none
+INFERENCE_WORKER_CPUS = os.getenv('INFERENCE_WORKER_CPUS', '')
+# Shared-memory slots: how many requests can be in flight and the largest frame they can carry
+INFERENCE_WORKER_SLOTS = int(os.getenv('INFERENCE_WORKER_SLOTS', 0)) or max(1, INFERENCE_WORKERS) * 4
+INFERENCE_SLOT_BYTES = int(os.getenv('INFERENCE_SLOT_BYTES', 8 * 1024 * 1024))
+INFERENCE_WORKER_TIMEOUT = float(os.getenv('INFERENCE_WORKER_TIMEOUT', 10))
+# Poll the model file and do a rolling restart when it changes (0 = off)
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', 5))
+
+OP_DETECT = 'detect'
+OP_PREDICT = 'predict'
+
+
+def parse_cpu_affinity(spec, workers):
+    """Per-worker CPU sets from INFERENCE_WORKER_CPUS (None entries mean no pinning)"""
+    spec = (spec or '').strip().lower()
+    if not spec:
+        return [None] * workers
+    if spec == 'auto':
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+        return [{cpus[i % len(cpus)]} for i in range(workers)]
+    groups = [{int(cpu) for cpu in group.split(',') if cpu.strip()} for group in spec.split(';')]
+    return [groups[i % len(groups)] for i in range(workers)]
+
+
+def _worker_main(worker_id, task_queue, result_queue, stop_event, current_task, cpus, backend):
+    """Worker process: own model and face detector, reads frames from shared memory"""
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+
+    from backend.inference.face_detection import get_face_detector
+    from backend.inference.frames import decode_image_buffer
+    from backend.inference.model_backends import load_emotion_model
+    from backend.inference.preprocessing import format_detection, preprocess_faces, to_gray
+
+    try:
+        model = load_emotion_model(backend)
+        if model is None:
+            raise Exception("Model file not found")
+        detector = get_face_detector()
+        model.predict(np.zeros((1, 48, 48, 1), dtype=np.float32))
+    except Exception as e:
+        result_queue.put(('failed', worker_id, str(e)))
+        return
+    result_queue.put(('ready', worker_id, os.getpid()))
+
+    segments = {}
+    while not stop_event.is_set():
+        try:
+            task_id, op, slot_name, length, options = task_queue.get(timeout=0.2)
+        except queue.Empty:
+            continue
+        # Shared memory, visible to the parent at once: if this process dies before answering,
+        # the parent frees this task's slot (a queued message could be lost with the process)
+        current_task.value = task_id
+
+        try:
+            segment = segments.get(slot_name)
+            if segment is None:
+                # Spawned workers share the parent's resource tracker, which unlinks the slots once
+                segment = segments[slot_name] = shared_memory.SharedMemory(name=slot_name)
+
+            if op == OP_DETECT:
+                view = segment.buf[:length]
+                image = decode_image_buffer(view)
+                view.release()
+                if image is None:
+                    result_queue.put(('result', task_id, None, 'Invalid image data'))
+                    continue
+
+                gray = to_gray(image)
+                faces = detector.detect(image, gray)
+                if len(faces) == 0:
+                    result_queue.put(('result', task_id, None, 'No face detected'))
+                    continue
+                if not options.get('multi_face'):
+                    faces = faces[:1]
+
+                predictions = model.predict(preprocess_faces(gray, faces))
+                detections = [format_detection(box, p) for box, p in zip(faces, predictions)]
+                result_queue.put(('result', task_id, detections, None))
+
+            elif op == OP_PREDICT:
+                count = options['count']
+                batch = np.ndarray((count, 48, 48, 1), dtype=np.float32, buffer=segment.buf).copy()
+                result_queue.put(('result', task_id, np.asarray(model.predict(batch), dtype=np.float32), None))
+
+        except Exception as e:
+            result_queue.put(('result', task_id, None, str(e)))
+
+    for segment in segments.values():
+        segment.close()
+
+
+class _Worker:
+    def __init__(self, worker_id, index, process, stop_event, current_task, cpus):
+        self.id = worker_id
+        self.index = index
+        self.process = process
+        self.stop_event = stop_event
+        self.cpus = cpus
+        # Id of the last task this worker took (shared with the process, -1 before the first)
+        self.current_task = current_task
+        self.ready = threading.Event()
+        self.error = None
+        self.pid = None
+
+
+class InferenceWorkerPool:
+    """Inference in N worker processes, fed through shared-memory slots.
+
+    The request thread copies the encoded frame (or preprocessed face batch)
+    into a free shared-memory slot and sends only the slot name over the task
+    queue, so frames are never pickled. Each worker holds its own model and
+    face detector; decoding, detection and prediction run outside the API
+    process's GIL. Same predict()/predict_many()/stats()/stop() interface as
+    MicroBatcher, plus detect() for whole frames.
+
+    A request that times out does not give its slot back: the task may
+    still be queued or being read by a worker. The slot stays quarantined
+    until the late result arrives (and is dropped) or the worker that took
+    the task dies. Each worker records the task it took in shared memory,
+    so when one dies the monitor frees that task's slot (and fails the
+    request if it is still waiting) before respawning it.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, cpu_spec=INFERENCE_WORKER_CPUS, slots=INFERENCE_WORKER_SLOTS,
+                 slot_bytes=INFERENCE_SLOT_BYTES, timeout=INFERENCE_WORKER_TIMEOUT, backend=None,
+                 watch_path=None, watch_interval=MODEL_WATCH_INTERVAL):
+        self.workers_count = max(1, workers)
+        self.cpu_sets = parse_cpu_affinity(cpu_spec, self.workers_count)
+        self.slot_bytes = slot_bytes
+        self.timeout = timeout
+        self.backend = backend
+
+        # Spawn so workers never inherit a half-initialised TensorFlow from the parent
+        self._ctx = multiprocessing.get_context('spawn')
+        self._task_queue = self._ctx.Queue()
+        self._result_queue = self._ctx.Queue()
+
+        self._segments = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slots)]
+        self._free_slots = queue.Queue()
+        for segment in self._segments:
+            self._free_slots.put(segment)
+
+        self._ids = itertools.count()
+        self._worker_ids = itertools.count()
+        self._pending = {}
+        # Timed-out task id -> its slot
+        self._abandoned = {}
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._stopped = threading.Event()
+        self.restarts = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.late_results = 0
+
+        self._collector = threading.Thread(target=self._collect, name='inference-pool-results', daemon=True)
+        self._collector.start()
+
+        for index in range(self.workers_count):
+            self._spawn(index)
+        try:
+            self._wait_ready(list(self._workers.values()))
+        except Exception:
+            self.stop()
+            raise
+
+        self._monitor = threading.Thread(target=self._watch, args=(watch_path, watch_interval),
+                                         name='inference-pool-monitor', daemon=True)
+        self._monitor.start()
+
+    def _spawn(self, index):
+        worker_id = next(self._worker_ids)
+        stop_event = self._ctx.Event()
+        current_task = self._ctx.Value('q', -1, lock=False)
+        cpus = self.cpu_sets[index % len(self.cpu_sets)]
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._task_queue, self._result_queue, stop_event, current_task, cpus, self.backend),
+            name=f'inference-worker-{worker_id}',
+            daemon=True
+        )
+        worker = _Worker(worker_id, index, process, stop_event, current_task, cpus)
+        with self._lock:
+            self._workers[worker_id] = worker
+        process.start()
+        return worker
+
+    def _wait_ready(self, workers, timeout=300):
+        deadline = time.time() + timeout
+        for worker in workers:
+            while not worker.ready.wait(0.5):
+                if not worker.process.is_alive():
+                    worker.error = worker.error or f'exited with code {worker.process.exitcode}'
+                    break
+                if time.time() > deadline:
+                    worker.error = 'timeout'
+                    break
+            if worker.error:
+                raise Exception(f"Inference worker {worker.id} failed to start: {worker.error}")
+
+    def _collect(self):
+        while not self._stopped.is_set():
+            try:
+                message = self._result_queue.get(timeout=0.5)
+            except (queue.Empty, OSError, EOFError):
+                continue
+
+            kind = message[0]
+            if kind in ('ready', 'failed'):
+                worker = self._workers.get(message[1])
+                if worker is not None:
+                    if kind == 'ready':
+                        worker.pid = message[2]
+                    else:
+                        worker.error = message[2]
+                    worker.ready.set()
+                continue
+
+            _, task_id, value, error = message
+            with self._lock:
+                entry = self._pending.pop(task_id, None)
+                late = self._abandoned.pop(task_id, None) if entry is None else None
+            if late is not None:
+                # Nobody waits for this result any more; only now is the slot safe to reuse
+                self.late_results += 1
+                self._free_slots.put(late)
+            if entry is None:
+                continue
+            future, segment = entry
+            self._free_slots.put(segment)
+            if error:
+                self.failed += 1
+                future.set_result((None, error))
+            else:
+                self.completed += 1
+                future.set_result((value, None))
+
+    def _submit(self, op, data, options):
+        if self._stopped.is_set():
+            raise Exception("Inference pool is stopped")
+        if len(data) > self.slot_bytes:
+            raise Exception("Frame too large for the inference pool")
+
+        try:
+            segment = self._free_slots.get(timeout=self.timeout)
+        except queue.Empty:
+            raise Exception("Inference pool is busy")
+
+        segment.buf[:len(data)] = data
+        task_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[task_id] = (future, segment)
+        self._task_queue.put((task_id, op, segment.name, len(data), options))
+        return task_id, future
+
+    def _await(self, task_id, future, timeout=None):
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except Exception:
+            # The task may still be queued or running: quarantine its slot until the result
+            # arrives or its worker dies, so no other request overwrites the frame being read
+            with self._lock:
+                entry = self._pending.pop(task_id, None)
+                if entry is not None:
+                    self._abandoned[task_id] = entry[1]
+            self.timeouts += 1
+            raise Exception("Inference worker timed out")
+
+    def _release_task_of(self, worker):
+        """Free the slot of the task a dead worker had taken (failing the request if it still waits)"""
+        task_id = worker.current_task.value
+        with self._lock:
+            segment = self._abandoned.pop(task_id, None)
+            entry = self._pending.pop(task_id, None) if segment is None else None
+        if entry is not None:
+            future, segment = entry
+            self.failed += 1
+            future.set_result((None, 'Inference worker exited'))
+        if segment is not None:
+            self._free_slots.put(segment)
+
+    def detect(self, frame_bytes, multi_face=False):
+        """Decode, detect and predict an encoded frame in a worker, returns (detections, error)"""
+        task_id, future = self._submit(OP_DETECT, memoryview(frame_bytes), {'multi_face': multi_face})
+        return self._await(task_id, future)
+
+    def predict_many(self, tensors, timeout=None):
+        """Predict a batch of preprocessed 48x48x1 faces in one worker call"""
+        batch = np.ascontiguousarray(np.stack(list(tensors)), dtype=np.float32)
+        task_id, future = self._submit(OP_PREDICT, memoryview(batch).cast('B'), {'count': len(batch)})
+        predictions, error = self._await(task_id, future, timeout)
+        if error:
+            raise Exception(error)
+        return list(predictions)
+
+    def predict(self, tensor):
+        return self.predict_many([tensor])[0]
+
+    def restart(self):
+        """Rolling restart: start a fresh worker, wait for it, then retire an old one"""
+        with self._lock:
+            old_workers = list(self._workers.values())
+        for old in old_workers:
+            new = self._spawn(old.index)
+            self._wait_ready([new])
+            # The old worker finishes its current task before it exits
+            old.stop_event.set()
+            old.process.join(self.timeout)
+            with self._lock:
+                self._workers.pop(old.id, None)
+        self.restarts += 1
+
+    def _watch(self, path, interval):
+        """Respawn crashed workers and restart all workers when the model file changes"""
+        mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+        while not self._stopped.wait(interval or 5):
+            with self._lock:
+                dead = [w for w in self._workers.values() if not w.process.is_alive() and not w.stop_event.is_set()]
+            for worker in dead:
+                print(f"Inference worker {worker.id} exited, respawning")
+                with self._lock:
+                    self._workers.pop(worker.id, None)
+                self._release_task_of(worker)
+                self._spawn(worker.index)
+
+            if path and interval and os.path.exists(path):
+                current = os.path.getmtime(path)
+                if mtime is not None and current != mtime:
+                    print("Model file changed, restarting inference workers")
+                    try:
+                        self.restart()
+                    except Exception as e:
+                        print(f"Error restarting inference workers: {e}")
+                mtime = current
+
+    def stop(self, timeout=5.0):
+        self._stopped.set()
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.stop_event.set()
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for segment in self._segments:
+            segment.close()
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            workers = [
+                {'id': w.id, 'pid': w.pid, 'alive': w.process.is_alive(), 'cpus': sorted(w.cpus) if w.cpus else None}
+                for w in self._workers.values()
+            ]
+            in_flight = len(self._pending)
+            quarantined = len(self._abandoned)
+        return {
+            'mode': 'process_pool',
+            'workers': workers,
+            'in_flight': in_flight,
+            'free_slots': self._free_slots.qsize(),
+            'quarantined_slots': quarantined,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timeouts': self.timeouts,
+            'late_results': self.late_results,
+            'restarts': self.restarts
+        }
@@ -0,0 +1,122 @@
+"""Build the local recommender's track index (valence/energy per track).
+
+Sources, combined and de-duplicated by track id:
+
+    --csv PATH        a track export with audio features, e.g. a Kaggle
+                      Spotify dataset (id/track_id, name/track_name,
+                      artists, album_name, valence, energy, ...)
+    --from-cache      tracks in the recommendation pool snapshot; their
+                      valence/energy come from Spotify's /audio-features
+                      in batches of 100 (the only network step)
+    --append          keep the tracks already in the index
+
+The index is written to TRACK_INDEX_PATH (atomically, so running workers
+never read half a file) and loaded by the API workers at startup.
+
+Usage (from the repository root):
+    python -m backend.music.build_track_index --csv data/spotify_tracks.csv
+    python -m backend.music.build_track_index --from-cache --append
+"""
+import argparse
+import csv
+import json
+import os
+
+from backend.music.local_recommender import FEATURES, INDEX_COLUMNS, TRACK_INDEX_PATH, read_index_rows
+from backend.music.recommendation_cache import RECOMMENDATION_CACHE_SNAPSHOT
+from backend.music.tracks import format_track
+
+# Spotify accepts at most this many ids per /audio-features call
+AUDIO_FEATURES_BATCH = 100
+
+
+def rows_from_csv(path):
+    """Index rows from a CSV, skipping rows without an id or numeric features"""
+    for row in read_index_rows(path):
+        if not row.get('id'):
+            continue
+        try:
+            for feature in FEATURES:
+                float(row[feature])
+        except (TypeError, ValueError):
+            continue
+        row['id'] = row['id'].rsplit(':', 1)[-1]
+        # Dataset exports list artists as 'A;B'; the API joins them with ', '
+        row['artist'] = ', '.join(name.strip() for name in (row.get('artist') or '').split(';') if name.strip())
+        yield row
+
+
+def cached_tracks(snapshot_path):
+    """Formatted tracks from the recommendation pool snapshot, one per id"""
+    with open(snapshot_path) as f:
+        entries = json.load(f)
+    tracks = {}
+    for entry in entries:
+        for track in entry['tracks']:
+            formatted = format_track(track)
+            if formatted['id']:
+                tracks[formatted['id']] = formatted
+    return list(tracks.values())
+
+
+def rows_from_cache(snapshot_path):
+    """Index rows for the cached tracks, with audio features fetched from Spotify"""
+    from backend.music.spotify_client import spotify
+    from backend.music.spotify_token import SpotifyTokenManager
+
+    tracks = cached_tracks(snapshot_path)
+    token_manager = SpotifyTokenManager(spotify, os.getenv('SPOTIFY_CLIENT_ID'), os.getenv('SPOTIFY_CLIENT_SECRET'))
+
+    for start in range(0, len(tracks), AUDIO_FEATURES_BATCH):
+        batch = tracks[start:start + AUDIO_FEATURES_BATCH]
+        data = spotify.get('/audio-features', token_manager.get(), {'ids': ','.join(t['id'] for t in batch)})
+        features = {f['id']: f for f in data.get('audio_features') or [] if f}
+        for track in batch:
+            if track['id'] in features:
+                row = {column: track.get(column) for column in INDEX_COLUMNS if column not in FEATURES}
+                row.update({feature: features[track['id']].get(feature) for feature in FEATURES})
+                yield row
+        print(f"Fetched audio features for {min(start + AUDIO_FEATURES_BATCH, len(tracks))}/{len(tracks)} cached tracks")
+
+
+def write_index(rows, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=INDEX_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the local recommender track index')
+    parser.add_argument('--csv', action='append', default=[], help='Track CSV with valence/energy (repeatable)')
+    parser.add_argument('--from-cache', action='store_true', help='Add tracks from the recommendation pool snapshot')
+    parser.add_argument('--snapshot', default=RECOMMENDATION_CACHE_SNAPSHOT, help='Recommendation pool snapshot')
+    parser.add_argument('--append', action='store_true', help='Keep the tracks already in the index')
+    parser.add_argument('--output', default=TRACK_INDEX_PATH)
+    args = parser.parse_args()
+
+    if not args.csv and not args.from_cache:
+        parser.error('give at least one --csv or --from-cache')
+
+    rows = {}
+    sources = ([args.output] if args.append and os.path.exists(args.output) else []) + args.csv
+    for path in sources:
+        before = len(rows)
+        for row in rows_from_csv(path):
+            rows[row['id']] = row
+        print(f"{path}: {len(rows) - before} new tracks")
+    if args.from_cache:
+        before = len(rows)
+        for row in rows_from_cache(args.snapshot):
+            rows[row['id']] = row
+        print(f"{args.snapshot}: {len(rows) - before} new tracks")
+
+    write_index(rows.values(), args.output)
+    print(f"Wrote {len(rows)} tracks to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
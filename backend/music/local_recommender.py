@@ -0,0 +1,228 @@
+import csv
+import os
+import random
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Which recommender answers /api/music/recommend: 'local', 'spotify', or 'auto' (local when an index exists)
+RECOMMENDER_BACKEND = os.getenv('RECOMMENDER_BACKEND', 'auto').lower()
+# Track index built by backend.music.build_track_index
+TRACK_INDEX_PATH = os.getenv('TRACK_INDEX_PATH', os.path.join(BASE_DIR, 'cache', 'track_index.csv'))
+# Recently recommended tracks skipped per user
+RECOMMENDER_EXCLUDE_RECENT = int(os.getenv('RECOMMENDER_EXCLUDE_RECENT', 200))
+# Sample the response from the limit * factor nearest tracks, so repeated requests vary
+RECOMMENDER_CANDIDATE_FACTOR = float(os.getenv('RECOMMENDER_CANDIDATE_FACTOR', 3))
+
+# Target audio features per emotion (also sent to Spotify as target_* parameters).
+# A missing feature is not constrained; disgust has no target and samples uniformly.
+EMOTION_TARGETS = {
+    'happy': {'valence': 0.8, 'energy': 0.7},
+    'sad': {'valence': 0.3, 'energy': 0.4},
+    'angry': {'energy': 0.9},
+    'fear': {'valence': 0.5, 'energy': 0.5},
+    'neutral': {'valence': 0.5, 'energy': 0.5},
+    'surprise': {'energy': 0.8},
+    'disgust': {}
+}
+
+FEATURES = ('valence', 'energy')
+
+# Canonical index columns, and the names other exports (e.g. Kaggle Spotify datasets) use for them
+INDEX_COLUMNS = ('id', 'name', 'artist', 'album', 'preview_url', 'spotify_url', 'image_url', 'duration_ms') + FEATURES
+COLUMN_ALIASES = {
+    'id': ('id', 'track_id', 'spotify_id', 'uri'),
+    'name': ('name', 'track_name', 'title'),
+    'artist': ('artist', 'artists', 'artist_name', 'artist_names'),
+    'album': ('album', 'album_name'),
+    'preview_url': ('preview_url',),
+    'spotify_url': ('spotify_url', 'external_url', 'url'),
+    'image_url': ('image_url', 'album_image', 'cover_url'),
+    'duration_ms': ('duration_ms', 'duration'),
+    'valence': ('valence',),
+    'energy': ('energy',)
+}
+
+
+def track_from_row(row):
+    """Formatted track dict (same keys as tracks.format_track) from an index row"""
+    track_id = row['id'].rsplit(':', 1)[-1] if row.get('id') else ''
+    preview_url = row.get('preview_url') or None
+    return {
+        'id': track_id,
+        'name': row.get('name') or 'Unknown',
+        'artist': row.get('artist') or '',
+        'album': row.get('album') or '',
+        'preview_url': preview_url,
+        'spotify_url': row.get('spotify_url') or (f"https://open.spotify.com/track/{track_id}" if track_id else ''),
+        'spotify_embed_url': f"https://open.spotify.com/embed/track/{track_id}" if track_id else None,
+        'image_url': row.get('image_url') or None,
+        'duration_ms': int(float(row['duration_ms'])) if row.get('duration_ms') else 0,
+        'has_preview': preview_url is not None
+    }
+
+
+def read_index_rows(path):
+    """Yield index rows from a CSV with canonical or aliased column names"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        header = {name.strip().lower(): name for name in reader.fieldnames or []}
+        mapping = {}
+        for column, aliases in COLUMN_ALIASES.items():
+            source = next((header[alias] for alias in aliases if alias in header), None)
+            if source is not None:
+                mapping[column] = source
+        missing = [column for column in ('id', 'name') + FEATURES if column not in mapping]
+        if missing:
+            raise Exception(f"{path} has no column for: {', '.join(missing)}")
+
+        for row in reader:
+            yield {column: row[source] for column, source in mapping.items()}
+
+
+class TrackIndex:
+    """In-memory nearest-neighbour index of tracks over (valence, energy).
+
+    The emotion targets are a fixed set of points, so each emotion's tracks
+    are ranked by distance once (a vectorized NumPy pass, on first use) and
+    a query only walks the front of that ranking, skipping excluded ids.
+    Queries take microseconds and need no network.
+    """
+
+    def __init__(self, tracks, features):
+        self.tracks = tracks
+        self.features = np.asarray(features, dtype=np.float32).reshape(-1, len(FEATURES))
+        self.ids = [track['id'] for track in tracks]
+        self._rankings = {}
+        self._lock = threading.Lock()
+        self._counters = {'queries': 0, 'excluded': 0}
+
+    @classmethod
+    def load(cls, path=TRACK_INDEX_PATH):
+        tracks, features, seen = [], [], set()
+        for row in read_index_rows(path):
+            try:
+                vector = [float(row[feature]) for feature in FEATURES]
+            except (TypeError, ValueError):
+                continue
+            track = track_from_row(row)
+            if not track['id'] or track['id'] in seen:
+                continue
+            seen.add(track['id'])
+            tracks.append(track)
+            features.append(vector)
+        return cls(tracks, features)
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def nearest(self, target, k):
+        """Indices of the k tracks closest to target ({feature: value}), nearest first"""
+        k = min(k, len(self.tracks))
+        dims = [i for i, feature in enumerate(FEATURES) if feature in target]
+        if k <= 0 or not dims:
+            return np.empty(0, dtype=np.int64)
+
+        point = np.array([target[FEATURES[i]] for i in dims], dtype=np.float32)
+        distances = np.square(self.features[:, dims] - point).sum(axis=1)
+        if k < len(distances):
+            indices = np.argpartition(distances, k - 1)[:k]
+        else:
+            indices = np.arange(len(distances))
+        return indices[np.argsort(distances[indices], kind='stable')]
+
+    def ranking(self, emotion):
+        """All track indices ordered by distance to the emotion's target (None without a target)"""
+        emotion = emotion.lower()
+        if emotion not in self._rankings:
+            with self._lock:
+                if emotion not in self._rankings:
+                    target = EMOTION_TARGETS.get(emotion, {})
+                    self._rankings[emotion] = self.nearest(target, len(self.tracks)) if target else None
+        return self._rankings[emotion]
+
+    def recommend(self, emotion, limit=20, exclude=(), candidate_factor=RECOMMENDER_CANDIDATE_FACTOR):
+        """Up to limit formatted tracks near the emotion's target, preferring ids not in exclude"""
+        ranking = self.ranking(emotion)
+        candidates = min(max(limit, int(limit * candidate_factor)), len(self.tracks))
+
+        if ranking is None:
+            # No target (disgust): any tracks will do
+            ranking = random.sample(range(len(self.tracks)), min(len(self.tracks), candidates + len(exclude)))
+
+        picked, skipped = [], []
+        for index in ranking:
+            if self.ids[index] in exclude:
+                skipped.append(self.tracks[index])
+                continue
+            picked.append(self.tracks[index])
+            if len(picked) == candidates:
+                break
+        self._counters['excluded'] += len(skipped)
+        self._counters['queries'] += 1
+
+        tracks = random.sample(picked, min(limit, len(picked)))
+        if len(tracks) < limit:
+            # Index too small for the exclusion window: repeat the closest recent tracks
+            tracks += skipped[:limit - len(tracks)]
+        return [dict(track) for track in tracks]
+
+    def stats(self):
+        return dict(self._counters, tracks=len(self.tracks), ranked_emotions=len(self._rankings))
+
+
+class RecentTracks:
+    """Per-user track ids recommended recently, kept in an LRU of users.
+
+    A user's list is loaded once with load(user_id, count) and then updated
+    in process, so exclusion needs no database round trip per request.
+    """
+
+    def __init__(self, load, per_user=RECOMMENDER_EXCLUDE_RECENT, max_users=10000):
+        self.load = load
+        self.per_user = per_user
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            recent = self._users.get(user_id)
+            if recent is not None:
+                self._users.move_to_end(user_id)
+                return set(recent)
+        recent = deque(self.load(user_id, self.per_user), maxlen=self.per_user)
+        with self._lock:
+            self._users.setdefault(user_id, recent)
+            self._trim()
+            return set(self._users[user_id])
+
+    def add(self, user_id, track_ids):
+        with self._lock:
+            recent = self._users.get(user_id)
+            if recent is None:
+                # Not loaded yet; get() will read these from the database
+                return
+            recent.extend(track_ids)
+            self._users.move_to_end(user_id)
+
+    def _trim(self):
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+
+def load_track_index(path=TRACK_INDEX_PATH):
+    """Load the local index if configured and present (None otherwise)"""
+    if RECOMMENDER_BACKEND == 'spotify' or not os.path.exists(path):
+        if RECOMMENDER_BACKEND == 'local':
+            raise Exception(f"Track index not found at {path}")
+        return None
+    index = TrackIndex.load(path)
+    # Rank up front so the first request per emotion does not pay for it
+    for emotion in EMOTION_TARGETS:
+        index.ranking(emotion)
+    print(f"Loaded {len(index)} tracks into the local recommender from {path}")
+    return index
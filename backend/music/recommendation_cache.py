@@ -0,0 +1,212 @@
+import json
+import os
+import random
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Pools are fresh for TTL seconds, refreshed in the background once REFRESH_AHEAD of the
+# TTL has passed, and still served (while refreshing) until STALE seconds old
+RECOMMENDATION_CACHE_TTL = float(os.getenv('RECOMMENDATION_CACHE_TTL', 3600))
+RECOMMENDATION_CACHE_STALE = float(os.getenv('RECOMMENDATION_CACHE_STALE', 86400))
+RECOMMENDATION_REFRESH_AHEAD = float(os.getenv('RECOMMENDATION_REFRESH_AHEAD', 0.8))
+# Tracks kept per pool (grown to twice the largest requested limit, so samples vary between requests)
+RECOMMENDATION_POOL_SIZE = int(os.getenv('RECOMMENDATION_POOL_SIZE', 200))
+# Snapshot file so restarted workers come up warm (empty = no snapshot)
+RECOMMENDATION_CACHE_SNAPSHOT = os.getenv(
+    'RECOMMENDATION_CACHE_SNAPSHOT',
+    os.path.join(BASE_DIR, 'cache', 'recommendation_pools.json')
+)
+
+# Largest limit a pool grows for (larger requests get at most the pool)
+MAX_SAMPLE_LIMIT = 100
+# Spotify returns at most this many tracks per call
+MAX_TRACKS_PER_CALL = 100
+
+
+class RecommendationCache:
+    """Pools of recommended tracks per (emotion, market), sampled for any limit.
+
+    With seven emotions and a fixed seed mapping, Spotify returns the same
+    kind of tracks for every request. Each pool is filled with a few calls
+    of fetch(emotion, market, count) and requests sample from it locally.
+    Only a cold pool blocks a request; an ageing pool is refreshed by one
+    background thread while the old tracks keep being served. A pool is
+    fetched to pool_size tracks and only grows (in the background) when a
+    request asks for more than half of that. Pools are snapshotted to disk
+    and reloaded on startup.
+    """
+
+    def __init__(self, fetch, ttl=RECOMMENDATION_CACHE_TTL, stale=RECOMMENDATION_CACHE_STALE,
+                 refresh_ahead=RECOMMENDATION_REFRESH_AHEAD, pool_size=RECOMMENDATION_POOL_SIZE,
+                 snapshot_path=RECOMMENDATION_CACHE_SNAPSHOT):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale = max(stale, ttl)
+        self.refresh_ahead = refresh_ahead
+        self.pool_size = pool_size
+        self.snapshot_path = snapshot_path
+
+        self._pools = {}
+        # Key -> pool size to fetch next time (pool_size, or twice the largest limit asked for)
+        self._targets = {}
+        self._lock = threading.Lock()
+        # Keys being fetched -> Event set when the fetch finishes (single flight per key)
+        self._inflight = {}
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+        self._load_snapshot()
+
+    def sample(self, emotion, limit=20, market='US'):
+        """Return up to limit tracks for an emotion, fetching the pool only when there is none"""
+        key = (emotion.lower(), market)
+        wanted = max(self.pool_size, 2 * min(limit, MAX_SAMPLE_LIMIT))
+
+        while True:
+            now = time.time()
+            with self._lock:
+                if wanted > self._targets.get(key, 0):
+                    self._targets[key] = wanted
+                pool = self._pools.get(key)
+                age = now - pool['fetched_at'] if pool else None
+
+                if pool and age < self.stale:
+                    if age >= self.ttl:
+                        self._counters['stale_hits'] += 1
+                    else:
+                        self._counters['hits'] += 1
+                    # Refresh ahead of expiry, or grow a pool that is too small for this limit
+                    if (age >= self.ttl * self.refresh_ahead or self._targets[key] > pool['target']) \
+                            and key not in self._inflight:
+                        self._start_refresh(key)
+                    tracks = pool['tracks']
+                    return random.sample(tracks, min(limit, len(tracks)))
+
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._counters['misses'] += 1
+                    waiter = self._inflight[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+
+            if owner:
+                try:
+                    self._refresh(key)
+                finally:
+                    self._finish(key)
+            else:
+                # Another request is filling this pool; use its result
+                waiter.wait()
+                with self._lock:
+                    if key not in self._pools:
+                        raise Exception("No recommendations available")
+
+    def _start_refresh(self, key):
+        # Called with self._lock held
+        self._inflight[key] = threading.Event()
+        threading.Thread(target=self._background_refresh, args=(key,), name='recommendation-refresh', daemon=True).start()
+
+    def _background_refresh(self, key):
+        try:
+            self._refresh(key)
+        except Exception as e:
+            with self._lock:
+                self._counters['refresh_errors'] += 1
+            print(f"Error refreshing recommendations for {key}: {e}")
+        finally:
+            self._finish(key)
+
+    def _finish(self, key):
+        with self._lock:
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _refresh(self, key):
+        emotion, market = key
+        with self._lock:
+            target = self._targets.get(key, self.pool_size)
+        tracks = {}
+        calls = 0
+        # Recommendations vary between calls; stop early when a call adds nothing new
+        while len(tracks) < target and calls < target // MAX_TRACKS_PER_CALL + 2:
+            calls += 1
+            fetched = self.fetch(emotion, market, MAX_TRACKS_PER_CALL)
+            before = len(tracks)
+            for track in fetched:
+                tracks.setdefault(track.get('id') or json.dumps(track, sort_keys=True), track)
+            if len(tracks) == before:
+                break
+
+        if not tracks:
+            raise Exception("No recommendations found")
+
+        with self._lock:
+            self._pools[key] = {'tracks': list(tracks.values()), 'target': target, 'fetched_at': time.time()}
+            self._counters['refreshes'] += 1
+        self._save_snapshot()
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring recommendation snapshot {self.snapshot_path}: {e}")
+            return
+
+        now = time.time()
+        for key, entry in self._snapshot_entries(entries).items():
+            if now - entry['fetched_at'] < self.stale and entry['tracks']:
+                self._pools[key] = {'tracks': entry['tracks'], 'target': entry['target'], 'fetched_at': entry['fetched_at']}
+                self._targets[key] = max(self._targets.get(key, 0), entry['target'])
+
+    @staticmethod
+    def _snapshot_entries(entries):
+        """Newest snapshot entry per (emotion, market); older snapshots also have one per limit bucket"""
+        newest = {}
+        for entry in entries:
+            key = (entry['emotion'], entry['market'])
+            if key not in newest or entry['fetched_at'] > newest[key]['fetched_at']:
+                newest[key] = dict(entry, target=entry.get('target', len(entry['tracks'])))
+        return newest
+
+    def _save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            pools = dict(self._pools)
+        entries = {
+            (emotion, market): {'emotion': emotion, 'market': market, 'target': pool['target'],
+                                'fetched_at': pool['fetched_at'], 'tracks': pool['tracks']}
+            for (emotion, market), pool in pools.items()
+        }
+        # Keep pools other workers refreshed more recently than this one
+        try:
+            with open(self.snapshot_path) as f:
+                for key, entry in self._snapshot_entries(json.load(f)).items():
+                    if key not in entries or entry['fetched_at'] > entries[key]['fetched_at']:
+                        entries[key] = entry
+        except (OSError, ValueError):
+            pass
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            # Write then rename, so other workers never read a half-written file
+            tmp_path = f'{self.snapshot_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(list(entries.values()), f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Error writing recommendation snapshot: {e}")
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            pools = {
+                f'{emotion}/{market}': {'tracks': len(pool['tracks']), 'target': pool['target'],
+                                        'age_seconds': round(now - pool['fetched_at'], 1)}
+                for (emotion, market), pool in self._pools.items()
+            }
+            return dict(self._counters, pools=pools, refreshing=len(self._inflight))
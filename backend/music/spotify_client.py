@@ -0,0 +1,166 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Endpoints (override to point the client at a local stub server)
+SPOTIFY_API_URL = os.getenv('SPOTIFY_API_URL', 'https://api.spotify.com/v1')
+SPOTIFY_ACCOUNTS_URL = os.getenv('SPOTIFY_ACCOUNTS_URL', 'https://accounts.spotify.com/api/token')
+# Keep-alive connections per host and request timeout in seconds
+SPOTIFY_POOL_SIZE = int(os.getenv('SPOTIFY_POOL_SIZE', 10))
+SPOTIFY_TIMEOUT = float(os.getenv('SPOTIFY_TIMEOUT', 10))
+# Retries on 429/5xx and connection errors, with full-jitter exponential backoff
+SPOTIFY_MAX_RETRIES = int(os.getenv('SPOTIFY_MAX_RETRIES', 3))
+SPOTIFY_BACKOFF_BASE = float(os.getenv('SPOTIFY_BACKOFF_BASE', 0.25))
+SPOTIFY_BACKOFF_MAX = float(os.getenv('SPOTIFY_BACKOFF_MAX', 8))
+# Longest Retry-After we are willing to sleep in a request thread
+SPOTIFY_RETRY_AFTER_MAX = float(os.getenv('SPOTIFY_RETRY_AFTER_MAX', 30))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Number of recent calls kept per endpoint for latency percentiles
+LATENCY_SAMPLE_SIZE = 1000
+
+
+class _CallStats:
+    __slots__ = ('calls', 'errors', 'retries', 'latencies')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+
+class SpotifyClient:
+    """Shared HTTP client for the Spotify Web API and accounts service.
+
+    One requests.Session with a connection pool per host, so calls reuse
+    keep-alive TCP/TLS connections instead of opening a new one each time.
+    Responses with 429 or 5xx status are retried with jittered exponential
+    backoff; a Retry-After header takes precedence over the computed delay.
+    Latency (including retries) is recorded per endpoint.
+    """
+
+    def __init__(self, api_url=SPOTIFY_API_URL, accounts_url=SPOTIFY_ACCOUNTS_URL, pool_size=SPOTIFY_POOL_SIZE,
+                 timeout=SPOTIFY_TIMEOUT, max_retries=SPOTIFY_MAX_RETRIES, backoff_base=SPOTIFY_BACKOFF_BASE,
+                 backoff_max=SPOTIFY_BACKOFF_MAX, retry_after_max=SPOTIFY_RETRY_AFTER_MAX):
+        self.api_url = api_url.rstrip('/')
+        self.accounts_url = accounts_url
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size), max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def get(self, path, token, params=None, name=None):
+        """GET an API path (e.g. '/search') with a bearer token, returns the decoded JSON"""
+        response = self._request('GET', f'{self.api_url}{path}', name or path,
+                                 headers={'Authorization': f'Bearer {token}'}, params=params)
+        return response.json()
+
+    def request_token(self, client_id, client_secret):
+        """Client-credentials token request, returns the decoded JSON (access_token, expires_in)"""
+        response = self._request('POST', self.accounts_url, 'token', auth=(client_id, client_secret),
+                                 data={'grant_type': 'client_credentials'})
+        return response.json()
+
+    def _request(self, method, url, name, **kwargs):
+        started = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = self._backoff(attempt)
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        response.raise_for_status()
+                        return response
+                    delay = self._retry_after(response)
+                    if delay is None:
+                        delay = self._backoff(attempt)
+                    elif delay > self.retry_after_max:
+                        # Rate limited for longer than a request can wait
+                        response.raise_for_status()
+                    response.close()
+
+                attempt += 1
+                self._record(name, retried=True)
+                time.sleep(delay)
+        except Exception:
+            self._record(name, error=True)
+            raise
+        finally:
+            self._record(name, latency=time.perf_counter() - started)
+
+    def _backoff(self, attempt):
+        """Full jitter: a random delay up to base * 2^attempt (capped)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None
+
+    def _record(self, name, latency=None, retried=False, error=False):
+        with self._stats_lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _CallStats()
+            if latency is not None:
+                stats.calls += 1
+                stats.latencies.append(latency)
+            if retried:
+                stats.retries += 1
+            if error:
+                stats.errors += 1
+
+    def stats(self):
+        """Calls, errors, retries and latency percentiles per endpoint"""
+        with self._stats_lock:
+            snapshot = {name: (s.calls, s.errors, s.retries, sorted(s.latencies)) for name, s in self._stats.items()}
+
+        def percentile(values, p):
+            if not values:
+                return None
+            index = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+            return round(values[index] * 1000, 3)
+
+        return {
+            name: {
+                'calls': calls,
+                'errors': errors,
+                'retries': retries,
+                'latency_ms': {
+                    'p50': percentile(latencies, 50),
+                    'p90': percentile(latencies, 90),
+                    'p99': percentile(latencies, 99),
+                    'max': round(latencies[-1] * 1000, 3) if latencies else None
+                }
+            }
+            for name, (calls, errors, retries, latencies) in snapshot.items()
+        }
+
+
+# Shared by every request thread in this process
+spotify = SpotifyClient()
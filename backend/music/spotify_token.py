@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process lock (e.g. Windows): each worker refreshes on its own
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Refresh this many seconds before the token expires (in the background, old token still served)
+SPOTIFY_TOKEN_REFRESH_MARGIN = float(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN', 300))
+# A token is no longer handed out this close to its expiry (clock skew, request duration)
+SPOTIFY_TOKEN_EXPIRY_SLACK = float(os.getenv('SPOTIFY_TOKEN_EXPIRY_SLACK', 30))
+# Background refresh failures (e.g. revoked credentials) are retried after this many seconds,
+# doubling up to the maximum
+SPOTIFY_TOKEN_RETRY_MIN = float(os.getenv('SPOTIFY_TOKEN_RETRY_MIN', 5))
+SPOTIFY_TOKEN_RETRY_MAX = float(os.getenv('SPOTIFY_TOKEN_RETRY_MAX', 600))
+# Token file shared by the workers on this host (empty = in-process only)
+SPOTIFY_TOKEN_CACHE = os.getenv('SPOTIFY_TOKEN_CACHE', os.path.join(BASE_DIR, 'cache', 'spotify_token.json'))
+
+
+class SpotifyTokenManager:
+    """Client-credentials token shared by threads and by worker processes.
+
+    Only one thread per process refreshes at a time (single flight), and a
+    file lock around the refresh makes the other processes on the host pick
+    up the new token from the cache file instead of asking Spotify again.
+    Once a token is within refresh_margin of expiry it is refreshed in the
+    background while it keeps being served; callers only block when there
+    is no usable token at all. Failed background refreshes back off
+    exponentially, and without credentials no refresher is started.
+    """
+
+    def __init__(self, client, client_id, client_secret, refresh_margin=SPOTIFY_TOKEN_REFRESH_MARGIN,
+                 expiry_slack=SPOTIFY_TOKEN_EXPIRY_SLACK, cache_path=SPOTIFY_TOKEN_CACHE):
+        self.client = client
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.expiry_slack = expiry_slack
+        self.cache_path = cache_path
+
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._refresher = None
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._counters = {'refreshes': 0, 'shared_hits': 0, 'waits': 0, 'refresh_errors': 0}
+
+    def get(self):
+        """Return a usable access token, refreshing it if needed"""
+        if not (self.client_id and self.client_secret):
+            raise Exception("Spotify credentials are not configured (SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET)")
+        self._start_refresher()
+        now = time.time()
+
+        if self._usable(now):
+            if now >= self._expires_at - self.refresh_margin:
+                # Due for refresh: wake the refresher and keep serving the current token
+                self._wakeup.set()
+            return self._token
+
+        # Nothing usable: wait for (or do) the refresh
+        self._counters['waits'] += 1
+        self.refresh()
+        if not self._usable(time.time()):
+            raise Exception("Failed to get Spotify access token")
+        return self._token
+
+    def refresh(self, force=False):
+        """Refresh the token unless another thread or process just did"""
+        with self._refresh_lock:
+            if not force and self._fresh(time.time()):
+                return
+            with self._file_lock():
+                # Another worker may have refreshed while we waited for the lock
+                if not force and self._read_shared() and self._fresh(time.time()):
+                    self._counters['shared_hits'] += 1
+                    return
+                try:
+                    token_data = self.client.request_token(self.client_id, self.client_secret)
+                except Exception:
+                    self._counters['refresh_errors'] += 1
+                    raise
+                self._token = token_data['access_token']
+                self._expires_at = time.time() + float(token_data['expires_in'])
+                self._counters['refreshes'] += 1
+                self._write_shared()
+
+    def _usable(self, now):
+        return self._token is not None and now < self._expires_at - self.expiry_slack
+
+    def _fresh(self, now):
+        return self._token is not None and now < self._expires_at - self.refresh_margin
+
+    def _start_refresher(self):
+        if self._refresher is not None:
+            return
+        with self._start_lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._run, name='spotify-token-refresh', daemon=True)
+                self._refresher.start()
+
+    def _run(self):
+        """Refresh ahead of expiry so request threads rarely see an expiring token"""
+        retry_delay = None
+        while True:
+            if retry_delay is not None:
+                delay = retry_delay
+            else:
+                delay = self._expires_at - self.refresh_margin - time.time() if self._token else 0
+            self._wakeup.wait(max(delay, 1.0))
+            self._wakeup.clear()
+            if self._fresh(time.time()):
+                retry_delay = None
+                continue
+            try:
+                self.refresh()
+                retry_delay = None
+            except Exception as e:
+                retry_delay = min(retry_delay * 2, SPOTIFY_TOKEN_RETRY_MAX) if retry_delay else SPOTIFY_TOKEN_RETRY_MIN
+                print(f"Error refreshing Spotify token: {e} (retrying in {retry_delay:.0f}s)")
+
+    def _file_lock(self):
+        return _FileLock(f'{self.cache_path}.lock' if self.cache_path and fcntl else None)
+
+    def _read_shared(self):
+        """Adopt the token from the shared cache file if it is newer than ours"""
+        if not self.cache_path:
+            return False
+        try:
+            with open(self.cache_path) as f:
+                shared = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if shared.get('client_id') != self.client_id or shared['expires_at'] <= self._expires_at:
+            return False
+        self._token, self._expires_at = shared['access_token'], shared['expires_at']
+        return True
+
+    def _write_shared(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+            # The token is a credential: readable by this user only
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'client_id': self.client_id, 'access_token': self._token, 'expires_at': self._expires_at}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Error writing Spotify token cache: {e}")
+
+    def stats(self):
+        return dict(self._counters, expires_in=round(self._expires_at - time.time(), 1) if self._token else None)
+
+
+class _FileLock:
+    """Exclusive flock on a lock file (no-op when path is None)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if self.path:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
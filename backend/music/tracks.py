@@ -0,0 +1,134 @@
+import hashlib
+
+# Catalog columns (tracks table) and recommendation columns, in insert order
+TRACK_COLUMNS = ('track_id', 'name', 'artist', 'album', 'preview_url', 'spotify_url', 'image_url', 'duration_ms')
+RECOMMENDATION_COLUMNS = ('user_id', 'emotion_history_id', 'track_id')
+
+# Placeholder and upsert syntax per database (sqlite is used by the benchmarks as a MySQL stand-in)
+SQL_DIALECTS = {
+    'mysql': {'placeholder': '%s', 'upsert': 'ON DUPLICATE KEY UPDATE {}', 'new_value': 'VALUES({0})'},
+    'sqlite': {'placeholder': '?', 'upsert': 'ON CONFLICT(track_id) DO UPDATE SET {}', 'new_value': 'excluded.{0}'}
+}
+
+
+def catalog_key(track_id, name, artist, album):
+    """Catalog key of a formatted track: the Spotify id, or a content hash for tracks without one.
+
+    The hash matches the one migrate_tracks computes in SQL for old rows:
+    MD5(CONCAT_WS('|', name, artist, album)).
+    """
+    if track_id:
+        return track_id
+    parts = '|'.join(value for value in (name, artist, album) if value is not None)
+    return 'legacy:' + hashlib.md5(parts.encode('utf-8')).hexdigest()
+
+
+def format_track(track):
+    """Normalize a Spotify track object into the API's track dict (one pass per track)"""
+    track_id = track.get('id') or ''
+    preview_url = track.get('preview_url')
+    album = track.get('album') or {}
+    images = album.get('images') or []
+
+    return {
+        'id': track_id,
+        'name': track.get('name', 'Unknown'),
+        'artist': ', '.join(artist.get('name', '') for artist in track.get('artists') or []),
+        'album': album.get('name', ''),
+        'preview_url': preview_url,
+        'spotify_url': (track.get('external_urls') or {}).get('spotify', ''),
+        'spotify_embed_url': f"https://open.spotify.com/embed/track/{track_id}" if track_id else None,
+        'image_url': images[0].get('url') if images else None,
+        'duration_ms': track.get('duration_ms', 0),
+        'has_preview': preview_url is not None
+    }
+
+
+def format_tracks(tracks):
+    """Format a list of Spotify tracks, skipping malformed entries"""
+    formatted = []
+    for track in tracks:
+        try:
+            formatted.append(format_track(track))
+        except Exception as e:
+            print(f"Error processing track: {e}")
+    return formatted
+
+
+def track_key(track):
+    return catalog_key(track['id'], track['name'], track['artist'], track['album'])
+
+
+def catalog_rows(tracks):
+    """tracks table rows (TRACK_COLUMNS order) for formatted tracks, one per distinct key"""
+    rows = {}
+    for t in tracks:
+        key = track_key(t)
+        rows[key] = (key, t['name'], t['artist'], t['album'],
+                     t['preview_url'], t['spotify_url'], t['image_url'], t['duration_ms'])
+    return list(rows.values())
+
+
+def recommendation_rows(user_id, emotion_history_id, tracks):
+    """music_recommendations rows (RECOMMENDATION_COLUMNS order) for formatted tracks"""
+    return [(user_id, emotion_history_id, track_key(t)) for t in tracks]
+
+
+def _values(columns, count, placeholder):
+    row = '(' + ', '.join([placeholder] * len(columns)) + ')'
+    return ', '.join([row] * count)
+
+
+def changed_catalog_rows(cursor, rows, dialect='mysql'):
+    """The catalog rows that are missing from tracks or whose metadata differs (one plain, non-locking read)"""
+    if not rows:
+        return []
+    placeholder = SQL_DIALECTS[dialect]['placeholder']
+    cursor.execute(
+        f"SELECT {', '.join(TRACK_COLUMNS)} FROM tracks WHERE track_id IN ({', '.join([placeholder] * len(rows))})",
+        [row[0] for row in rows]
+    )
+    stored = {tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()}
+    return [row for row in rows if tuple(row) not in stored]
+
+
+def upsert_tracks(cursor, rows, dialect='mysql'):
+    """Add tracks to the catalog (refreshing their metadata) with one multi-row statement.
+
+    Rows are written in track_id order so concurrent requests with
+    overlapping tracks lock them in the same order.
+    """
+    if not rows:
+        return 0
+    rows = sorted(rows, key=lambda row: row[0])
+    sql = SQL_DIALECTS[dialect]
+    updates = ', '.join(f"{column} = {sql['new_value'].format(column)}" for column in TRACK_COLUMNS[1:])
+    cursor.execute(
+        f"INSERT INTO tracks ({', '.join(TRACK_COLUMNS)}) VALUES {_values(TRACK_COLUMNS, len(rows), sql['placeholder'])} "
+        + sql['upsert'].format(updates),
+        [value for row in rows for value in row]
+    )
+    return len(rows)
+
+
+def insert_recommendations(cursor, rows, dialect='mysql'):
+    """Insert all recommendation rows with one multi-row INSERT (a single round trip)"""
+    if not rows:
+        return 0
+    placeholder = SQL_DIALECTS[dialect]['placeholder']
+    cursor.execute(
+        f"INSERT INTO music_recommendations ({', '.join(RECOMMENDATION_COLUMNS)}) "
+        f"VALUES {_values(RECOMMENDATION_COLUMNS, len(rows), placeholder)}",
+        [value for row in rows for value in row]
+    )
+    return len(rows)
+
+
+def save_recommendations(cursor, user_id, emotion_history_id, tracks, dialect='mysql'):
+    """Add new or changed tracks to the catalog and record them as recommended to a user.
+
+    Tracks already in the catalog with the same metadata are not written
+    (or locked) again.
+    """
+    upsert_tracks(cursor, changed_catalog_rows(cursor, catalog_rows(tracks), dialect), dialect)
+    return insert_recommendations(cursor, recommendation_rows(user_id, emotion_history_id, tracks), dialect)
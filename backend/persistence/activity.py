@@ -0,0 +1,84 @@
+from backend.persistence.pagination import keyset, paginate
+
+PLACEHOLDERS = {'mysql': '%s', 'sqlite': '?'}
+
+
+def activity_page(cursor, user_id, limit, page_cursor=None, dialect='mysql'):
+    """One page of a user's detections with their recommendation counts, and its pagination.
+
+    The page is read from emotion_history alone (a range scan on
+    idx_user_created); recommendations_count is kept on each row when
+    recommendations are saved. Rows from before the column existed have
+    NULL there until backfill_activity_counts runs; those are counted
+    with one query for the page.
+    """
+    placeholder = PLACEHOLDERS[dialect]
+    where, params, order = keyset(page_cursor, placeholder=placeholder)
+    cursor.execute(
+        f"""SELECT id, emotion, confidence, detection_type, created_at, recommendations_count
+           FROM emotion_history
+           WHERE user_id = {placeholder}{where}
+           ORDER BY {order}
+           LIMIT {placeholder}""",
+        (user_id, *params, limit + 1)
+    )
+    activity, pagination = paginate(_dicts(cursor), limit, page_cursor)
+
+    missing = [item['id'] for item in activity if item['recommendations_count'] is None]
+    if missing:
+        counts = recommendation_counts(cursor, missing, dialect)
+        for item in activity:
+            if item['recommendations_count'] is None:
+                item['recommendations_count'] = counts.get(item['id'], 0)
+    return activity, pagination
+
+
+def recommendation_counts(cursor, history_ids, dialect='mysql'):
+    """{emotion_history_id: recommendations} for the given detections, in one query"""
+    if not history_ids:
+        return {}
+    placeholder = PLACEHOLDERS[dialect]
+    cursor.execute(
+        f"""SELECT emotion_history_id, COUNT(*) FROM music_recommendations
+           WHERE emotion_history_id IN ({', '.join([placeholder] * len(history_ids))})
+           GROUP BY emotion_history_id""",
+        tuple(history_ids)
+    )
+    return {row[0]: row[1] for row in (_values(row) for row in cursor.fetchall())}
+
+
+def add_recommendations(cursor, user_id, emotion_history_id, count, dialect='mysql'):
+    """Add count recommendations to a detection's recommendations_count (same transaction as the insert)"""
+    if emotion_history_id is None or not count:
+        return
+    placeholder = PLACEHOLDERS[dialect]
+    # NULL (not backfilled yet) stays NULL and is counted on read
+    cursor.execute(
+        f"""UPDATE emotion_history SET recommendations_count = recommendations_count + {placeholder}
+           WHERE id = {placeholder} AND user_id = {placeholder}""",
+        (count, emotion_history_id, user_id)
+    )
+
+
+def backfill_counts(cursor, start, end):
+    """Fill NULL recommendations_count for emotion_history ids in [start, end], returns rows updated"""
+    cursor.execute(
+        """UPDATE emotion_history eh
+           SET recommendations_count = (
+               SELECT COUNT(*) FROM music_recommendations mr WHERE mr.emotion_history_id = eh.id)
+           WHERE eh.id BETWEEN %s AND %s AND eh.recommendations_count IS NULL""",
+        (start, end)
+    )
+    return cursor.rowcount
+
+
+def _dicts(cursor):
+    rows = cursor.fetchall()
+    if rows and not isinstance(rows[0], dict):
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in rows]
+    return rows
+
+
+def _values(row):
+    return tuple(row.values()) if isinstance(row, dict) else row
@@ -0,0 +1,273 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from backend.config.database import connection_pool
+from backend.persistence import rollups, user_stats
+
+# Write detections from a background flusher instead of the request thread. Single-worker deploys only:
+# the id is returned before the row exists, and only this process can wait for it (wait_for), so a
+# follow-up request served by another worker would not find the row
+HISTORY_WRITE_BEHIND = os.getenv('HISTORY_WRITE_BEHIND', '0').lower() in ('1', 'true', 'yes', 'on')
+# Flush when this many rows are buffered or the oldest buffered row is this old
+HISTORY_FLUSH_ROWS = int(os.getenv('HISTORY_FLUSH_ROWS', 200))
+HISTORY_FLUSH_MS = float(os.getenv('HISTORY_FLUSH_MS', 100))
+# Bounded queue (pending save calls); a full queue blocks callers for up to the enqueue timeout
+HISTORY_QUEUE_SIZE = int(os.getenv('HISTORY_QUEUE_SIZE', 5000))
+HISTORY_ENQUEUE_TIMEOUT = float(os.getenv('HISTORY_ENQUEUE_TIMEOUT', 2))
+# Ids reserved from id_sequences per round trip
+HISTORY_ID_BLOCK = int(os.getenv('HISTORY_ID_BLOCK', 100))
+# How long reads wait for this worker's unwritten rows of the same user
+HISTORY_WAIT_TIMEOUT = float(os.getenv('HISTORY_WAIT_TIMEOUT', 5))
+
+FLUSH_ATTEMPTS = 3
+
+logger = logging.getLogger(__name__)
+
+
+class IdAllocator:
+    """Hand out primary keys for a table in blocks reserved from id_sequences.
+
+    Ids are known before the row is written, so a caller can return them
+    right away and a background writer inserts the rows later. The block
+    always starts above the table's current MAX(id), so rows inserted with
+    AUTO_INCREMENT elsewhere cannot collide with a reserved block.
+    """
+
+    def __init__(self, table, block_size=HISTORY_ID_BLOCK):
+        self.table = table
+        self.block_size = max(1, block_size)
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def allocate(self, count):
+        with self._lock:
+            ids = []
+            while len(ids) < count:
+                if self._next >= self._end:
+                    self._next, self._end = self._reserve()
+                take = min(count - len(ids), self._end - self._next)
+                ids.extend(range(self._next, self._next + take))
+                self._next += take
+            return ids
+
+    def _reserve(self):
+        # Own checkout, not the request's connection: this commits independently of the handler
+        connection = connection_pool.checkout()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("INSERT IGNORE INTO id_sequences (name, next_id) VALUES (%s, 1)", (self.table,))
+            cursor.execute(
+                f"""UPDATE id_sequences
+                   SET next_id = LAST_INSERT_ID(
+                       GREATEST(next_id, (SELECT COALESCE(MAX(id), 0) + 1 FROM {self.table})) + %s)
+                   WHERE name = %s""",
+                (self.block_size, self.table)
+            )
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            end = int(cursor.fetchone()[0])
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+        return end - self.block_size, end
+
+
+class HistoryWriter:
+    """Write-behind persistence for emotion_history.
+
+    save() assigns ids from an IdAllocator and queues the rows; a flusher
+    thread inserts them with one executemany every flush_rows rows or
+    flush_ms milliseconds. The queue is bounded: when the database falls
+    behind, save() blocks (up to enqueue_timeout) instead of buffering
+    without limit. Pending rows are flushed on stop() and at interpreter exit.
+
+    Write-behind is off by default: with several API workers a returned id
+    can be referenced (e.g. by /api/music/recommend) on a worker that has
+    not seen the row yet. Turn it on only when one worker serves the API.
+    """
+
+    def __init__(self, write_behind=HISTORY_WRITE_BEHIND, flush_rows=HISTORY_FLUSH_ROWS, flush_ms=HISTORY_FLUSH_MS,
+                 max_queue=HISTORY_QUEUE_SIZE, enqueue_timeout=HISTORY_ENQUEUE_TIMEOUT):
+        self.write_behind = write_behind
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = max(0.0, flush_ms) / 1000.0
+        self.enqueue_timeout = enqueue_timeout
+
+        self._ids = IdAllocator('emotion_history')
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        # Row id -> user id for rows queued but not written yet
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._stats = {'queued': 0, 'written': 0, 'batches': 0, 'retries': 0, 'dropped': 0, 'rejected': 0,
+                       'last_batch_rows': 0, 'last_flush_ms': None}
+
+        self._stopped = threading.Event()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def save(self, user_id, detections, detection_type):
+        """Persist one row per detection and return their ids (rows may not be written yet)"""
+        ids = self._ids.allocate(len(detections))
+        # created_at is taken from the database clock when the rows are written (see _write)
+        detected_at = time.monotonic()
+        rows = [
+            (history_id, user_id, d['emotion'], d['confidence'], detection_type, detected_at)
+            for history_id, d in zip(ids, detections)
+        ]
+
+        if not self.write_behind or self._stopped.is_set():
+            self._write(rows)
+            return ids
+
+        self._ensure_started()
+        with self._cond:
+            for history_id in ids:
+                self._pending[history_id] = user_id
+        try:
+            self._queue.put(rows, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._release(ids)
+            with self._cond:
+                self._stats['rejected'] += len(rows)
+            raise Exception("Emotion history write queue is full")
+
+        with self._cond:
+            self._stats['queued'] += len(rows)
+        return ids
+
+    def wait_for(self, ids, timeout=HISTORY_WAIT_TIMEOUT):
+        """Block until the given ids are written by this process (True if none are pending)"""
+        ids = [int(history_id) for history_id in ids if history_id is not None]
+        with self._cond:
+            return self._cond.wait_for(lambda: not any(i in self._pending for i in ids), timeout)
+
+    def wait_for_user(self, user_id, timeout=HISTORY_WAIT_TIMEOUT):
+        """Block until this process has no unwritten rows for a user (read-your-writes for history reads)"""
+        with self._cond:
+            return self._cond.wait_for(lambda: user_id not in self._pending.values(), timeout)
+
+    def flush(self, timeout=None):
+        """Block until every queued row is written"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+
+    def stop(self, timeout=10.0):
+        """Stop accepting queued writes, flush what is buffered and stop the flusher"""
+        self._stopped.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, pending_rows=len(self._pending), queue_depth=self._queue.qsize(),
+                        write_behind=self.write_behind)
+
+    def _ensure_started(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='emotion-history-writer', daemon=True)
+                self._worker.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            try:
+                rows = list(self._queue.get(timeout=0.2))
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+                continue
+
+            # Keep collecting until the batch is full or the first row has waited flush_ms
+            deadline = time.monotonic() + (0 if self._stopped.is_set() else self.flush_interval)
+            while len(rows) < self.flush_rows:
+                remaining = deadline - time.monotonic()
+                try:
+                    rows.extend(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._flush(rows)
+
+    def _flush(self, rows):
+        started = time.perf_counter()
+        dropped = []
+        for attempt in range(FLUSH_ATTEMPTS):
+            try:
+                self._write(rows)
+                break
+            except Exception as e:
+                if attempt == FLUSH_ATTEMPTS - 1:
+                    # One bad row (deleted user, duplicate id) must not lose the rest of the batch
+                    logger.warning("Writing %d emotion history rows failed (%s), retrying row by row", len(rows), e)
+                    dropped = self._write_each(rows)
+                    break
+                with self._cond:
+                    self._stats['retries'] += 1
+                time.sleep(0.1 * 2 ** attempt)
+
+        with self._cond:
+            self._stats['written'] += len(rows) - len(dropped)
+            self._stats['dropped'] += len(dropped)
+            self._stats['batches'] += 1
+            self._stats['last_batch_rows'] = len(rows)
+            self._stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        self._release([row[0] for row in rows])
+
+    def _write_each(self, rows):
+        """Write rows one transaction each; returns the rows that could not be written"""
+        dropped = []
+        for row in rows:
+            try:
+                self._write([row])
+            except Exception as e:
+                logger.error("Dropping emotion history row id=%s user_id=%s emotion=%s (detected %.1f s ago): %s",
+                             row[0], row[1], row[2], time.monotonic() - row[5], e)
+                dropped.append(row)
+        return dropped
+
+    def _release(self, ids):
+        with self._cond:
+            for history_id in ids:
+                self._pending.pop(history_id, None)
+            self._cond.notify_all()
+
+    def _write(self, rows):
+        # Own checkout even when called from a request thread (write-behind off)
+        connection = connection_pool.checkout()
+        cursor = connection.cursor()
+        try:
+            # Timestamps in the database's clock and session time zone, like the CURRENT_TIMESTAMP of
+            # rows inserted elsewhere, backdated by how long each row waited in the queue
+            cursor.execute("SELECT NOW()")
+            db_now, now = cursor.fetchone()[0], time.monotonic()
+            rows = [row[:5] + ((db_now - timedelta(seconds=now - row[5])).replace(microsecond=0),) for row in rows]
+            cursor.executemany(
+                """INSERT INTO emotion_history (id, user_id, emotion, confidence, detection_type, created_at)
+                   VALUES (%s, %s, %s, %s, %s, %s)""",
+                rows
+            )
+            # Same transaction: the per-user aggregates and rollups move with the rows
+            user_stats.record_detections(cursor, [(user_id, emotion, created_at)
+                                                  for _, user_id, emotion, _, _, created_at in rows])
+            rollups.record_detections(cursor, [(user_id, emotion, confidence, created_at)
+                                               for _, user_id, emotion, confidence, _, created_at in rows])
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+
+# Shared by every blueprint in this process
+history_writer = HistoryWriter()
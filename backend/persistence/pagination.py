@@ -0,0 +1,141 @@
+import base64
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Largest page a client can ask for
+MAX_PAGE_SIZE = int(os.getenv('PAGINATION_MAX_LIMIT', 100))
+# Seconds a ?include_total count is reused before COUNT(*) runs again
+PAGINATION_COUNT_TTL = float(os.getenv('PAGINATION_COUNT_TTL', 60))
+
+
+class PageCursor:
+    """Position in a (created_at DESC, id DESC) listing.
+
+    'next' pages continue with older rows after (created_at, id), 'prev'
+    pages return the newer rows before it.
+    """
+
+    __slots__ = ('created_at', 'id', 'direction')
+
+    def __init__(self, created_at, id, direction='next'):
+        self.created_at = created_at
+        self.id = id
+        self.direction = direction
+
+    def encode(self):
+        """Opaque URL-safe token for the client to send back as ?cursor="""
+        raw = json.dumps([self.direction[0], self.created_at, self.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @classmethod
+    def decode(cls, token):
+        """Parse a token from encode(); raises ValueError for anything else"""
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            direction, created_at, row_id = json.loads(raw)
+            datetime.fromisoformat(created_at)
+        except Exception:
+            raise ValueError('Invalid cursor')
+        if direction not in ('n', 'p') or not isinstance(row_id, int):
+            raise ValueError('Invalid cursor')
+        return cls(created_at, row_id, 'next' if direction == 'n' else 'prev')
+
+    @classmethod
+    def from_row(cls, row, direction):
+        # str() of a DATETIME/TIMESTAMP is 'YYYY-MM-DD HH:MM:SS', which MySQL and SQLite both compare correctly
+        return cls(str(row['created_at']), row['id'], direction)
+
+
+def page_args(args, default_limit):
+    """(limit, cursor or None) from request args; raises ValueError for a bad cursor or the old ?page="""
+    if 'page' in args:
+        # Offset paging was replaced by cursors; ignoring it would silently return page 1 every time
+        raise ValueError('The page parameter is no longer supported; pass pagination.next_cursor as ?cursor= instead')
+    limit = args.get('limit', default_limit, type=int) or default_limit
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    token = args.get('cursor')
+    return limit, PageCursor.decode(token) if token else None
+
+
+def wants_total(args):
+    """Whether the client asked for the (cached) total with ?include_total=1"""
+    return str(args.get('include_total', '')).lower() in ('1', 'true', 'yes', 'on')
+
+
+def keyset(cursor, prefix='', placeholder='%s'):
+    """WHERE fragment (starting with ' AND ', may be empty), its params and the ORDER BY for a page.
+
+    The bare created_at bound is what makes this a range scan on the
+    (user_id, created_at, id) index from the cursor onwards; the OR only
+    filters rows tied with the cursor's timestamp.
+    """
+    created_at, row_id = f'{prefix}created_at', f'{prefix}id'
+    if cursor is None:
+        return '', (), f'{created_at} DESC, {row_id} DESC'
+
+    op, order = ('<', 'DESC') if cursor.direction == 'next' else ('>', 'ASC')
+    condition = (f' AND {created_at} {op}= {placeholder} AND '
+                 f'({created_at} {op} {placeholder} OR {row_id} {op} {placeholder})')
+    return condition, (cursor.created_at, cursor.created_at, cursor.id), f'{created_at} {order}, {row_id} {order}'
+
+
+def paginate(rows, limit, cursor):
+    """Trim rows fetched with LIMIT limit + 1 to one page, newest first, and build the cursors"""
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    backwards = cursor is not None and cursor.direction == 'prev'
+    if backwards:
+        rows.reverse()
+
+    # Going forwards there are older rows only if the extra row came back; going
+    # backwards there always are (we came from them), and newer ones only if it did
+    has_next = bool(rows) and (backwards or has_more)
+    has_prev = bool(rows) and cursor is not None and (has_more or not backwards)
+    return rows, {
+        'limit': limit,
+        'next_cursor': PageCursor.from_row(rows[-1], 'next').encode() if has_next else None,
+        'prev_cursor': PageCursor.from_row(rows[0], 'prev').encode() if has_prev else None
+    }
+
+
+def count_rows(cursor, table, user_id):
+    """COUNT(*) of a user's rows in table (uses the user_id index)"""
+    cursor.execute(f"SELECT COUNT(*) AS total FROM {table} WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    return row['total'] if isinstance(row, dict) else row[0]
+
+
+class CountCache:
+    """Row counts per key (e.g. (table, user_id)) reused for ttl seconds"""
+
+    def __init__(self, ttl=PAGINATION_COUNT_TTL, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, count):
+        """Cached count for key, calling count() when missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                return entry[0]
+
+        value = count()
+        with self._lock:
+            if len(self._counts) >= self.max_entries:
+                self._counts.clear()
+            self._counts[key] = (value, now)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
+
+
+# Shared by the history and activity endpoints of this worker
+count_cache = CountCache()
@@ -0,0 +1,188 @@
+import os
+from datetime import datetime, timedelta
+
+# Buckets kept in emotion_rollups; weeks are folded from day buckets when read
+STORED_GRANULARITIES = ('hour', 'day')
+GRANULARITIES = ('hour', 'day', 'week')
+SOURCE_GRANULARITY = {'hour': 'hour', 'day': 'day', 'week': 'day'}
+BUCKET_LENGTH = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+
+# Most buckets one stats request may cover, and the range used when none is given
+ROLLUP_MAX_BUCKETS = int(os.getenv('ROLLUP_MAX_BUCKETS', 1000))
+DEFAULT_SPAN = {'hour': timedelta(days=2), 'day': timedelta(days=30), 'week': timedelta(weeks=26)}
+
+# History rows before this were compacted away; their counts only exist in the rollups
+EPOCH = datetime(1970, 1, 1)
+
+# Placeholder and upsert syntax per database (sqlite is used by the benchmarks as a MySQL stand-in)
+SQL_DIALECTS = {
+    'mysql': {'placeholder': '%s', 'upsert': 'ON DUPLICATE KEY UPDATE {}', 'new_value': 'VALUES({0})'},
+    'sqlite': {'placeholder': '?', 'upsert': 'ON CONFLICT(user_id, granularity, bucket_start, emotion) DO UPDATE SET {}',
+               'new_value': 'excluded.{0}'}
+}
+
+
+def bucket_start(moment, granularity):
+    """Start of the hour, day or week (Monday) containing moment"""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return day
+    return day - timedelta(days=day.weekday())
+
+
+def bucket_range(start, end, granularity):
+    """[start, end) widened to whole buckets"""
+    end_bucket = bucket_start(end, granularity)
+    if end_bucket != end:
+        end_bucket += BUCKET_LENGTH[granularity]
+    return bucket_start(start, granularity), end_bucket
+
+
+def parse_range(args, granularity):
+    """[start, end) from ISO date/datetime request args; raises ValueError with a client-facing message"""
+    try:
+        end = datetime.fromisoformat(args['end']) if args.get('end') else datetime.now()
+        start = datetime.fromisoformat(args['start']) if args.get('start') else end - DEFAULT_SPAN[granularity]
+    except ValueError:
+        raise ValueError('start and end must be ISO 8601 dates')
+    if start.tzinfo is not None or end.tzinfo is not None:
+        # Rows are stored in server local time without an offset
+        raise ValueError('start and end must not include a timezone')
+    if start >= end:
+        raise ValueError('start must be before end')
+    if (end - start) / BUCKET_LENGTH[granularity] > ROLLUP_MAX_BUCKETS:
+        raise ValueError(f'Range too long for {granularity} buckets (at most {ROLLUP_MAX_BUCKETS})')
+    return start, end
+
+
+def _datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def record_detections(cursor, rows, dialect='mysql'):
+    """Add emotion_history rows (user_id, emotion, confidence, created_at) to the hour and day rollups.
+
+    Call it in the transaction that inserts the rows. Rows are folded per
+    (user, bucket, emotion) first and written with one multi-row upsert,
+    in key order so concurrent batches lock rows in the same order.
+    """
+    if not rows:
+        return
+
+    folded = {}
+    for user_id, emotion, confidence, created_at in rows:
+        for granularity in STORED_GRANULARITIES:
+            key = (user_id, granularity, bucket_start(created_at, granularity), emotion)
+            detections, confidence_sum = folded.get(key, (0, 0.0))
+            folded[key] = (detections + 1, confidence_sum + (confidence or 0.0))
+
+    sql = SQL_DIALECTS[dialect]
+    row = '(' + ', '.join([sql['placeholder']] * 6) + ')'
+    updates = ', '.join(f"{column} = {column} + {sql['new_value'].format(column)}"
+                        for column in ('detections', 'confidence_sum'))
+    cursor.execute(
+        f"""INSERT INTO emotion_rollups (user_id, granularity, bucket_start, emotion, detections, confidence_sum)
+           VALUES {', '.join([row] * len(folded))} """ + sql['upsert'].format(updates),
+        [value for key in sorted(folded) for value in (*key, *folded[key])]
+    )
+
+
+def timeline(cursor, user_id, granularity, start, end, dialect='mysql'):
+    """Per-bucket emotion counts and mean confidence of a user over [start, end).
+
+    Returns (buckets, start, end) with the range widened to whole buckets;
+    each bucket is {'bucket_start', 'total', 'emotions': {emotion: {'count', 'mean_confidence'}}}
+    and only buckets with detections are listed.
+    """
+    start, end = bucket_range(start, end, granularity)
+    placeholder = SQL_DIALECTS[dialect]['placeholder']
+    cursor.execute(
+        f"""SELECT bucket_start, emotion, detections, confidence_sum FROM emotion_rollups
+           WHERE user_id = {placeholder} AND granularity = {placeholder}
+             AND bucket_start >= {placeholder} AND bucket_start < {placeholder}
+           ORDER BY bucket_start""",
+        (user_id, SOURCE_GRANULARITY[granularity], start, end)
+    )
+
+    buckets = {}
+    # Stored bucket -> requested bucket (one per stored bucket, not per emotion row)
+    targets = {}
+    for row in cursor.fetchall():
+        if isinstance(row, dict):
+            row = (row['bucket_start'], row['emotion'], row['detections'], row['confidence_sum'])
+        moment, emotion, detections, confidence_sum = row
+        bucket = targets.get(moment)
+        if bucket is None:
+            bucket = targets[moment] = buckets.setdefault(bucket_start(_datetime(moment), granularity), {})
+        count, total_confidence = bucket.get(emotion, (0, 0.0))
+        bucket[emotion] = (count + detections, total_confidence + confidence_sum)
+
+    return [
+        {
+            'bucket_start': moment,
+            'total': sum(count for count, _ in emotions.values()),
+            'emotions': {
+                emotion: {'count': count, 'mean_confidence': total_confidence / count if count else None}
+                for emotion, (count, total_confidence) in emotions.items()
+            }
+        }
+        for moment, emotions in sorted(buckets.items())
+    ], start, end
+
+
+def summarize(buckets):
+    """(total, distribution sorted by count) over timeline() buckets"""
+    emotions = {}
+    for bucket in buckets:
+        for emotion, values in bucket['emotions'].items():
+            count, total_confidence = emotions.get(emotion, (0, 0.0))
+            emotions[emotion] = (count + values['count'],
+                                 total_confidence + values['count'] * (values['mean_confidence'] or 0.0))
+    distribution = [
+        {'emotion': emotion, 'count': count, 'mean_confidence': total_confidence / count if count else None}
+        for emotion, (count, total_confidence) in emotions.items()
+    ]
+    distribution.sort(key=lambda item: (-item['count'], item['emotion']))
+    return sum(item['count'] for item in distribution), distribution
+
+
+def compacted_before(cursor):
+    """Watermark below which emotion_history rows may have been deleted (EPOCH if never compacted)"""
+    cursor.execute("SELECT compacted_before FROM history_compaction WHERE id = 1")
+    row = cursor.fetchone()
+    if row is None:
+        return EPOCH
+    return _datetime(row['compacted_before'] if isinstance(row, dict) else row[0])
+
+
+def set_compacted_before(cursor, moment):
+    cursor.execute(
+        """INSERT INTO history_compaction (id, compacted_before) VALUES (1, %s)
+           ON DUPLICATE KEY UPDATE compacted_before = GREATEST(compacted_before, VALUES(compacted_before))""",
+        (moment,)
+    )
+
+
+def rebuild(cursor, user_ids=None):
+    """Recompute the rollups of the given users (all if None) from emotion_history.
+
+    Only buckets at or after the compaction watermark are rebuilt; older
+    ones no longer have their raw rows and are kept as they are.
+    """
+    watermark = compacted_before(cursor)
+    users = f" AND user_id IN ({', '.join(['%s'] * len(user_ids))})" if user_ids is not None else ''
+    params = (watermark, *(user_ids or ()))
+
+    cursor.execute(f"DELETE FROM emotion_rollups WHERE bucket_start >= %s{users}", params)
+    for granularity, expression in (('hour', "DATE_FORMAT(created_at, '%%Y-%%m-%%d %%H:00:00')"),
+                                    ('day', 'DATE(created_at)')):
+        cursor.execute(
+            f"""INSERT INTO emotion_rollups (user_id, granularity, bucket_start, emotion, detections, confidence_sum)
+               SELECT user_id, '{granularity}', {expression}, emotion, COUNT(*), COALESCE(SUM(confidence), 0)
+               FROM emotion_history
+               WHERE created_at >= %s{users}
+               GROUP BY user_id, {expression}, emotion""",
+            params
+        )
@@ -0,0 +1,181 @@
+from backend.persistence.rollups import compacted_before
+
+
+def _placeholders(row_count, width):
+    row = '(' + ', '.join(['%s'] * width) + ')'
+    return ', '.join([row] * row_count)
+
+
+def _in_users(user_ids, column='user_id'):
+    """' WHERE column IN (...)' and its params, or nothing for all users"""
+    if user_ids is None:
+        return '', ()
+    return f" WHERE {column} IN ({', '.join(['%s'] * len(user_ids))})", tuple(user_ids)
+
+
+def record_detections(cursor, rows):
+    """Add emotion_history rows (user_id, emotion, created_at) to user_emotion_counts and user_stats.
+
+    Call it in the transaction that inserts the rows, so the aggregates
+    never disagree with the history. Rows are folded per (user, emotion)
+    first, so a batch costs two statements; keys are written in sorted
+    order so concurrent batches lock the same rows in the same order.
+    """
+    if not rows:
+        return
+
+    per_emotion = {}
+    per_user = {}
+    for user_id, emotion, created_at in rows:
+        for totals, key in ((per_emotion, (user_id, emotion)), (per_user, user_id)):
+            count, last = totals.get(key, (0, created_at))
+            totals[key] = (count + 1, max(last, created_at))
+
+    cursor.execute(
+        f"""INSERT INTO user_emotion_counts (user_id, emotion, detections, last_detected_at)
+           VALUES {_placeholders(len(per_emotion), 4)}
+           ON DUPLICATE KEY UPDATE
+               detections = detections + VALUES(detections),
+               last_detected_at = GREATEST(COALESCE(last_detected_at, VALUES(last_detected_at)), VALUES(last_detected_at))""",
+        [value for key in sorted(per_emotion) for value in (*key, *per_emotion[key])]
+    )
+    cursor.execute(
+        f"""INSERT INTO user_stats (user_id, total_detections, last_detected_at)
+           VALUES {_placeholders(len(per_user), 3)}
+           ON DUPLICATE KEY UPDATE
+               total_detections = total_detections + VALUES(total_detections),
+               last_detected_at = GREATEST(COALESCE(last_detected_at, VALUES(last_detected_at)), VALUES(last_detected_at))""",
+        [value for user_id in sorted(per_user) for value in (user_id, *per_user[user_id])]
+    )
+
+
+def record_recommendations(cursor, user_id, count):
+    """Add count music_recommendations rows of a user to user_stats (same transaction as the insert)"""
+    if count:
+        cursor.execute(
+            """INSERT INTO user_stats (user_id, total_recommendations) VALUES (%s, %s)
+               ON DUPLICATE KEY UPDATE total_recommendations = total_recommendations + VALUES(total_recommendations)""",
+            (user_id, count)
+        )
+
+
+def read_stats(cursor, user_id):
+    """A user's aggregates (two primary-key reads, cursor may be a dictionary cursor or not)"""
+    cursor.execute(
+        """SELECT emotion, detections FROM user_emotion_counts
+           WHERE user_id = %s AND detections > 0
+           ORDER BY detections DESC, emotion""",
+        (user_id,)
+    )
+    distribution = [_row(row, ('emotion', 'detections')) for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT total_detections, total_recommendations, last_detected_at FROM user_stats WHERE user_id = %s",
+        (user_id,)
+    )
+    row = cursor.fetchone()
+    totals = _row(row, ('total_detections', 'total_recommendations', 'last_detected_at')) if row else {}
+
+    return {
+        'total_detections': totals.get('total_detections', 0),
+        'total_recommendations': totals.get('total_recommendations', 0),
+        'last_detected_at': totals.get('last_detected_at'),
+        'emotion_distribution': [{'emotion': r['emotion'], 'count': r['detections']} for r in distribution],
+        'most_frequent_emotion': distribution[0]['emotion'] if distribution else None
+    }
+
+
+def _row(row, columns):
+    return row if isinstance(row, dict) else dict(zip(columns, row))
+
+
+def next_user_ids(cursor, after=0, limit=1000):
+    """Next batch of user ids (ascending) after a given id"""
+    cursor.execute("SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s", (after, limit))
+    return [_row(row, ('id',))['id'] for row in cursor.fetchall()]
+
+
+def _detection_counts(cursor, user_ids):
+    """SQL and params of (user_id, emotion, n, last_detected_at) computed from the raw history.
+
+    History before the compaction watermark has been deleted, so that part
+    is counted from the hour rollups instead (see backend.persistence.rollups).
+    """
+    watermark = compacted_before(cursor)
+    users = f" AND user_id IN ({', '.join(['%s'] * len(user_ids))})" if user_ids is not None else ''
+    sql = f"""SELECT user_id, emotion, SUM(n) AS n, MAX(last_detected_at) AS last_detected_at FROM (
+                  SELECT user_id, emotion, COUNT(*) AS n, MAX(created_at) AS last_detected_at
+                  FROM emotion_history WHERE created_at >= %s{users} GROUP BY user_id, emotion
+                  UNION ALL
+                  SELECT user_id, emotion, SUM(detections), MAX(bucket_start)
+                  FROM emotion_rollups WHERE granularity = 'hour' AND bucket_start < %s{users} GROUP BY user_id, emotion
+              ) counts GROUP BY user_id, emotion"""
+    return sql, (watermark, *(user_ids or ()), watermark, *(user_ids or ()))
+
+
+def rebuild(cursor, user_ids=None):
+    """Recompute the aggregates of the given users (all users if None) from the raw tables.
+
+    Run it in its own transaction: under InnoDB's default isolation the
+    INSERT ... SELECT locks the scanned history rows, so detections being
+    written meanwhile wait and are then added on top of the rebuilt counts.
+    """
+    where, params = _in_users(user_ids)
+    users_where, users_params = _in_users(user_ids, 'u.id')
+
+    cursor.execute(f"DELETE FROM user_emotion_counts{where}", params)
+    counts_sql, counts_params = _detection_counts(cursor, user_ids)
+    cursor.execute(
+        f"INSERT INTO user_emotion_counts (user_id, emotion, detections, last_detected_at) {counts_sql}",
+        counts_params
+    )
+    cursor.execute(f"DELETE FROM user_stats{where}", params)
+    cursor.execute(
+        f"""INSERT INTO user_stats (user_id, total_detections, total_recommendations, last_detected_at)
+           SELECT u.id,
+                  (SELECT COALESCE(SUM(detections), 0) FROM user_emotion_counts c WHERE c.user_id = u.id),
+                  (SELECT COUNT(*) FROM music_recommendations mr WHERE mr.user_id = u.id),
+                  (SELECT MAX(last_detected_at) FROM user_emotion_counts c WHERE c.user_id = u.id)
+           FROM users u{users_where}""",
+        users_params
+    )
+
+
+def check(cursor, user_ids):
+    """Users among user_ids whose materialized aggregates differ from the raw tables.
+
+    Returns {user_id: {'expected': ..., 'stored': ...}} for each mismatch,
+    comparing the totals and the per-emotion counts.
+    """
+    if not user_ids:
+        return {}
+    where, params = _in_users(user_ids)
+
+    def fetch(sql, columns):
+        cursor.execute(sql, params)
+        return [_row(row, columns) for row in cursor.fetchall()]
+
+    expected = {user_id: {'detections': 0, 'recommendations': 0, 'emotions': {}} for user_id in user_ids}
+    stored = {user_id: {'detections': 0, 'recommendations': 0, 'emotions': {}} for user_id in user_ids}
+
+    counts_sql, counts_params = _detection_counts(cursor, user_ids)
+    cursor.execute(counts_sql, counts_params)
+    for row in [_row(row, ('user_id', 'emotion', 'n', 'last_detected_at')) for row in cursor.fetchall()]:
+        expected[row['user_id']]['emotions'][row['emotion']] = int(row['n'])
+        expected[row['user_id']]['detections'] += int(row['n'])
+    for row in fetch(f"SELECT user_id, COUNT(*) AS n FROM music_recommendations{where} GROUP BY user_id",
+                     ('user_id', 'n')):
+        expected[row['user_id']]['recommendations'] = row['n']
+
+    for row in fetch(f"SELECT user_id, emotion, detections FROM user_emotion_counts{where}",
+                     ('user_id', 'emotion', 'detections')):
+        if row['detections']:
+            stored[row['user_id']]['emotions'][row['emotion']] = row['detections']
+    for row in fetch(f"SELECT user_id, total_detections, total_recommendations FROM user_stats{where}",
+                     ('user_id', 'total_detections', 'total_recommendations')):
+        stored[row['user_id']]['detections'] = row['total_detections']
+        stored[row['user_id']]['recommendations'] = row['total_recommendations']
+
+    return {
+        user_id: {'expected': expected[user_id], 'stored': stored[user_id]}
+        for user_id in user_ids if expected[user_id] != stored[user_id]
+    }
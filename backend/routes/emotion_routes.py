@@ -1,93 +1,231 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import cv2
+import multiprocessing
 import numpy as np
-from tensorflow import keras
-import base64
 import os
+import threading
+import time
 from datetime import datetime
 from backend.config.database import get_db_connection
+from backend.inference.batcher import INFERENCE_TIMEOUT, MicroBatcher
+from backend.inference.face_detection import get_face_detector
+from backend.inference.frames import decode_image_buffer, decode_data_url, data_url_bytes, is_frame_content_type
+from backend.inference.model_backends import load_emotion_model, resolve_model_path
+from backend.inference.result_cache import FACE_CACHE_TTL, ResultCache, content_key, face_key, face_thumbnail, same_face
+from backend.inference.sessions import SessionLimitExceeded, SessionRegistry
+from backend.inference.tracking import FaceTracker
+from backend.inference.preprocessing import format_detection, preprocess_faces, to_gray
+from backend.inference.worker_pool import INFERENCE_WORKERS, InferenceWorkerPool
+from backend.persistence.history_writer import history_writer
+from backend.persistence.pagination import count_cache, count_rows, keyset, page_args, paginate, wants_total
+from backend.persistence.rollups import GRANULARITIES, parse_range, summarize, timeline
+from backend.persistence.user_stats import read_stats
 
 bp = Blueprint('emotion', __name__)
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-MODEL_PATH = os.path.join(BASE_DIR, 'ml', 'models', 'emotion_detection_model_final.keras')
-
+# When to load the model: 'background' (warm-up thread at startup), 'eager'
+# (block startup until loaded) or 'lazy' (on the first detection request)
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'background').lower()
 
 model = None
+batcher = None
+model_status = {'status': 'not_loaded', 'error': None, 'load_seconds': None}
+_model_lock = threading.Lock()
 
-# Emotion labels (adjust based on your model)
-EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise', ]
+# Results for repeated payloads (exact bytes) and a user's near-identical face crops (perceptual hash)
+payload_cache = ResultCache()
+face_cache = ResultCache(ttl=FACE_CACHE_TTL)
 
-def load_model():
-    """Load the emotion detection model"""
-    global model
-    try:
-        print("Loading model from:", MODEL_PATH)
-        if os.path.exists(MODEL_PATH):
-            model = keras.models.load_model(MODEL_PATH)
+# Live webcam sessions served by this worker
+sessions = SessionRegistry()
+
+def create_batcher():
+    """Model runner for this API process: worker processes (INFERENCE_WORKERS) or an in-process batcher"""
+    if INFERENCE_WORKERS > 0:
+        if not os.path.exists(resolve_model_path()):
+            return None, None
+        # Each worker loads its own model and warms it up before it reports ready
+        pool = InferenceWorkerPool(watch_path=resolve_model_path())
+        return pool, pool
+    
+    loaded = load_emotion_model()
+    if loaded is None:
+        return None, None
+    
+    new_batcher = MicroBatcher(loaded.predict)
+    # Run one dummy prediction so graph tracing happens off the request path
+    new_batcher.predict(np.zeros((48, 48, 1), dtype=np.float32))
+    return loaded, new_batcher
+
+def load_model(force=False):
+    """Load the emotion detection model (Keras or TFLite, see INFERENCE_BACKEND)"""
+    global model, batcher
+    with _model_lock:
+        if model is not None and not force:
+            return
+        model_status.update({'status': 'loading', 'error': None})
+        started = time.perf_counter()
+        try:
+            loaded, new_batcher = create_batcher()
+            if loaded is None:
+                model_status.update({'status': 'failed', 'error': 'Model file not found'})
+                return
+            
+            old_batcher = batcher
+            model, batcher = loaded, new_batcher
+            payload_cache.clear()
+            face_cache.clear()
+            if old_batcher is not None:
+                old_batcher.stop()
+            
+            model_status.update({'status': 'ready', 'load_seconds': round(time.perf_counter() - started, 3)})
             print("Emotion detection model loaded successfully!")
-        else:
-            print(f"Model not found at {MODEL_PATH}")
-    except Exception as e:
-        print(f"Error loading model: {e}")
+        except Exception as e:
+            model_status.update({'status': 'failed', 'error': str(e)})
+            print(f"Error loading model: {e}")
 
-# Load model on startup
-load_model()
+def get_batcher():
+    """Get the model batcher, loading the model first if it is not loaded yet"""
+    if batcher is None:
+        load_model()
+    if batcher is None:
+        raise Exception("Model not loaded")
+    return batcher
 
-def preprocess_image(image):
-    """Preprocess image for emotion detection"""
-    # Convert to grayscale if needed
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    
-    # Resize to model input size (typically 48x48 for emotion detection)
-    resized = cv2.resize(gray, (48, 48))
+def start_warmup():
+    """Load the model according to MODEL_WARMUP"""
+    if multiprocessing.parent_process() is not None:
+        # A child process (e.g. a spawned inference worker) importing the app never serves requests
+        return
+    if MODEL_WARMUP == 'eager':
+        load_model()
+    elif MODEL_WARMUP == 'background':
+        threading.Thread(target=load_model, name='emotion-model-warmup', daemon=True).start()
+
+@bp.record_once
+def _on_register(state):
+    start_warmup()
+
+def predict_faces(gray, faces, scope=None):
+    """Predict class probabilities for face boxes of a grayscale frame in one batch
+
+    With a scope (the user id), predictions are reused for faces that look the
+    same as a crop that scope sent in the last FACE_CACHE_TTL seconds.
+    """
+    model_batcher = get_batcher()
     
-    # Normalize
-    normalized = resized / 255.0
+    predictions = [None] * len(faces)
+    if scope is not None:
+        keys = [face_key(gray, box, scope) for box in faces]
+        thumbnails = [face_thumbnail(gray, box) for box in faces]
+        for i, (key, thumbnail) in enumerate(zip(keys, thumbnails)):
+            cached = face_cache.get(key, lambda entry: same_face(entry[1], thumbnail))
+            if cached is not None:
+                predictions[i] = cached[0]
+    missing = [i for i, prediction in enumerate(predictions) if prediction is None]
     
-    # Reshape for model input
-    reshaped = normalized.reshape(1, 48, 48, 1)
+    if missing:
+        # Crop from the grayscale frame, preprocess every face and predict them together
+        tensors = preprocess_faces(gray, [faces[i] for i in missing])
+        for i, prediction in zip(missing, model_batcher.predict_many(tensors, timeout=INFERENCE_TIMEOUT)):
+            predictions[i] = prediction
+            if scope is not None:
+                face_cache.put(keys[i], (prediction, thumbnails[i]))
     
-    return reshaped
+    return predictions
 
-def detect_emotion_from_image(image):
-    """Detect emotion from image"""
-    if model is None:
-        raise Exception("Model not loaded")
+def detect_faces_emotions(image, multi_face=False, scope=None):
+    """Detect emotions for the first face, or every face when multi_face is set"""
+    get_batcher()
     
-    # Detect face using OpenCV
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    # Detect face (detector is cached per thread)
+    gray = to_gray(image)
+    faces = get_face_detector().detect(image, gray)
     
     if len(faces) == 0:
-        return None, None, "No face detected"
+        return None, "No face detected"
     
-    # Get the first face
-    x, y, w, h = faces[0]
-    face_img = image[y:y+h, x:x+w]
+    if not multi_face:
+        faces = faces[:1]
     
-    # Preprocess and predict
-    preprocessed = preprocess_image(face_img)
-    predictions = model.predict(preprocessed, verbose=0)
+    predictions = predict_faces(gray, faces, scope)
+    detections = [format_detection(box, prediction) for box, prediction in zip(faces, predictions)]
+    
+    return detections, None
+
+def detect_from_payload(payload, decode, multi_face=False, invalid_error='Invalid image data', scope=None):
+    """Decode and detect an encoded image, reusing the result of an identical earlier payload"""
+    key = content_key(payload, multi_face)
+    cached = payload_cache.get(key)
+    if cached is not None:
+        return [dict(detection) for detection in cached], None
+    
+    model_batcher = get_batcher()
+    if isinstance(model_batcher, InferenceWorkerPool):
+        # Hand the still-encoded frame to a worker: decoding and detection run there too
+        frame = data_url_bytes(payload) if isinstance(payload, str) else payload
+        if not frame:
+            return None, invalid_error
+        detections, error = model_batcher.detect(frame, multi_face)
+        if error == 'Invalid image data':
+            error = invalid_error
+    else:
+        image = decode(payload)
+        if image is None:
+            return None, invalid_error
+        detections, error = detect_faces_emotions(image, multi_face, scope)
     
-    # Get emotion and confidence
-    emotion_idx = np.argmax(predictions[0])
-    confidence = float(predictions[0][emotion_idx])
-    emotion = EMOTION_LABELS[emotion_idx]
+    if not error:
+        payload_cache.put(key, [dict(detection) for detection in detections])
     
-    return emotion, confidence, None
+    return detections, error
+
+def detect_emotion_from_image(image):
+    """Detect emotion from image"""
+    detections, error = detect_faces_emotions(image)
+    if error:
+        return None, None, error
+    
+    return detections[0]['emotion'], detections[0]['confidence'], None
+
+def save_detections(user_id, detections, detection_type):
+    """Persist one emotion_history row per detection, returns the row ids.
+
+    Rows are written behind the response by history_writer; the ids are
+    reserved up front so they can be returned (and referenced) right away.
+    """
+    history_ids = history_writer.save(user_id, detections, detection_type)
+    count_cache.invalidate(('emotion_history', user_id))
+    return history_ids
+
+def is_truthy(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+def detection_response(detections, history_ids, multi_face):
+    """Build the detect endpoint response (first face at the top level, all faces in multi mode)"""
+    response = {
+        'message': 'Emotion detected successfully',
+        'emotion': detections[0]['emotion'],
+        'confidence': detections[0]['confidence'],
+        'history_id': history_ids[0]
+    }
+    
+    if multi_face:
+        response['faces'] = [
+            dict(detection, history_id=history_id)
+            for detection, history_id in zip(detections, history_ids)
+        ]
+        response['face_count'] = len(detections)
+    
+    return response
 
 @bp.route('/detect-image', methods=['POST'])
 @jwt_required()
 def detect_from_image():
-    """Detect emotion from uploaded image"""
+    """Detect emotion from uploaded image (multi_face=true for every face)"""
     try:
         user_id = int(get_jwt_identity())
+        multi_face = is_truthy(request.form.get('multi_face', request.args.get('multi_face', False)))
         
         if 'image' not in request.files:
             return jsonify({'error': 'No image file provided'}), 400
@@ -97,40 +235,17 @@ def detect_from_image():
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
-        # Read image
-        file_bytes = np.frombuffer(file.read(), np.uint8)
-        image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            return jsonify({'error': 'Invalid image file'}), 400
-        
-        # Detect emotion
-        emotion, confidence, error = detect_emotion_from_image(image)
+        # Read image and detect emotion
+        detections, error = detect_from_payload(file.read(), decode_image_buffer, multi_face, 'Invalid image file',
+                                               scope=user_id)
         
         if error:
             return jsonify({'error': error}), 400
         
         # Save to database
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        cursor.execute(
-            """INSERT INTO emotion_history (user_id, emotion, confidence, detection_type) 
-               VALUES (%s, %s, %s, 'image')""",
-            (user_id, emotion, confidence)
-        )
-        connection.commit()
-        history_id = cursor.lastrowid
-        
-        cursor.close()
-        connection.close()
+        history_ids = save_detections(user_id, detections, 'image')
         
-        return jsonify({
-            'message': 'Emotion detected successfully',
-            'emotion': emotion,
-            'confidence': confidence,
-            'history_id': history_id
-        }), 200
+        return jsonify(detection_response(detections, history_ids, multi_face)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -138,7 +253,7 @@ def detect_from_image():
 @bp.route('/detect-webcam', methods=['POST'])
 @jwt_required()
 def detect_from_webcam():
-    """Detect emotion from webcam capture (base64 image)"""
+    """Detect emotion from webcam capture (base64 image, multi_face=true for every face)"""
     try:
         user_id = int(get_jwt_identity())
         data = request.get_json()
@@ -146,81 +261,188 @@ def detect_from_webcam():
         if not data or 'image' not in data:
             return jsonify({'error': 'No image data provided'}), 400
         
-        # Decode base64 image
-        image_data = data['image']
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
+        multi_face = is_truthy(data.get('multi_face', False))
         
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode base64 image and detect emotion
+        detections, error = detect_from_payload(data['image'], decode_data_url, multi_face, scope=user_id)
         
-        if image is None:
-            return jsonify({'error': 'Invalid image data'}), 400
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Detect emotion
-        emotion, confidence, error = detect_emotion_from_image(image)
+        # Save to database
+        history_ids = save_detections(user_id, detections, 'webcam')
+        
+        return jsonify(detection_response(detections, history_ids, multi_face)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/detect-frame', methods=['POST'])
+@jwt_required()
+def detect_from_frame():
+    """Detect emotion from a raw binary frame body (image/jpeg, image/webp or image/png)
+    
+    Query parameters: source=webcam|image (default webcam), multi_face=true for every face.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        
+        if not is_frame_content_type(request.content_type):
+            return jsonify({'error': 'Unsupported content type, send the encoded image as the request body'}), 415
+        
+        source = request.args.get('source', 'webcam')
+        if source not in ('webcam', 'image'):
+            return jsonify({'error': 'Invalid source'}), 400
+        
+        multi_face = is_truthy(request.args.get('multi_face', False))
+        
+        # Decode straight from the request body (no base64/JSON round trip) and detect emotion
+        detections, error = detect_from_payload(request.get_data(cache=False), decode_image_buffer, multi_face,
+                                               scope=user_id)
         
         if error:
             return jsonify({'error': error}), 400
         
         # Save to database
-        connection = get_db_connection()
-        cursor = connection.cursor()
+        history_ids = save_detections(user_id, detections, source)
         
-        cursor.execute(
-            """INSERT INTO emotion_history (user_id, emotion, confidence, detection_type) 
-               VALUES (%s, %s, %s, 'webcam')""",
-            (user_id, emotion, confidence)
-        )
-        connection.commit()
-        history_id = cursor.lastrowid
+        return jsonify(detection_response(detections, history_ids, multi_face)), 200
         
-        cursor.close()
-        connection.close()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def process_session_frame(buffer, tracker, user_id):
+    """Track the session's face and return its smoothed emotion for one frame"""
+    image = decode_image_buffer(buffer)
+    if image is None:
+        return {'error': 'Invalid image data'}
+    
+    gray = to_gray(image)
+    box = tracker.locate(image, gray)
+    if box is None:
+        return {'error': 'No face detected'}
+    
+    probabilities = tracker.smooth(predict_faces(gray, [box], user_id)[0])
+    
+    result = format_detection(box, probabilities)
+    result['tracked'] = tracker.last_tracked
+    result['tracking'] = dict(tracker.stats)
+    return result
+
+def persist_session_result(user_id, result):
+    return save_detections(user_id, [result], 'webcam')[0]
+
+def get_authorized_session(session_id):
+    """Look up a session and check its token (X-Session-Token header or token query arg)"""
+    session = sessions.get(session_id)
+    token = request.headers.get('X-Session-Token') or request.args.get('token')
+    if session is None or not session.check_token(token):
+        return None
+    return session
+
+@bp.route('/session', methods=['POST'])
+@jwt_required()
+def start_session():
+    """Start a live webcam session (JWT is checked once here, frames use the session token)"""
+    try:
+        user_id = int(get_jwt_identity())
+        get_batcher()
+        
+        # The tracker is only used from the session's worker thread
+        tracker = FaceTracker()
+        session = sessions.create(user_id, lambda buffer: process_session_frame(buffer, tracker, user_id),
+                                  persist_session_result)
         
         return jsonify({
-            'message': 'Emotion detected successfully',
-            'emotion': emotion,
-            'confidence': confidence,
-            'history_id': history_id
-        }), 200
+            'message': 'Session started',
+            'session_id': session.id,
+            'session_token': session.token,
+            'target_fps': 1.0 / session.min_interval if session.min_interval else None,
+            'frame_url': f'{request.script_root}{request.path}/{session.id}/frame',
+            'events_url': f'{request.script_root}{request.path}/{session.id}/events'
+        }), 201
+        
+    except SessionLimitExceeded as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/session/<session_id>/frame', methods=['POST'])
+def push_session_frame(session_id):
+    """Push a raw encoded frame to a session (stale unprocessed frames are dropped)"""
+    try:
+        session = get_authorized_session(session_id)
+        if session is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        if not is_frame_content_type(request.content_type):
+            return jsonify({'error': 'Unsupported content type, send the encoded image as the request body'}), 415
+        
+        session.submit_frame(request.get_data(cache=False))
+        
+        return jsonify({'accepted': True, 'stats': session.stats}), 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/session/<session_id>/events', methods=['GET'])
+def stream_session_events(session_id):
+    """Server-sent events stream of emotion updates for a session"""
+    session = get_authorized_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    return Response(
+        stream_with_context(session.events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@bp.route('/session/<session_id>', methods=['DELETE'])
+def end_session(session_id):
+    """End a session (the last emotion is persisted if it was not already)"""
+    session = get_authorized_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    sessions.close(session_id)
+    
+    return jsonify({'message': 'Session ended', 'stats': session.stats}), 200
+
 @bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_emotion_history():
     """Get user's emotion detection history"""
     try:
         user_id = int(get_jwt_identity())
+        # Include detections this worker has not written yet
+        history_writer.wait_for_user(user_id)
         
         # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
-        offset = (page - 1) * limit
+        try:
+            limit, page_cursor = page_args(request.args, 10)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
-        # Get total count
-        cursor.execute(
-            "SELECT COUNT(*) as total FROM emotion_history WHERE user_id = %s",
-            (user_id,)
-        )
-        total = cursor.fetchone()['total']
-        
-        # Get history
+        # Get history: one index range scan from the cursor, however deep the page
+        where, params, order = keyset(page_cursor)
         cursor.execute(
-            """SELECT id, emotion, confidence, detection_type, created_at 
+            f"""SELECT id, emotion, confidence, detection_type, created_at 
                FROM emotion_history 
-               WHERE user_id = %s 
-               ORDER BY created_at DESC 
-               LIMIT %s OFFSET %s""",
-            (user_id, limit, offset)
+               WHERE user_id = %s{where} 
+               ORDER BY {order} 
+               LIMIT %s""",
+            (user_id, *params, limit + 1)
         )
-        history = cursor.fetchall()
+        history, pagination = paginate(cursor.fetchall(), limit, page_cursor)
+        
+        # Total count only on request, and cached
+        if wants_total(request.args):
+            pagination['total'] = count_cache.get(('emotion_history', user_id),
+                                                  lambda: count_rows(cursor, 'emotion_history', user_id))
         
         cursor.close()
         connection.close()
@@ -231,12 +453,7 @@ def get_emotion_history():
         
         return jsonify({
             'history': history,
-            'pagination': {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'pages': (total + limit - 1) // limit
-            }
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -248,35 +465,66 @@ def get_emotion_stats():
     """Get user's emotion statistics"""
     try:
         user_id = int(get_jwt_identity())
+        # Include detections this worker has not written yet
+        history_writer.wait_for_user(user_id)
         
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
-        # Get emotion distribution
-        cursor.execute(
-            """SELECT emotion, COUNT(*) as count 
-               FROM emotion_history 
-               WHERE user_id = %s 
-               GROUP BY emotion 
-               ORDER BY count DESC""",
-            (user_id,)
-        )
-        distribution = cursor.fetchall()
-        
-        # Get total detections
-        cursor.execute(
-            "SELECT COUNT(*) as total FROM emotion_history WHERE user_id = %s",
-            (user_id,)
-        )
-        total = cursor.fetchone()['total']
+        granularity = request.args.get('granularity')
+        if granularity:
+            # Mood over time, from the hour/day rollups
+            if granularity not in GRANULARITIES:
+                cursor.close()
+                connection.close()
+                return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+            try:
+                start, end = parse_range(request.args, granularity)
+            except ValueError as e:
+                cursor.close()
+                connection.close()
+                return jsonify({'error': str(e)}), 400
+            
+            buckets, start, end = timeline(cursor, user_id, granularity, start, end)
+            cursor.close()
+            connection.close()
+            
+            total, distribution = summarize(buckets)
+            for bucket in buckets:
+                bucket['bucket_start'] = bucket['bucket_start'].isoformat()
+            return jsonify({
+                'granularity': granularity,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'total_detections': total,
+                'emotion_distribution': distribution,
+                'timeline': buckets
+            }), 200
+        
+        # Materialized aggregates: no scan of the user's history
+        stats = read_stats(cursor, user_id)
         
         cursor.close()
         connection.close()
         
         return jsonify({
-            'total_detections': total,
-            'emotion_distribution': distribution
+            'total_detections': stats['total_detections'],
+            'emotion_distribution': stats['emotion_distribution'],
+            'most_frequent_emotion': stats['most_frequent_emotion'],
+            'last_detected_at': stats['last_detected_at'].isoformat() if stats['last_detected_at'] else None
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def get_inference_metrics():
+    """Get batching or worker pool metrics, result cache and history writer counters"""
+    if batcher is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+    
+    metrics = batcher.stats()
+    metrics['result_cache'] = {'payload': payload_cache.stats(), 'face': face_cache.stats()}
+    metrics['history_writer'] = history_writer.stats()
+    return jsonify(metrics), 200
@@ -1,10 +1,17 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import requests
-import base64
 import os
-from datetime import datetime, timedelta
 from backend.config.database import get_db_connection
+from backend.music.local_recommender import EMOTION_TARGETS, RecentTracks, load_track_index
+from backend.music.recommendation_cache import RecommendationCache
+from backend.music.spotify_client import spotify
+from backend.music.spotify_token import SpotifyTokenManager
+from backend.music.tracks import format_tracks, save_recommendations
+from backend.persistence.activity import add_recommendations
+from backend.persistence.history_writer import history_writer
+from backend.persistence.pagination import count_cache, count_rows, keyset, page_args, paginate, wants_total
+from backend.persistence.user_stats import record_recommendations
 
 bp = Blueprint('music', __name__)
 
@@ -12,43 +19,14 @@ bp = Blueprint('music', __name__)
 SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
 SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
 
-# Cache for Spotify access token
-spotify_token_cache = {
-    'token': None,
-    'expires_at': None
-}
+# Access token shared by request threads and by the workers on this host
+token_manager = SpotifyTokenManager(spotify, SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
 
 def get_spotify_token():
     """Get Spotify access token"""
-    global spotify_token_cache
-    
-    if spotify_token_cache['token'] and spotify_token_cache['expires_at']:
-        if datetime.now() < spotify_token_cache['expires_at']:
-            return spotify_token_cache['token']
-    
-    auth_string = f"{SPOTIFY_CLIENT_ID}:{SPOTIFY_CLIENT_SECRET}"
-    auth_bytes = auth_string.encode('utf-8')
-    auth_base64 = base64.b64encode(auth_bytes).decode('utf-8')
-    
-    url = "https://accounts.spotify.com/api/token"
-    headers = {
-        "Authorization": f"Basic {auth_base64}",
-        "Content-Type": "application/x-www-form-urlencoded"
-    }
-    data = {"grant_type": "client_credentials"}
-    
-    response = requests.post(url, headers=headers, data=data)
-    
-    if response.status_code != 200:
-        raise Exception("Failed to get Spotify access token")
-    
-    token_data = response.json()
-    spotify_token_cache['token'] = token_data['access_token']
-    spotify_token_cache['expires_at'] = datetime.now() + timedelta(seconds=token_data['expires_in'] - 60)
-    
-    return spotify_token_cache['token']
+    return token_manager.get()
 
-def get_recommendations_by_genre(emotion, limit=20):
+def get_recommendations_by_genre(emotion, limit=20, market='US'):
     """Get recommendations based on emotion-mapped genres - using VALID Spotify genres only"""
     token = get_spotify_token()
     
@@ -65,36 +43,23 @@ def get_recommendations_by_genre(emotion, limit=20):
     
     seed_genres = valid_genres.get(emotion.lower(), ['pop', 'indie'])[:5]
     
-    url = "https://api.spotify.com/v1/recommendations"
-    headers = {"Authorization": f"Bearer {token}"}
     params = {
         "seed_genres": ','.join(seed_genres),
         "limit": min(limit, 100),
-        "market": "US"
+        "market": market
     }
     
     # Add audio features based on emotion
-    if emotion.lower() == 'happy':
-        params.update({"target_valence": 0.8, "target_energy": 0.7})
-    elif emotion.lower() == 'sad':
-        params.update({"target_valence": 0.3, "target_energy": 0.4})
-    elif emotion.lower() == 'angry':
-        params.update({"target_energy": 0.9})
-    elif emotion.lower() in ['fear', 'neutral']:
-        params.update({"target_valence": 0.5, "target_energy": 0.5})
-    elif emotion.lower() == 'surprise':
-        params.update({"target_energy": 0.8})
+    params.update({f"target_{feature}": value for feature, value in EMOTION_TARGETS.get(emotion.lower(), {}).items()})
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-        return response.json()
+        return spotify.get('/recommendations', token, params)
     except requests.exceptions.HTTPError as e:
         print(f"Spotify recommendations failed with genres {seed_genres}: {e}")
         # Fallback to search if recommendations fail
-        return search_spotify_tracks_fallback(token, emotion, limit)
+        return search_spotify_tracks_fallback(token, emotion, limit, market)
 
-def search_spotify_tracks_fallback(token, emotion, limit=20):
+def search_spotify_tracks_fallback(token, emotion, limit=20, market='US'):
     """Fallback search when recommendations API fails"""
     search_queries = {
         'happy': 'happy upbeat positive',
@@ -108,23 +73,44 @@ def search_spotify_tracks_fallback(token, emotion, limit=20):
     
     query = search_queries.get(emotion.lower(), 'popular music')
     
-    url = "https://api.spotify.com/v1/search"
-    headers = {"Authorization": f"Bearer {token}"}
     params = {
         "q": query,
         "type": "track",
-        "limit": limit,
-        "market": "US"
+        "limit": min(limit, 50),
+        "market": market
     }
     
-    response = requests.get(url, headers=headers, params=params, timeout=10)
-    response.raise_for_status()
-    
-    search_data = response.json()
+    search_data = spotify.get('/search', token, params)
     return {
         "tracks": search_data.get("tracks", {}).get("items", [])
     }
 
+# Track pools per emotion, sampled locally (see RecommendationCache)
+recommendation_cache = RecommendationCache(
+    lambda emotion, market, count: get_recommendations_by_genre(emotion, count, market).get('tracks', [])
+)
+
+def load_recent_track_ids(user_id, count):
+    """Track ids most recently recommended to a user (newest first)"""
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """SELECT track_id FROM music_recommendations
+               WHERE user_id = %s
+               ORDER BY created_at DESC, id DESC
+               LIMIT %s""",
+            (user_id, count)
+        )
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        connection.close()
+
+# Local nearest-neighbour recommender (None when no track index is built, see RECOMMENDER_BACKEND)
+track_index = load_track_index()
+recent_tracks = RecentTracks(load_recent_track_ids)
+
 @bp.route('/recommend', methods=['POST'])
 @jwt_required()
 def recommend_music():
@@ -144,59 +130,47 @@ def recommend_music():
         if emotion.lower() not in valid_emotions:
             return jsonify({'error': f'Invalid emotion'}), 400
         
-        try:
-            recommendations = get_recommendations_by_genre(emotion, limit)
-            tracks = recommendations.get('tracks', [])
-        except Exception as spotify_error:
-            print(f"Spotify error: {spotify_error}")
-            return jsonify({'error': 'Unable to fetch recommendations', 'details': str(spotify_error)}), 500
+        if emotion_history_id is not None:
+            if isinstance(emotion_history_id, bool) or not str(emotion_history_id).strip().isdigit():
+                return jsonify({'error': 'emotion_history_id must be a positive integer'}), 400
+            emotion_history_id = int(emotion_history_id)
+            # The detection row may still be queued for writing by this worker; it must exist before it is referenced
+            history_writer.wait_for([emotion_history_id])
+        
+        if track_index is not None:
+            # Served from the local index: no network, and recently recommended tracks are skipped
+            formatted_tracks = track_index.recommend(emotion, limit, exclude=recent_tracks.get(user_id))
+        else:
+            try:
+                tracks = recommendation_cache.sample(emotion, limit)
+            except Exception as spotify_error:
+                print(f"Spotify error: {spotify_error}")
+                return jsonify({'error': 'Unable to fetch recommendations', 'details': str(spotify_error)}), 500
+            formatted_tracks = format_tracks(tracks)
         
-        if not tracks:
+        if not formatted_tracks:
             return jsonify({'error': 'No recommendations found'}), 404
         
-        formatted_tracks = []
+        # One catalog upsert and one multi-row INSERT for the whole recommendation list
         connection = get_db_connection()
         cursor = connection.cursor()
-        
-        for track in tracks:
-            try:
-                track_id = track.get('id', '')
-                preview_url = track.get('preview_url')
-                
-                # Spotify embed URL
-                spotify_embed_url = f"https://open.spotify.com/embed/track/{track_id}" if track_id else None
-                
-                track_data = {
-                    'id': track_id,
-                    'name': track.get('name', 'Unknown'),
-                    'artist': ', '.join([artist.get('name', '') for artist in track.get('artists', [])]),
-                    'album': track.get('album', {}).get('name', ''),
-                    'preview_url': preview_url,
-                    'spotify_url': track.get('external_urls', {}).get('spotify', ''),
-                    'spotify_embed_url': spotify_embed_url,
-                    'image_url': track.get('album', {}).get('images', [{}])[0].get('url') if track.get('album', {}).get('images') else None,
-                    'duration_ms': track.get('duration_ms', 0),
-                    'has_preview': preview_url is not None
-                }
-                
-                formatted_tracks.append(track_data)
-                
-                cursor.execute(
-                    """INSERT INTO music_recommendations 
-                       (user_id, emotion_history_id, track_name, artist_name, track_id, 
-                        album_name, preview_url, spotify_url, image_url) 
-                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                    (user_id, emotion_history_id, track_data['name'], track_data['artist'],
-                     track_data['id'], track_data['album'], track_data['preview_url'],
-                     track_data['spotify_url'], track_data['image_url'])
-                )
-            except Exception as track_error:
-                print(f"Error processing track: {track_error}")
-                continue
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
+        try:
+            if emotion_history_id is not None:
+                # With write-behind on another worker the row may not exist yet; fail clearly instead of
+                # a foreign key error (and a recommendations_count update that matches nothing)
+                cursor.execute("SELECT id FROM emotion_history WHERE id = %s AND user_id = %s",
+                               (emotion_history_id, user_id))
+                if cursor.fetchone() is None:
+                    return jsonify({'error': 'Emotion history entry not found'}), 404
+            saved = save_recommendations(cursor, user_id, emotion_history_id, formatted_tracks)
+            record_recommendations(cursor, user_id, saved)
+            add_recommendations(cursor, user_id, emotion_history_id, saved)
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+        recent_tracks.add(user_id, [track['id'] for track in formatted_tracks])
+        count_cache.invalidate(('music_recommendations', user_id))
         
         return jsonify({
             'message': 'Recommendations generated successfully',
@@ -217,29 +191,30 @@ def get_music_history():
     """Get user's music recommendation history"""
     try:
         user_id = int(get_jwt_identity())
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
-        offset = (page - 1) * limit
+        try:
+            limit, page_cursor = page_args(request.args, 10)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
+        where, params, order = keyset(page_cursor, 'mr.')
         cursor.execute(
-            "SELECT COUNT(*) as total FROM music_recommendations WHERE user_id = %s",
-            (user_id,)
+            f"""SELECT mr.id, t.name AS track_name, t.artist AS artist_name, t.album AS album_name,
+                      t.preview_url, t.spotify_url, t.image_url, mr.created_at 
+               FROM music_recommendations mr
+               JOIN tracks t ON t.track_id = mr.track_id
+               WHERE mr.user_id = %s{where} 
+               ORDER BY {order} 
+               LIMIT %s""",
+            (user_id, *params, limit + 1)
         )
-        total = cursor.fetchone()['total']
+        history, pagination = paginate(cursor.fetchall(), limit, page_cursor)
         
-        cursor.execute(
-            """SELECT id, track_name, artist_name, album_name, preview_url, 
-                      spotify_url, image_url, created_at 
-               FROM music_recommendations 
-               WHERE user_id = %s 
-               ORDER BY created_at DESC 
-               LIMIT %s OFFSET %s""",
-            (user_id, limit, offset)
-        )
-        history = cursor.fetchall()
+        if wants_total(request.args):
+            pagination['total'] = count_cache.get(('music_recommendations', user_id),
+                                                  lambda: count_rows(cursor, 'music_recommendations', user_id))
         
         cursor.close()
         connection.close()
@@ -249,12 +224,7 @@ def get_music_history():
         
         return jsonify({
             'history': history,
-            'pagination': {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'pages': (total + limit - 1) // limit
-            }
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -266,15 +236,22 @@ def get_available_genres():
     try:
         token = get_spotify_token()
         
-        url = "https://api.spotify.com/v1/recommendations/available-genre-seeds"
-        headers = {"Authorization": f"Bearer {token}"}
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code != 200:
+        try:
+            genres = spotify.get('/recommendations/available-genre-seeds', token)
+        except requests.exceptions.RequestException:
             raise Exception("Failed to get genres")
         
-        return jsonify(response.json()), 200
+        return jsonify(genres), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/metrics', methods=['GET'])
+def get_music_metrics():
+    """Get local recommender and pool cache counters, Spotify call latencies and token refreshes"""
+    return jsonify({
+        'local_recommender': track_index.stats() if track_index is not None else None,
+        'recommendation_cache': recommendation_cache.stats(),
+        'spotify': spotify.stats(),
+        'spotify_token': token_manager.stats()
+    }), 200
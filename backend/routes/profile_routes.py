@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from backend.config.database import get_db_connection
+from backend.persistence.activity import activity_page
+from backend.persistence.history_writer import history_writer
+from backend.persistence.pagination import count_cache, count_rows, page_args, wants_total
+from backend.persistence.user_stats import read_stats
 
 bp = Blueprint('profile', __name__)
 
@@ -11,6 +15,8 @@ def get_profile():
     """Get user profile"""
     try:
         user_id = int(get_jwt_identity())
+        # Include detections this worker has not written yet
+        history_writer.wait_for_user(user_id)
         
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
@@ -27,30 +33,8 @@ def get_profile():
             connection.close()
             return jsonify({'error': 'User not found'}), 404
         
-        # Get statistics
-        cursor.execute(
-            "SELECT COUNT(*) as total FROM emotion_history WHERE user_id = %s",
-            (user_id,)
-        )
-        emotion_count = cursor.fetchone()['total']
-        
-        cursor.execute(
-            "SELECT COUNT(*) as total FROM music_recommendations WHERE user_id = %s",
-            (user_id,)
-        )
-        music_count = cursor.fetchone()['total']
-        
-        # Get most detected emotion
-        cursor.execute(
-            """SELECT emotion, COUNT(*) as count 
-               FROM emotion_history 
-               WHERE user_id = %s 
-               GROUP BY emotion 
-               ORDER BY count DESC 
-               LIMIT 1""",
-            (user_id,)
-        )
-        most_emotion = cursor.fetchone()
+        # Get statistics (materialized per user, see user_stats)
+        stats = read_stats(cursor, user_id)
         
         cursor.close()
         connection.close()
@@ -63,9 +47,10 @@ def get_profile():
                 'created_at': user['created_at'].isoformat() if user['created_at'] else None
             },
             'statistics': {
-                'total_emotions_detected': emotion_count,
-                'total_music_recommendations': music_count,
-                'most_detected_emotion': most_emotion['emotion'] if most_emotion else None
+                'total_emotions_detected': stats['total_detections'],
+                'total_music_recommendations': stats['total_recommendations'],
+                'most_detected_emotion': stats['most_frequent_emotion'],
+                'last_detected_at': stats['last_detected_at'].isoformat() if stats['last_detected_at'] else None
             }
         }), 200
         
@@ -165,40 +150,25 @@ def get_activity():
     """Get user activity (combined emotion and music history)"""
     try:
         user_id = int(get_jwt_identity())
+        # Include detections this worker has not written yet
+        history_writer.wait_for_user(user_id)
         
         # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 20, type=int)
-        offset = (page - 1) * limit
+        try:
+            limit, page_cursor = page_args(request.args, 20)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
-        # Get combined activity
-        cursor.execute(
-            """SELECT 
-                   eh.id,
-                   eh.emotion,
-                   eh.confidence,
-                   eh.detection_type,
-                   eh.created_at,
-                   COUNT(mr.id) as recommendations_count
-               FROM emotion_history eh
-               LEFT JOIN music_recommendations mr ON eh.id = mr.emotion_history_id
-               WHERE eh.user_id = %s
-               GROUP BY eh.id
-               ORDER BY eh.created_at DESC
-               LIMIT %s OFFSET %s""",
-            (user_id, limit, offset)
-        )
-        activity = cursor.fetchall()
+        # Detections first (one page), then their recommendation counts
+        activity, pagination = activity_page(cursor, user_id, limit, page_cursor)
         
-        # Get total count
-        cursor.execute(
-            "SELECT COUNT(*) as total FROM emotion_history WHERE user_id = %s",
-            (user_id,)
-        )
-        total = cursor.fetchone()['total']
+        # Get total count (only on request, and cached)
+        if wants_total(request.args):
+            pagination['total'] = count_cache.get(('emotion_history', user_id),
+                                                  lambda: count_rows(cursor, 'emotion_history', user_id))
         
         cursor.close()
         connection.close()
@@ -209,12 +179,7 @@ def get_activity():
         
         return jsonify({
             'activity': activity,
-            'pagination': {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'pages': (total + limit - 1) // limit
-            }
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -0,0 +1,180 @@
+"""Benchmark /api/profile/activity page queries: JOIN + GROUP BY vs paginate-then-count.
+
+Seeds one user with --rows detections (plus rows for other users), each
+with 0-5 music_recommendations rows, then times one page of 20 at a few
+depths (keyset cursors, as the API uses) for:
+
+    join     emotion_history LEFT JOIN music_recommendations GROUP BY eh.id
+             ORDER BY ... LIMIT (the previous query: groups the user's whole
+             history before the LIMIT applies)
+    counted  activity.activity_page() with recommendations_count still NULL
+             (not backfilled): the page, then one IN (...) count query
+    column   activity.activity_page() with recommendations_count stored
+
+All three must return the same rows and counts.
+
+A throwaway SQLite file stands in for MySQL.
+
+Usage (from the repository root):
+    python -m benchmarks.activity_feed --rows 200000
+    python -m benchmarks.activity_feed --rows 1000000 --repeat 50
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from backend.persistence import activity
+from backend.persistence.pagination import PageCursor, keyset, paginate
+
+EMOTIONS = ('happy', 'sad', 'angry', 'fear', 'surprise', 'disgust', 'neutral')
+USER_ID = 1
+OTHER_USERS = 4
+PAGE_SIZE = 20
+DEPTHS = (0, 100, 1000, 10000)
+
+# Store datetimes as 'YYYY-MM-DD HH:MM:SS' text, as the default adapter does (deprecated since Python 3.12)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+
+
+def seed(path, rows, batch=20000):
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE emotion_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            emotion VARCHAR(50) NOT NULL,
+            confidence FLOAT,
+            detection_type TEXT DEFAULT 'webcam',
+            created_at TIMESTAMP NOT NULL,
+            recommendations_count INTEGER NULL DEFAULT 0
+        );
+        CREATE INDEX idx_user_created ON emotion_history (user_id, created_at, id);
+        CREATE TABLE music_recommendations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            emotion_history_id INTEGER,
+            track_id VARCHAR(64) NOT NULL,
+            created_at TIMESTAMP NOT NULL
+        );
+        CREATE INDEX idx_recommendations_user_created ON music_recommendations (user_id, created_at, id);
+        CREATE INDEX idx_emotion_history ON music_recommendations (emotion_history_id);
+    """)
+    rng = random.Random(0)
+    start = datetime.now().replace(microsecond=0) - timedelta(seconds=rows)
+    cursor = connection.cursor()
+    total = rows * (1 + OTHER_USERS)
+    history_id = 0
+    for offset in range(0, total, batch):
+        detections, recommendations = [], []
+        for i in range(offset, min(offset + batch, total)):
+            history_id += 1
+            user_id = USER_ID if i % (1 + OTHER_USERS) == 0 else 100 + i % (1 + OTHER_USERS)
+            created_at = start + timedelta(seconds=i // (1 + OTHER_USERS))
+            count = rng.randint(0, 5)
+            detections.append((history_id, user_id, rng.choice(EMOTIONS), round(rng.uniform(0.4, 1.0), 3),
+                               created_at, count))
+            recommendations.extend((user_id, history_id, f'track{rng.randrange(50000)}', created_at)
+                                   for _ in range(count))
+        cursor.executemany(
+            """INSERT INTO emotion_history (id, user_id, emotion, confidence, created_at, recommendations_count)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            detections
+        )
+        cursor.executemany(
+            "INSERT INTO music_recommendations (user_id, emotion_history_id, track_id, created_at) VALUES (?, ?, ?, ?)",
+            recommendations
+        )
+        connection.commit()
+    connection.execute("ANALYZE")
+    return connection
+
+
+def join_page(cursor, page_cursor):
+    where, params, order = keyset(page_cursor, 'eh.', '?')
+    cursor.execute(
+        f"""SELECT eh.id, eh.emotion, eh.confidence, eh.detection_type, eh.created_at,
+                   COUNT(mr.id) AS recommendations_count
+           FROM emotion_history eh
+           LEFT JOIN music_recommendations mr ON eh.id = mr.emotion_history_id
+           WHERE eh.user_id = ?{where}
+           GROUP BY eh.id
+           ORDER BY {order}
+           LIMIT ?""",
+        (USER_ID, *params, PAGE_SIZE + 1)
+    )
+    columns = [column[0] for column in cursor.description]
+    return paginate([dict(zip(columns, row)) for row in cursor.fetchall()], PAGE_SIZE, page_cursor)[0]
+
+
+def feed_page(cursor, page_cursor):
+    return activity.activity_page(cursor, USER_ID, PAGE_SIZE, page_cursor, dialect='sqlite')[0]
+
+
+def cursors(connection):
+    """Keyset cursor positioned after DEPTHS[i] rows (None for the first page)"""
+    positions = {}
+    for depth in DEPTHS:
+        if depth == 0:
+            positions[depth] = None
+            continue
+        row = connection.execute(
+            """SELECT id, created_at FROM emotion_history WHERE user_id = ?
+               ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?""",
+            (USER_ID, depth - 1)
+        ).fetchone()
+        if row is not None:
+            positions[depth] = PageCursor.from_row({'id': row[0], 'created_at': row[1]}, 'next')
+    return positions
+
+
+def timed(query, cursor, page_cursor, repeat):
+    """(p50 ms, page) over repeat runs"""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        page = query(cursor, page_cursor)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return latencies[len(latencies) // 2], [(item['id'], item['recommendations_count']) for item in page]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Activity feed: JOIN + GROUP BY vs paginate-then-count')
+    parser.add_argument('--rows', type=int, default=200000, help='Detections for the benchmarked user')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per page and mode')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    started = time.perf_counter()
+    connection = seed(path, args.rows)
+    recommendations = connection.execute("SELECT COUNT(*) FROM music_recommendations").fetchone()[0]
+    print(f"Seeded {args.rows} detections for user {USER_ID} (+{args.rows * OTHER_USERS} for other users) "
+          f"and {recommendations} recommendations in {time.perf_counter() - started:.1f} s")
+
+    positions = cursors(connection)
+    cursor = connection.cursor()
+    results = {}
+    for depth, page_cursor in positions.items():
+        results[('join', depth)] = timed(join_page, cursor, page_cursor, args.repeat)
+        results[('column', depth)] = timed(feed_page, cursor, page_cursor, args.repeat)
+    # As right after the column was added to an existing table
+    connection.execute("UPDATE emotion_history SET recommendations_count = NULL")
+    connection.commit()
+    for depth, page_cursor in positions.items():
+        results[('counted', depth)] = timed(feed_page, cursor, page_cursor, args.repeat)
+
+    print(f"{'rows skipped':>12} {'join ms':>9} {'counted ms':>11} {'column ms':>10}")
+    for depth in positions:
+        pages = {mode: results[(mode, depth)] for mode in ('join', 'counted', 'column')}
+        if len({tuple(page) for _, page in pages.values()}) != 1:
+            raise Exception(f"Pages after {depth} rows differ between modes")
+        print(f"{depth:>12} {pages['join'][0]:>9.2f} {pages['counted'][0]:>11.2f} {pages['column'][0]:>10.2f}")
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Load-test the DB connection pool at 50-200 concurrent users.
+
+A small Flask app gets the pool exactly as app.py wires it (one connection
+per request via connection_pool.connection(), returned on teardown). Every
+request runs --queries statements. One in twenty handlers raises after
+querying, without closing its connection, to show the teardown returns it
+anyway. Each of --users threads sends --requests requests through its own
+test client. These configurations are compared:
+
+    legacy   size 5, no overflow, no waiting (what the mysql.connector
+             pool did: checkout fails as soon as all 5 are in use)
+    pool     DB_POOL_SIZE / DB_POOL_MAX_OVERFLOW / DB_POOL_TIMEOUT defaults
+    noreset  the same without the session reset on return
+
+For each run it prints throughput, request latency, failed requests
+(PoolTimeout or pool exhausted) and the pool's own metrics.
+
+By default a SQLite stand-in is used, with --query-ms and --connect-ms of
+simulated network/server time per statement and per new connection (a
+session reset is one statement). With --mysql each statement is
+SELECT SLEEP(--query-ms) against the configured database instead.
+
+Usage (from the repository root):
+    python -m benchmarks.db_pool
+    python -m benchmarks.db_pool --users 50 100 200 --requests 20 --query-ms 2
+    python -m benchmarks.db_pool --mysql --users 100
+"""
+import argparse
+import sqlite3
+import threading
+import time
+
+from flask import Flask, jsonify
+
+from backend.config.db_pool import ConnectionPool
+
+CONFIGS = {
+    'legacy': {'size': 5, 'max_overflow': 0, 'timeout': 0, 'reset_session': True},
+    'pool': {'size': 10, 'max_overflow': 10, 'timeout': 5, 'reset_session': True},
+    'noreset': {'size': 10, 'max_overflow': 10, 'timeout': 5, 'reset_session': False},
+}
+
+
+class SimulatedConnection:
+    """sqlite3 connection with a fixed delay per statement, standing in for a MySQL server over the network"""
+
+    def __init__(self, query_ms, connect_ms):
+        time.sleep(connect_ms / 1000)
+        self.query_delay = query_ms / 1000
+        self.connection = sqlite3.connect(':memory:', check_same_thread=False)
+
+    def cursor(self, *args, **kwargs):
+        return SimulatedCursor(self)
+
+    @property
+    def in_transaction(self):
+        return self.connection.in_transaction
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        time.sleep(self.query_delay)
+        self.connection.rollback()
+
+    def reset_session(self):
+        time.sleep(self.query_delay)
+        self.connection.rollback()
+
+    def ping(self, reconnect=False, attempts=1):
+        time.sleep(self.query_delay)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.connection.close()
+
+
+class SimulatedCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.connection.cursor()
+
+    def execute(self, sql, params=()):
+        time.sleep(self.connection.query_delay)
+        self.cursor.execute(sql, params)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def close(self):
+        self.cursor.close()
+
+
+def make_connect(args):
+    if args.mysql:
+        import mysql.connector
+        from backend.config.database import DB_CONFIG
+        return lambda: mysql.connector.connect(consume_results=True, **DB_CONFIG)
+    return lambda: SimulatedConnection(args.query_ms, args.connect_ms)
+
+
+def make_app(pool, args):
+    app = Flask(__name__)
+    pool.init_app(app)
+    statement = ('SELECT SLEEP(%s)', (args.query_ms / 1000,)) if args.mysql else ('SELECT 1', ())
+
+    @app.route('/work/<int:number>')
+    def work(number):
+        try:
+            connection = pool.connection()
+            cursor = connection.cursor()
+            for _ in range(args.queries):
+                cursor.execute(*statement)
+                cursor.fetchall()
+            if number % 20 == 0:
+                # Handler error before close(): teardown still returns the connection
+                raise Exception('handler failed')
+            cursor.close()
+            connection.close()
+            return jsonify({'ok': True}), 200
+        except Exception as e:
+            status = 503 if 'database connection' in str(e) else 500
+            return jsonify({'error': str(e)}), status
+
+    return app
+
+
+def run(config, users, args):
+    pool = ConnectionPool(make_connect(args), name=f'bench_{config}', **CONFIGS[config])
+    app = make_app(pool, args)
+    latencies, failures = [], [0]
+    lock = threading.Lock()
+
+    def user(index):
+        client = app.test_client()
+        own, failed = [], 0
+        for request_number in range(args.requests):
+            started = time.perf_counter()
+            response = client.get(f'/work/{index * args.requests + request_number + 1}')
+            own.append((time.perf_counter() - started) * 1000)
+            failed += response.status_code == 503
+        with lock:
+            latencies.extend(own)
+            failures[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    stats = pool.stats()
+    return {
+        'requests_per_s': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[min(len(latencies) - 1, int(round(0.99 * (len(latencies) - 1))))],
+        'failed': failures[0],
+        'requests': len(latencies),
+        'stats': stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DB connection pool load test')
+    parser.add_argument('--users', type=int, nargs='+', default=[50, 100, 200], help='Concurrent users per run')
+    parser.add_argument('--requests', type=int, default=20, help='Requests per user')
+    parser.add_argument('--queries', type=int, default=3, help='Statements per request')
+    parser.add_argument('--query-ms', type=float, default=2, help='Simulated (or SLEEP) time per statement')
+    parser.add_argument('--connect-ms', type=float, default=10, help='Simulated time to open a connection')
+    parser.add_argument('--configs', nargs='+', choices=sorted(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--mysql', action='store_true', help='Run against the configured MySQL database')
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests per user, {args.queries} statements of {args.query_ms} ms each")
+    print(f"{'users':>5} {'config':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'failed':>8} "
+          f"{'wait p99':>9} {'query p50':>10} {'peak':>5} {'opened':>7}")
+    for users in args.users:
+        for config in args.configs:
+            result = run(config, users, args)
+            stats = result['stats']
+            print(f"{users:>5} {config:>8} {result['requests_per_s']:>8.1f} {result['p50']:>8.1f} "
+                  f"{result['p99']:>8.1f} {result['failed']:>8} {stats['wait_ms']['p99'] or 0:>9.1f} "
+                  f"{stats['query_ms']['p50'] or 0:>10.2f} {stats['peak_in_use']:>5} {stats['opened']:>7}")
+            if stats['in_use']:
+                raise Exception(f"{stats['in_use']} connections still checked out after the run")
+
+
+if __name__ == '__main__':
+    main()
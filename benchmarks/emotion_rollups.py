@@ -0,0 +1,172 @@
+"""Load-test mood-over-time queries: raw emotion_history scans vs the rollups.
+
+Seeds one user with --rows detections spread over --days (plus rows for
+other users), writing the hour/day rollups through
+backend.persistence.rollups.record_detections as the history writer does.
+Then, for each (granularity, range) case, --threads threads each run
+--queries queries with random end dates:
+
+    raw     GROUP BY bucket, emotion over the user's raw rows in the range
+    rollup  rollups.timeline(): reads the stored hour/day buckets
+
+and the per-query latency and total throughput are printed. Both must
+agree on the detection count for the same range.
+
+A throwaway SQLite file stands in for MySQL (one connection per thread).
+
+Usage (from the repository root):
+    python -m benchmarks.emotion_rollups --rows 1000000 --days 365
+    python -m benchmarks.emotion_rollups --rows 200000 --threads 8 --queries 50
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from backend.persistence import rollups
+
+EMOTIONS = ('happy', 'sad', 'angry', 'fear', 'surprise', 'disgust', 'neutral')
+USER_ID = 1
+OTHER_USERS = 4
+CASES = (('hour', timedelta(days=2)), ('day', timedelta(days=30)), ('day', timedelta(days=365)),
+         ('week', timedelta(days=365)))
+# Bucket expressions for the raw scan (SQLite; weeks start on Monday)
+RAW_BUCKETS = {
+    'hour': "strftime('%Y-%m-%d %H:00:00', created_at)",
+    'day': "date(created_at)",
+    'week': "date(created_at, 'weekday 0', '-6 days')"
+}
+
+# Store datetimes as 'YYYY-MM-DD HH:MM:SS' text, as the default adapter does (deprecated since Python 3.12)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+
+
+def connect(path):
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+def seed(path, rows, days, batch=20000):
+    connection = connect(path)
+    connection.executescript("""
+        CREATE TABLE emotion_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            emotion VARCHAR(50) NOT NULL,
+            confidence FLOAT,
+            created_at TIMESTAMP NOT NULL
+        );
+        CREATE INDEX idx_user_created ON emotion_history (user_id, created_at, id);
+        CREATE TABLE emotion_rollups (
+            user_id INTEGER NOT NULL,
+            granularity TEXT NOT NULL,
+            bucket_start TIMESTAMP NOT NULL,
+            emotion VARCHAR(50) NOT NULL,
+            detections INTEGER NOT NULL DEFAULT 0,
+            confidence_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, granularity, bucket_start, emotion)
+        );
+    """)
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    step = (end - start) / rows
+    rng = random.Random(0)
+    cursor = connection.cursor()
+    total = rows * (1 + OTHER_USERS)
+    for offset in range(0, total, batch):
+        values = []
+        for i in range(offset, min(offset + batch, total)):
+            user_id = USER_ID if i % (1 + OTHER_USERS) == 0 else 100 + i % (1 + OTHER_USERS)
+            created_at = (start + step * (i // (1 + OTHER_USERS))).replace(microsecond=0)
+            values.append((user_id, rng.choice(EMOTIONS), round(rng.uniform(0.4, 1.0), 3), created_at))
+        cursor.executemany("INSERT INTO emotion_history (user_id, emotion, confidence, created_at) VALUES (?, ?, ?, ?)",
+                           values)
+        rollups.record_detections(cursor, values, dialect='sqlite')
+        connection.commit()
+    connection.close()
+    return end
+
+
+def raw_query(cursor, granularity, start, end):
+    bucket = RAW_BUCKETS[granularity]
+    cursor.execute(
+        f"""SELECT {bucket} AS bucket, emotion, COUNT(*), AVG(confidence) FROM emotion_history
+           WHERE user_id = ? AND created_at >= ? AND created_at < ?
+           GROUP BY bucket, emotion""",
+        (USER_ID, start, end)
+    )
+    return sum(row[2] for row in cursor.fetchall())
+
+
+def rollup_query(cursor, granularity, start, end):
+    buckets, _, _ = rollups.timeline(cursor, USER_ID, granularity, start, end, dialect='sqlite')
+    return sum(bucket['total'] for bucket in buckets)
+
+
+def load(path, query, granularity, span, latest, days, threads, queries):
+    """Run queries from threads threads; returns (sorted latencies in ms, queries per second)"""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        connection = connect(path)
+        cursor = connection.cursor()
+        own = []
+        for _ in range(queries):
+            end = latest - timedelta(days=rng.uniform(0, max(0, days - span.days)))
+            start, end = rollups.bucket_range(end - span, end, granularity)
+            started = time.perf_counter()
+            query(cursor, granularity, start, end)
+            own.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        with lock:
+            latencies.extend(own)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sorted(latencies), len(latencies) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Raw scan vs rollup analytics load test')
+    parser.add_argument('--rows', type=int, default=1000000, help='Detections for the benchmarked user')
+    parser.add_argument('--days', type=int, default=365, help='Days the detections are spread over')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=20, help='Queries per thread and case')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    started = time.perf_counter()
+    latest = seed(path, args.rows, args.days)
+    print(f"Seeded {args.rows} detections over {args.days} days for user {USER_ID} "
+          f"(+{args.rows * OTHER_USERS} for other users) in {time.perf_counter() - started:.1f} s")
+
+    # Same answer from both sides before timing anything
+    connection = connect(path)
+    for granularity, span in CASES:
+        start, end = rollups.bucket_range(latest - span, latest, granularity)
+        raw, rolled = raw_query(connection.cursor(), granularity, start, end), rollup_query(connection.cursor(), granularity, start, end)
+        if raw != rolled:
+            raise Exception(f"{granularity}/{span.days}d: raw scan counts {raw}, rollups {rolled}")
+    connection.close()
+
+    print(f"{args.threads} threads x {args.queries} queries per case")
+    print(f"{'case':>10} {'mode':>7} {'p50 ms':>9} {'p99 ms':>9} {'queries/s':>10}")
+    for granularity, span in CASES:
+        for name, query in (('raw', raw_query), ('rollup', rollup_query)):
+            latencies, throughput = load(path, query, granularity, span, latest, args.days, args.threads, args.queries)
+            p99 = latencies[min(len(latencies) - 1, int(round(0.99 * (len(latencies) - 1))))]
+            print(f"{granularity + '/' + str(span.days) + 'd':>10} {name:>7} {latencies[len(latencies) // 2]:>9.2f} "
+                  f"{p99:>9.2f} {throughput:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
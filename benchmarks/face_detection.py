@@ -0,0 +1,94 @@
+"""Compare per-frame face detection latency across detector backends.
+
+Usage (from the repository root):
+    python -m benchmarks.face_detection --backends haar,yunet --limit 500
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from backend.inference.face_detection import BACKENDS, create_face_detector
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(BASE_DIR, 'ml', 'data', 'raw', 'test')
+
+
+def load_frames(data_dir, limit, size):
+    """Load test images as BGR frames, optionally upscaled to size x size"""
+    paths = sorted(glob.glob(os.path.join(data_dir, '*', '*.jpg')))
+    if limit:
+        paths = paths[:limit]
+
+    frames = []
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        if size:
+            image = cv2.resize(image, (size, size))
+        frames.append(image)
+    return frames
+
+
+def run_backend(name, frames, repeat):
+    """Time detect() on every frame and return latency stats in ms"""
+    try:
+        detector = create_face_detector(name)
+    except Exception as e:
+        return {'backend': name, 'error': str(e)}
+
+    # Warm up
+    detector.detect(frames[0])
+
+    latencies = []
+    found = 0
+    for _ in range(repeat):
+        for frame in frames:
+            start = time.perf_counter()
+            faces = detector.detect(frame)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found += 1 if faces else 0
+
+    latencies = np.array(latencies)
+    return {
+        'backend': name,
+        'frames': len(latencies),
+        'detection_rate': found / len(latencies),
+        'mean_ms': latencies.mean(),
+        'p50_ms': np.percentile(latencies, 50),
+        'p99_ms': np.percentile(latencies, 99),
+        'fps': 1000.0 / latencies.mean()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Face detection backend benchmark')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--limit', type=int, default=1000, help='Number of images (0 = all)')
+    parser.add_argument('--size', type=int, default=240, help='Upscale frames to size x size (0 = native 48x48)')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    frames = load_frames(args.data_dir, args.limit, args.size)
+    if not frames:
+        print(f"No images found under {args.data_dir}")
+        return
+
+    print(f"Benchmarking {len(frames)} frames from {args.data_dir}")
+    print(f"{'backend':<10} {'frames':>7} {'found':>7} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'fps':>9}")
+    for name in args.backends.split(','):
+        result = run_backend(name.strip(), frames, args.repeat)
+        if 'error' in result:
+            print(f"{result['backend']:<10} skipped: {result['error']}")
+            continue
+        print(f"{result['backend']:<10} {result['frames']:>7} {result['detection_rate']:>7.1%} "
+              f"{result['mean_ms']:>9.3f} {result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} {result['fps']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Bytes on the wire and server CPU per frame: base64 JSON vs raw binary body.
+
+json    {"image": "data:image/jpeg;base64,..."} to /detect-webcam: JSON parse,
+        base64 decode, then imdecode
+binary  raw JPEG/WebP body to /detect-frame: imdecode straight from the body
+
+Frames are test images upscaled to a webcam-like resolution and re-encoded.
+Only the ingestion and decode work is timed; detection and inference are the
+same for both paths.
+
+Usage (from the repository root):
+    python -m benchmarks.frame_ingestion --frames 200 --format jpeg
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from backend.inference.frames import decode_data_url, decode_image_buffer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(BASE_DIR, 'ml', 'data', 'raw', 'test')
+
+ENCODINGS = {
+    'jpeg': ('.jpg', 'image/jpeg', [cv2.IMWRITE_JPEG_QUALITY, 92]),
+    'webp': ('.webp', 'image/webp', [cv2.IMWRITE_WEBP_QUALITY, 90])
+}
+
+
+def encode_frames(data_dir, count, width, height, fmt):
+    extension, mime, params = ENCODINGS[fmt]
+    frames = []
+    for path in sorted(glob.glob(os.path.join(data_dir, '*', '*.jpg')))[:count]:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        ok, buffer = cv2.imencode(extension, cv2.resize(image, (width, height)), params)
+        if ok:
+            frames.append(buffer.tobytes())
+    return frames, mime
+
+
+def json_ingest(body):
+    data = json.loads(body)
+    return decode_data_url(data['image'])
+
+
+def binary_ingest(body):
+    return decode_image_buffer(body)
+
+
+def measure(ingest, bodies, repeat):
+    """CPU milliseconds per frame (process time, so waiting is not counted)"""
+    ingest(bodies[0])
+    start = time.process_time()
+    for _ in range(repeat):
+        for body in bodies:
+            if ingest(body) is None:
+                raise Exception("Frame failed to decode")
+    return (time.process_time() - start) / (repeat * len(bodies)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Frame ingestion benchmark')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--format', choices=list(ENCODINGS), default='jpeg')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    frames, mime = encode_frames(args.data_dir, args.frames, args.width, args.height, args.format)
+    if not frames:
+        print(f"No images found under {args.data_dir}")
+        return
+
+    json_bodies = [
+        json.dumps({'image': f"data:{mime};base64," + base64.b64encode(frame).decode('ascii')}).encode('utf-8')
+        for frame in frames
+    ]
+
+    json_bytes = np.mean([len(body) for body in json_bodies])
+    binary_bytes = np.mean([len(frame) for frame in frames])
+    json_cpu = measure(json_ingest, json_bodies, args.repeat)
+    binary_cpu = measure(binary_ingest, frames, args.repeat)
+
+    print(f"{len(frames)} {args.format} frames at {args.width}x{args.height}")
+    print(f"{'path':<8} {'bytes/frame':>12} {'cpu ms/frame':>13}")
+    print(f"{'json':<8} {json_bytes:>12.0f} {json_cpu:>13.3f}")
+    print(f"{'binary':<8} {binary_bytes:>12.0f} {binary_cpu:>13.3f}")
+    print(f"binary saves {1 - binary_bytes / json_bytes:.1%} bytes and {1 - binary_cpu / json_cpu:.1%} CPU per frame")
+
+
+if __name__ == '__main__':
+    main()
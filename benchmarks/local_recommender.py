@@ -0,0 +1,86 @@
+"""Time local recommendations (nearest neighbours over valence/energy).
+
+Builds a TrackIndex from --index (a CSV built by
+backend.music.build_track_index) or from --tracks synthetic tracks with
+uniform random features, then times random emotions with --exclude
+recently recommended ids per call, two ways:
+
+    ranked  TrackIndex.recommend(): walks the emotion's precomputed ranking
+    scan    a vectorized NumPy distance scan + argpartition per query
+
+Usage (from the repository root):
+    python -m benchmarks.local_recommender --tracks 100000 --queries 2000
+    python -m benchmarks.local_recommender --index cache/track_index.csv
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from backend.music.local_recommender import EMOTION_TARGETS, FEATURES, TrackIndex
+
+
+def synthetic_index(count, seed=0):
+    rng = np.random.default_rng(seed)
+    tracks = [{'id': f'synthetic{i:07d}', 'name': f'Song {i}', 'artist': 'Synthetic', 'album': ''} for i in range(count)]
+    return TrackIndex(tracks, rng.random((count, len(FEATURES)), dtype=np.float32))
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def scan(index, emotion, limit, exclude):
+    """Per-query alternative: rank only the tracks needed, from scratch every time"""
+    candidates = limit * 3
+    nearest = index.nearest(EMOTION_TARGETS[emotion], candidates + len(exclude))
+    picked = [index.tracks[i] for i in nearest if index.ids[i] not in exclude][:candidates]
+    return random.sample(picked, min(limit, len(picked)))
+
+
+def run(index, recommend, queries, limit, exclude_count):
+    # Disgust has no target (random tracks), so it is left out of the comparison
+    emotions = [emotion for emotion, target in EMOTION_TARGETS.items() if target]
+    latencies = []
+    for _ in range(queries):
+        exclude = set(random.sample(index.ids, exclude_count)) if exclude_count else set()
+        emotion = random.choice(emotions)
+        started = time.perf_counter()
+        tracks = recommend(index, emotion, limit, exclude)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert len(tracks) == min(limit, len(index))
+    latencies.sort()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local recommender latency benchmark')
+    parser.add_argument('--index', help='Track index CSV (default: synthetic tracks)')
+    parser.add_argument('--tracks', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--exclude', type=int, default=200, help='Excluded track ids per query')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = TrackIndex.load(args.index) if args.index else synthetic_index(args.tracks)
+    print(f"{len(index)} tracks loaded in {time.perf_counter() - started:.2f} s, "
+          f"limit {args.limit}, {args.exclude} excluded ids per query")
+
+    started = time.perf_counter()
+    for emotion in EMOTION_TARGETS:
+        index.ranking(emotion)
+    print(f"Emotion rankings built in {time.perf_counter() - started:.2f} s")
+
+    modes = [('ranked', lambda index, emotion, limit, exclude: index.recommend(emotion, limit, exclude=exclude)),
+             ('scan', scan)]
+    print(f"{'mode':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'queries/s':>10}")
+    for name, recommend in modes:
+        latencies = run(index, recommend, args.queries, args.limit, args.exclude)
+        print(f"{name:>7} {percentile(latencies, 50):>9.3f} {percentile(latencies, 99):>9.3f} "
+              f"{latencies[-1]:>9.3f} {1000.0 * len(latencies) / sum(latencies):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
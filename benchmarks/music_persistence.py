@@ -0,0 +1,205 @@
+"""Compare per-track INSERTs with the batched writes used by /api/music/recommend.
+
+Each request formats `limit` synthetic Spotify tracks and stores them,
+timed end to end (formatting, inserts, commit).
+
+    legacy  the old loop: repeated dict lookups and one execute() per track
+            into a wide table with every track detail on every row
+    bulk    format_tracks() + save_recommendations(): one catalog read, an
+            upsert into tracks of only the new or changed tracks, and one
+            multi-row insert into music_recommendations
+
+By default a throwaway SQLite file stands in for MySQL, with --rtt-ms of
+sleep per statement to model the network round trip to the database.
+--mysql runs against the configured MySQL database instead (DB_* settings,
+rows are written for --user-id and deleted afterwards; the legacy baseline
+uses a scratch table that is dropped at the end).
+
+Usage (from the repository root):
+    python -m benchmarks.music_persistence --limits 20,50,100
+    python -m benchmarks.music_persistence --mysql --user-id 1
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from backend.music.tracks import format_tracks, save_recommendations
+
+LEGACY_TABLE = 'bench_legacy_recommendations'
+LEGACY_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {LEGACY_TABLE} (
+        id INTEGER PRIMARY KEY {{autoincrement}},
+        user_id INTEGER NOT NULL,
+        emotion_history_id INTEGER,
+        track_name VARCHAR(500) NOT NULL,
+        artist_name VARCHAR(500),
+        track_id VARCHAR(255),
+        album_name VARCHAR(500),
+        preview_url TEXT,
+        spotify_url TEXT,
+        image_url TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def synthetic_tracks(count):
+    return [{
+        'id': f'bench-{i:06d}',
+        'name': f'Song {i}',
+        'artists': [{'name': f'Artist {i % 17}'}, {'name': f'Featured {i % 5}'}],
+        'album': {'name': f'Album {i % 11}', 'images': [{'url': f'https://i.scdn.co/image/{i:06d}'}]},
+        'preview_url': f'https://p.scdn.co/mp3-preview/{i:06d}' if i % 3 else None,
+        'external_urls': {'spotify': f'https://open.spotify.com/track/bench-{i:06d}'},
+        'duration_ms': 180000 + i
+    } for i in range(count)]
+
+
+def legacy_persist(cursor, user_id, tracks, dialect):
+    """The previous recommend_music loop, kept here as the baseline"""
+    values = ', '.join(['?' if dialect == 'sqlite' else '%s'] * 9)
+    formatted_tracks = []
+    for track in tracks:
+        track_id = track.get('id', '')
+        preview_url = track.get('preview_url')
+        track_data = {
+            'id': track_id,
+            'name': track.get('name', 'Unknown'),
+            'artist': ', '.join([artist.get('name', '') for artist in track.get('artists', [])]),
+            'album': track.get('album', {}).get('name', ''),
+            'preview_url': preview_url,
+            'spotify_url': track.get('external_urls', {}).get('spotify', ''),
+            'spotify_embed_url': f"https://open.spotify.com/embed/track/{track_id}" if track_id else None,
+            'image_url': track.get('album', {}).get('images', [{}])[0].get('url') if track.get('album', {}).get('images') else None,
+            'duration_ms': track.get('duration_ms', 0),
+            'has_preview': preview_url is not None
+        }
+        formatted_tracks.append(track_data)
+        cursor.execute(
+            f"""INSERT INTO {LEGACY_TABLE}
+               (user_id, emotion_history_id, track_name, artist_name, track_id,
+                album_name, preview_url, spotify_url, image_url)
+               VALUES ({values})""",
+            (user_id, None, track_data['name'], track_data['artist'], track_data['id'],
+             track_data['album'], track_data['preview_url'], track_data['spotify_url'], track_data['image_url'])
+        )
+    return formatted_tracks
+
+
+def bulk_persist(cursor, user_id, tracks, dialect):
+    formatted_tracks = format_tracks(tracks)
+    save_recommendations(cursor, user_id, None, formatted_tracks, dialect)
+    return formatted_tracks
+
+
+class LatencyCursor:
+    """Wrap a cursor and sleep rtt seconds per statement (a stand-in for network round trips)"""
+
+    def __init__(self, cursor, rtt):
+        self._cursor = cursor
+        self._rtt = rtt
+
+    def execute(self, *args):
+        if self._rtt:
+            time.sleep(self._rtt)
+        return self._cursor.execute(*args)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+def sqlite_connection(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(LEGACY_TABLE_SQL.format(autoincrement='AUTOINCREMENT') + """;
+        CREATE TABLE IF NOT EXISTS tracks (
+            track_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            artist TEXT,
+            album TEXT,
+            preview_url TEXT,
+            spotify_url TEXT,
+            image_url TEXT,
+            duration_ms INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS music_recommendations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            emotion_history_id INTEGER,
+            track_id TEXT NOT NULL REFERENCES tracks(track_id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    return connection
+
+
+def execute_mysql(connect, *statements):
+    connection = connect()
+    cursor = connection.cursor()
+    for statement in statements:
+        cursor.execute(*statement)
+    connection.commit()
+    cursor.close()
+    connection.close()
+
+
+def run(connect, dialect, persist, user_id, tracks, requests, rtt):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        connection = connect()
+        cursor = connection.cursor()
+        persist(LatencyCursor(cursor, rtt), user_id, tracks, dialect)
+        if rtt:
+            time.sleep(rtt)  # COMMIT round trip
+        connection.commit()
+        cursor.close()
+        connection.close()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='music_recommendations insert benchmark')
+    parser.add_argument('--limits', default='20,50,100')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per limit and mode')
+    parser.add_argument('--rtt-ms', type=float, default=0.5, help='Simulated round trip per statement (SQLite only)')
+    parser.add_argument('--mysql', action='store_true', help='Use the configured MySQL database')
+    parser.add_argument('--user-id', type=int, default=1, help='User the MySQL rows are written for')
+    args = parser.parse_args()
+
+    if args.mysql:
+        from backend.config.database import get_db_connection
+        connect, dialect, rtt = get_db_connection, 'mysql', 0.0
+        execute_mysql(connect, (LEGACY_TABLE_SQL.format(autoincrement='AUTO_INCREMENT'),))
+        print("Backend: MySQL")
+    else:
+        path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+        sqlite_connection(path).close()
+        connect, dialect, rtt = (lambda: sqlite_connection(path)), 'sqlite', args.rtt_ms / 1000.0
+        print(f"Backend: SQLite stand-in with {args.rtt_ms} ms per statement")
+
+    print(f"{'limit':>6} {'mode':>7} {'p50 ms':>9} {'p90 ms':>9} {'mean ms':>9}")
+    for limit in [int(value) for value in args.limits.split(',')]:
+        tracks = synthetic_tracks(limit)
+        results = {}
+        for name, persist in (('legacy', legacy_persist), ('bulk', bulk_persist)):
+            timings = sorted(run(connect, dialect, persist, args.user_id, tracks, args.requests, rtt))
+            results[name] = statistics.mean(timings)
+            print(f"{limit:>6} {name:>7} {timings[len(timings) // 2]:>9.2f} "
+                  f"{timings[int(len(timings) * 0.9)]:>9.2f} {results[name]:>9.2f}")
+        print(f"{'':>6} speedup {results['legacy'] / results['bulk']:>8.1f}x")
+
+    if args.mysql:
+        execute_mysql(
+            connect,
+            ("DELETE FROM music_recommendations WHERE user_id = %s AND track_id LIKE 'bench-%%'", (args.user_id,)),
+            ("DELETE FROM tracks WHERE track_id LIKE 'bench-%%'", ()),
+            (f"DROP TABLE {LEGACY_TABLE}",)
+        )
+
+if __name__ == '__main__':
+    main()
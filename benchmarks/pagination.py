@@ -0,0 +1,168 @@
+"""Compare OFFSET and keyset (cursor) pagination on a heavy user's history.
+
+Seeds one user with --rows emotion_history rows (several per second, so
+created_at ties are exercised) in a scratch table with the
+(user_id, created_at, id) index, then times fetching each of --pages:
+
+    offset  the old endpoints: COUNT(*) + ORDER BY created_at LIMIT n OFFSET m
+    keyset  backend.persistence.pagination: WHERE (created_at, id) < cursor
+            ORDER BY created_at DESC, id DESC LIMIT n + 1, no count
+
+Both modes must return the same rows for every page; the cursor for page N
+is taken from the last row of page N - 1, as a client would get it.
+
+By default a throwaway SQLite file stands in for MySQL. --mysql uses the
+configured database (DB_* settings) with a scratch table that is dropped at
+the end.
+
+Usage (from the repository root):
+    python -m benchmarks.pagination --rows 1000000 --pages 1,100,1000
+    python -m benchmarks.pagination --mysql --rows 1000000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from backend.persistence.pagination import PageCursor, keyset, paginate
+
+TABLE = 'bench_emotion_history'
+EMOTIONS = ('happy', 'sad', 'angry', 'fear', 'surprise', 'disgust', 'neutral')
+USER_ID = 1
+# Rows for other users, so the user_id prefix of the index matters
+OTHER_USERS = 4
+
+
+def create_table(cursor, dialect):
+    autoincrement = 'AUTOINCREMENT' if dialect == 'sqlite' else 'AUTO_INCREMENT'
+    cursor.execute(f"""
+        CREATE TABLE {TABLE} (
+            id INTEGER PRIMARY KEY {autoincrement},
+            user_id INTEGER NOT NULL,
+            emotion VARCHAR(50) NOT NULL,
+            confidence FLOAT,
+            detection_type VARCHAR(10),
+            created_at TIMESTAMP NOT NULL
+        )
+    """)
+    cursor.execute(f"CREATE INDEX idx_{TABLE}_user_created ON {TABLE} (user_id, created_at, id)")
+
+
+def seed(connection, dialect, rows, batch=10000):
+    placeholder = '?' if dialect == 'sqlite' else '%s'
+    cursor = connection.cursor()
+    started = datetime(2024, 1, 1)
+    total = rows * (1 + OTHER_USERS)
+    for start in range(0, total, batch):
+        values = []
+        for i in range(start, min(start + batch, total)):
+            user_id = USER_ID if i % (1 + OTHER_USERS) == 0 else 100 + i % (1 + OTHER_USERS)
+            created_at = started + timedelta(seconds=i // ((1 + OTHER_USERS) * 3))
+            values.append((user_id, EMOTIONS[i % len(EMOTIONS)], 0.9, 'webcam', created_at.strftime('%Y-%m-%d %H:%M:%S')))
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (user_id, emotion, confidence, detection_type, created_at) "
+            f"VALUES ({', '.join([placeholder] * 5)})",
+            values
+        )
+    connection.commit()
+    cursor.close()
+
+
+def fetch(cursor, sql, params):
+    cursor.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def offset_page(cursor, placeholder, page, limit):
+    count = fetch(cursor, f"SELECT COUNT(*) AS total FROM {TABLE} WHERE user_id = {placeholder}", (USER_ID,))
+    rows = fetch(
+        cursor,
+        f"""SELECT id, emotion, confidence, detection_type, created_at FROM {TABLE}
+            WHERE user_id = {placeholder} ORDER BY created_at DESC, id DESC
+            LIMIT {placeholder} OFFSET {placeholder}""",
+        (USER_ID, limit, (page - 1) * limit)
+    )
+    return rows, count[0]['total']
+
+
+def keyset_page(cursor, placeholder, page_cursor, limit):
+    where, params, order = keyset(page_cursor, placeholder=placeholder)
+    rows = fetch(
+        cursor,
+        f"""SELECT id, emotion, confidence, detection_type, created_at FROM {TABLE}
+            WHERE user_id = {placeholder}{where} ORDER BY {order} LIMIT {placeholder}""",
+        (USER_ID, *params, limit + 1)
+    )
+    return paginate(rows, limit, page_cursor)
+
+
+def timed(call, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OFFSET vs keyset pagination benchmark')
+    parser.add_argument('--rows', type=int, default=1000000, help='History rows for the benchmarked user')
+    parser.add_argument('--pages', default='1,10,100,1000')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per page (the median is shown)')
+    parser.add_argument('--mysql', action='store_true', help='Use the configured MySQL database')
+    args = parser.parse_args()
+
+    if args.mysql:
+        from backend.config.database import get_db_connection
+        connection, dialect, placeholder = get_db_connection(), 'mysql', '%s'
+        print("Backend: MySQL")
+    else:
+        path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+        connection, dialect, placeholder = sqlite3.connect(path), 'sqlite', '?'
+        print("Backend: SQLite stand-in")
+
+    cursor = connection.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    create_table(cursor, dialect)
+    started = time.perf_counter()
+    seed(connection, dialect, args.rows)
+    print(f"Seeded {args.rows} rows for user {USER_ID} (+{args.rows * OTHER_USERS} for other users) "
+          f"in {time.perf_counter() - started:.1f} s")
+
+    pages = sorted(int(value) for value in args.pages.split(','))
+    print(f"{'page':>6} {'offset ms':>10} {'keyset ms':>10} {'speedup':>8}")
+    try:
+        for page in pages:
+            # Walk the cursors to the page as a client would (untimed), from the OFFSET page before it
+            page_cursor = None
+            if page > 1:
+                previous, _ = offset_page(cursor, placeholder, page - 1, args.limit)
+                page_cursor = PageCursor.from_row(previous[-1], 'next')
+
+            (offset_rows, _), offset_ms = timed(lambda: offset_page(cursor, placeholder, page, args.limit), args.repeat)
+            (keyset_rows, pagination), keyset_ms = timed(
+                lambda: keyset_page(cursor, placeholder, page_cursor, args.limit), args.repeat)
+
+            if [row['id'] for row in offset_rows] != [row['id'] for row in keyset_rows]:
+                raise Exception(f"Page {page}: keyset rows differ from OFFSET rows")
+            if page_cursor is not None and pagination['prev_cursor']:
+                # Going back from this page must land on the page before it
+                back, _ = keyset_page(cursor, placeholder, PageCursor.decode(pagination['prev_cursor']), args.limit)
+                if back[-1]['id'] != page_cursor.id:
+                    raise Exception(f"Page {page}: prev cursor does not return page {page - 1}")
+
+            print(f"{page:>6} {offset_ms:>10.2f} {keyset_ms:>10.2f} {offset_ms / keyset_ms:>7.1f}x")
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        connection.commit()
+        cursor.close()
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Per-face preprocessing cost: legacy per-face path vs the shared batched path.
+
+legacy   crop from the BGR frame, cvtColor the crop, resize, divide by 255.0
+         (float64) and reshape, one face at a time (the old preprocess_image)
+batched  crop from the already-converted grayscale frame and resize/normalize
+         every face into reused float32 buffers (backend.inference.preprocessing)
+
+Usage (from the repository root):
+    python -m benchmarks.preprocessing --sizes 1,8,32,128,256
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from backend.inference.preprocessing import FacePreprocessor
+
+
+def legacy_preprocess(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    resized = cv2.resize(gray, (48, 48))
+    normalized = resized / 255.0
+    return normalized.reshape(1, 48, 48, 1)
+
+
+def make_frame(faces, face_size, seed=0):
+    """Synthetic BGR frame with `faces` face-sized boxes laid out in a grid"""
+    rng = np.random.default_rng(seed)
+    per_row = int(np.ceil(np.sqrt(faces)))
+    side = per_row * face_size
+    frame = rng.integers(0, 256, size=(side, side, 3), dtype=np.uint8)
+    boxes = [((i % per_row) * face_size, (i // per_row) * face_size, face_size, face_size) for i in range(faces)]
+    return frame, boxes
+
+
+def time_per_face(fn, faces, min_time):
+    """Average microseconds per face, repeating fn until min_time seconds have passed"""
+    fn()
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs / faces * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Face preprocessing micro-benchmark')
+    parser.add_argument('--sizes', default='1,2,4,8,16,32,64,128,256')
+    parser.add_argument('--face-size', type=int, default=120, help='Face box side in pixels')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Seconds per measurement')
+    args = parser.parse_args()
+
+    preprocessor = FacePreprocessor()
+    print(f"{'batch':>6} {'legacy us/face':>15} {'batched us/face':>16} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        frame, boxes = make_frame(size, args.face_size)
+
+        def legacy():
+            np.concatenate([legacy_preprocess(frame[y:y+h, x:x+w]) for (x, y, w, h) in boxes])
+
+        # The request path already has the grayscale frame from face detection
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        def batched():
+            preprocessor.faces(gray, boxes)
+
+        legacy_us = time_per_face(legacy, size, args.min_time)
+        batched_us = time_per_face(batched, size, args.min_time)
+        print(f"{size:>6} {legacy_us:>15.2f} {batched_us:>16.2f} {legacy_us / batched_us:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Replay a frame sequence through the result caches and count inference calls saved.
+
+Frames come from --frames-dir (sorted image files, e.g. a recorded webcam
+session) or are synthesized: a test face held still with sensor noise and
+small jitter, re-encoded as JPEG, with runs of byte-identical duplicates as
+sent by clients that re-post the same capture.
+
+Only detection and cache lookups run; a model call is counted for every face
+the caches cannot answer.
+
+Usage (from the repository root):
+    python -m benchmarks.result_cache --frames 300
+    python -m benchmarks.result_cache --frames-dir recordings/session1
+"""
+import argparse
+import glob
+import os
+
+import cv2
+import numpy as np
+
+from backend.inference.face_detection import create_face_detector
+from backend.inference.frames import decode_image_buffer
+from backend.inference.preprocessing import to_gray
+from backend.inference.result_cache import FACE_CACHE_TTL, ResultCache, content_key, face_key, face_thumbnail, same_face
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(BASE_DIR, 'ml', 'data', 'raw', 'test')
+
+
+def load_recording(frames_dir):
+    paths = sorted(p for p in glob.glob(os.path.join(frames_dir, '*')) if p.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')))
+    frames = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            frames.append(f.read())
+    return frames
+
+
+def synthesize(count, detector, noise, jitter, duplicate_every, seed=0):
+    """Webcam-like sequence of a mostly still face on a 640x480 background"""
+    rng = np.random.default_rng(seed)
+    face = None
+    for path in sorted(glob.glob(os.path.join(DEFAULT_DATA_DIR, 'happy', '*.jpg'))):
+        candidate = cv2.resize(cv2.imread(path, cv2.IMREAD_COLOR), (200, 200))
+        if detector.detect(candidate):
+            face = candidate
+            break
+    if face is None:
+        raise Exception("No detectable face found in the test set")
+
+    frames = []
+    while len(frames) < count:
+        dx, dy = rng.integers(-jitter, jitter + 1, size=2) if jitter else (0, 0)
+        canvas = np.full((480, 640, 3), 96, dtype=np.uint8)
+        canvas[140 + dy:340 + dy, 220 + dx:420 + dx] = face
+        if noise:
+            canvas = np.clip(canvas + rng.normal(0, noise, canvas.shape), 0, 255).astype(np.uint8)
+        ok, buffer = cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        frames.append(buffer.tobytes())
+        # Occasionally the same capture is sent again byte for byte
+        if duplicate_every and len(frames) % duplicate_every == 0:
+            frames.append(frames[-1])
+    return frames[:count]
+
+
+def replay(frames, detector, payload_cache, face_cache):
+    counts = {'frames': len(frames), 'payload_hits': 0, 'faces': 0, 'face_hits': 0, 'inference_calls': 0, 'no_face': 0}
+    for frame in frames:
+        key = content_key(frame, False)
+        if payload_cache.get(key) is not None:
+            counts['payload_hits'] += 1
+            continue
+
+        image = decode_image_buffer(frame)
+        gray = to_gray(image)
+        faces = detector.detect(image, gray)[:1]
+        if not faces:
+            counts['no_face'] += 1
+            continue
+
+        counts['faces'] += 1
+        fkey = face_key(gray, faces[0], 'replay')
+        thumbnail = face_thumbnail(gray, faces[0])
+        if face_cache.get(fkey, lambda cached: same_face(cached, thumbnail)) is not None:
+            counts['face_hits'] += 1
+        else:
+            counts['inference_calls'] += 1
+            face_cache.put(fkey, thumbnail)
+        payload_cache.put(key, True)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Result cache replay benchmark')
+    parser.add_argument('--frames-dir', help='Directory of recorded frames (default: synthesize)')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--noise', type=float, default=2.0, help='Gaussian sensor noise sigma')
+    parser.add_argument('--jitter', type=int, default=1, help='Max face jitter in pixels')
+    parser.add_argument('--duplicate-every', type=int, default=5, help='Insert a byte-identical repeat every N frames (0 = never)')
+    parser.add_argument('--cache-size', type=int, default=1024)
+    parser.add_argument('--ttl', type=float, default=30, help='Payload cache TTL')
+    parser.add_argument('--face-ttl', type=float, default=FACE_CACHE_TTL, help='Face cache TTL')
+    args = parser.parse_args()
+
+    detector = create_face_detector()
+    if args.frames_dir:
+        frames = load_recording(args.frames_dir)
+    else:
+        frames = synthesize(args.frames, detector, args.noise, args.jitter, args.duplicate_every)
+    if not frames:
+        print("No frames to replay")
+        return
+
+    face_cache = ResultCache(args.cache_size, args.face_ttl)
+    counts = replay(frames, detector, ResultCache(args.cache_size, args.ttl), face_cache)
+    baseline = counts['frames'] - counts['no_face']
+    saved = baseline - counts['inference_calls']
+
+    print(f"Replayed {counts['frames']} frames ({counts['no_face']} without a face)")
+    print(f"  payload cache hits:  {counts['payload_hits']}  (decode, detection and inference skipped)")
+    print(f"  face cache hits:     {counts['face_hits']}  (inference skipped, "
+          f"{face_cache.stats()['rejections']} hash matches rejected as a different crop)")
+    print(f"  inference calls:     {counts['inference_calls']} instead of {baseline}")
+    if baseline:
+        print(f"  inference saved:     {saved} ({saved / baseline:.1%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Exercise the Spotify client against a local stub server.
+
+Starts a keep-alive HTTP/1.1 stub of api.spotify.com and the accounts
+service on localhost, then compares:
+
+    bare    requests.get() per call (a new TCP connection every time,
+            as music_routes did before)
+    pooled  the shared SpotifyClient (keep-alive connection pool)
+
+--handshake-ms adds a delay to every new connection on the stub, standing
+in for the TCP + TLS handshake to the real API. --error-rate makes the stub
+answer that fraction of calls with 429 (Retry-After: 0) or 503, to check
+that the client retries them; the per-endpoint client metrics are printed
+at the end.
+
+Usage (from the repository root):
+    python -m benchmarks.spotify_client --calls 200 --threads 8 --handshake-ms 30
+    python -m benchmarks.spotify_client --error-rate 0.2
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from backend.music.spotify_client import SpotifyClient
+
+TRACKS = [{'id': f'stub{i:04d}', 'name': f'Song {i}', 'artists': [{'name': 'Stub'}], 'album': {'name': 'Stub'}}
+          for i in range(100)]
+
+
+def make_handler(handshake, error_rate, counters):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are separate writes; without this Nagle + delayed ACK adds ~40 ms
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            counters['connections'] += 1
+            if handshake:
+                time.sleep(handshake)
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, headers=()):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _maybe_fail(self):
+            if error_rate and random.random() < error_rate:
+                counters['errors'] += 1
+                if random.random() < 0.5:
+                    self._send(429, {'error': 'rate limited'}, [('Retry-After', '0')])
+                else:
+                    self._send(503, {'error': 'unavailable'})
+                return True
+            return False
+
+        def do_GET(self):
+            if self._maybe_fail():
+                return
+            if self.path.startswith('/v1/recommendations'):
+                self._send(200, {'tracks': TRACKS})
+            elif self.path.startswith('/v1/search'):
+                self._send(200, {'tracks': {'items': TRACKS[:50]}})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self._maybe_fail():
+                return
+            self._send(200, {'access_token': 'stub-token', 'token_type': 'Bearer', 'expires_in': 3600})
+
+    return StubHandler
+
+
+def timed(calls, threads, call):
+    failures = []
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            call()
+        except requests.exceptions.RequestException as e:
+            failures.append(e)
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = sorted(pool.map(one, range(calls)))
+    elapsed = time.perf_counter() - started
+    return latencies, calls / elapsed, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Spotify client stub benchmark')
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--handshake-ms', type=float, default=30, help='Delay per new connection on the stub')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stub responses that are 429/503')
+    parser.add_argument('--pool-size', type=int, default=10)
+    args = parser.parse_args()
+
+    counters = {'connections': 0, 'errors': 0}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.handshake_ms / 1000.0, args.error_rate, counters))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    client = SpotifyClient(api_url=f'{base}/v1', accounts_url=f'{base}/api/token', pool_size=args.pool_size,
+                           backoff_base=0.01)
+    token = client.request_token('id', 'secret')['access_token']
+
+    def bare():
+        response = requests.get(f'{base}/v1/recommendations', headers={'Authorization': f'Bearer {token}'},
+                                params={'seed_genres': 'pop', 'limit': 100}, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    def pooled():
+        return client.get('/recommendations', token, {'seed_genres': 'pop', 'limit': 100})
+
+    modes = [('pooled', pooled)] if args.error_rate else [('bare', bare), ('pooled', pooled)]
+    print(f"{args.calls} calls, {args.threads} threads, {args.handshake_ms} ms handshake, error rate {args.error_rate}")
+    print(f"{'mode':>7} {'p50 ms':>9} {'p90 ms':>9} {'mean ms':>9} {'calls/s':>9} {'connections':>12} {'failed':>7}")
+    for name, call in modes:
+        before = counters['connections']
+        latencies, throughput, failed = timed(args.calls, args.threads, call)
+        print(f"{name:>7} {latencies[len(latencies) // 2]:>9.2f} {latencies[int(len(latencies) * 0.9)]:>9.2f} "
+              f"{statistics.mean(latencies):>9.2f} {throughput:>9.1f} {counters['connections'] - before:>12} {failed:>7}")
+
+    print(f"Stub errors injected: {counters['errors']}")
+    print(json.dumps(client.stats(), indent=2))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Measure API worker cold start with eager vs lazy model loading.
+
+Each scenario runs in a fresh interpreter and reports the time until the
+route modules are importable, the time until the model is ready, whether
+TensorFlow ended up imported and the peak resident memory.
+
+    eager       import emotion routes and load the model before serving
+                (the old import-time load_model() behaviour)
+    lazy        import emotion routes only; model loads on first detection
+    no-emotion  auth/music/profile routes only (API_BLUEPRINTS without emotion)
+
+Usage (from the repository root, with the same DB settings as the app):
+    python -m benchmarks.startup --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+modules = sys.argv[1].split(',')
+load = sys.argv[2] == '1'
+import importlib
+for name in modules:
+    importlib.import_module('backend.routes.%s_routes' % name)
+imported = time.perf_counter() - start
+if load:
+    from backend.routes import emotion_routes
+    emotion_routes.load_model()
+ready = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'import_s': imported,
+    'ready_s': ready,
+    'tensorflow': 'tensorflow' in sys.modules,
+    'max_rss_mb': rss / 1024.0 if sys.platform != 'darwin' else rss / 1024.0 / 1024.0
+}))
+'''
+
+SCENARIOS = {
+    'eager': ('auth,emotion,music,profile', True),
+    'lazy': ('auth,emotion,music,profile', False),
+    'no-emotion': ('auth,music,profile', False)
+}
+
+
+def run_scenario(modules, load):
+    env = dict(os.environ, MODEL_WARMUP='lazy')
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, modules, '1' if load else '0'],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    # Route modules may print while loading; the result is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API worker cold-start benchmark')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    args = parser.parse_args()
+
+    print(f"{'scenario':<12} {'import s':>9} {'ready s':>9} {'max RSS MB':>11} {'tensorflow':>11}")
+    for name in args.scenarios.split(','):
+        modules, load = SCENARIOS[name.strip()]
+        try:
+            runs = [run_scenario(modules, load) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<12} failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        print(f"{name:<12} {statistics.median(r['import_s'] for r in runs):>9.3f} "
+              f"{statistics.median(r['ready_s'] for r in runs):>9.3f} "
+              f"{statistics.median(r['max_rss_mb'] for r in runs):>11.1f} "
+              f"{str(runs[-1]['tensorflow']):>11}")
+
+
+if __name__ == '__main__':
+    main()
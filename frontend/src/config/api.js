@@ -11,6 +11,7 @@ export const API_ENDPOINTS = {
   // Emotion
   DETECT_IMAGE: `${API_BASE_URL}/emotion/detect-image`,
   DETECT_WEBCAM: `${API_BASE_URL}/emotion/detect-webcam`,
+  DETECT_FRAME: `${API_BASE_URL}/emotion/detect-frame`,
   EMOTION_HISTORY: `${API_BASE_URL}/emotion/history`,
   EMOTION_STATS: `${API_BASE_URL}/emotion/stats`,
 
@@ -76,14 +76,9 @@ const Home = () => {
       canvas.toBlob(
         async (blob) => {
           try {
-            const base64 = await new Promise((resolve) => {
-              const reader = new FileReader();
-              reader.onloadend = () => resolve(reader.result);
-              reader.readAsDataURL(blob);
-            });
-
-            const response = await axios.post(API_ENDPOINTS.DETECT_WEBCAM, {
-              image: base64,
+            // Send the JPEG bytes as-is (no base64 data URL)
+            const response = await axios.post(API_ENDPOINTS.DETECT_FRAME, blob, {
+              headers: { "Content-Type": "image/jpeg" },
             });
             setEmotion(response.data.emotion);
             setConfidence(response.data.confidence);
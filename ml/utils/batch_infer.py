@@ -0,0 +1,163 @@
+# batch_infer.py
+# Offline batch emotion inference over an image directory tree (<data-dir>/<label>/*.jpg).
+#
+# Usage (from the repository root):
+#   python ml/utils/batch_infer.py --data-dir ml/data/raw/test --output ml/results/test_predictions.csv
+#   python ml/utils/batch_infer.py --output ml/results/test_predictions.parquet --batch-size 512 --workers 8
+#   python ml/utils/batch_infer.py --packed ml/data/packed/test   # read a pack built by pack_dataset.py
+import argparse, csv, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np # pyright: ignore[reportMissingImports]
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from backend.inference.preprocessing import EMOTION_LABELS, get_preprocessor, read_face # noqa: E402
+
+# Label order shared with the backend (see backend/inference/preprocessing.py)
+CLASS_NAMES = EMOTION_LABELS
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def list_images(data_dir):
+    """Yield (path, label) for every image under data_dir/<label>/, label None for unknown folders"""
+    for root, _, files in os.walk(data_dir):
+        folder = os.path.basename(root).lower()
+        label = folder if folder in CLASS_NAMES else None
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name), label
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_batches(items, batch_size, workers):
+    """Decode images in a thread pool, keeping the next batch decoding while the current one is predicted"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = None
+        for chunk in chunked(items, batch_size):
+            futures = (chunk, [pool.submit(read_face, path) for path, _ in chunk])
+            if pending is not None:
+                yield collect(*pending)
+            pending = futures
+        if pending is not None:
+            yield collect(*pending)
+
+
+def collect(chunk, futures):
+    entries, faces, skipped = [], [], []
+    for (path, label), future in zip(chunk, futures):
+        face = future.result()
+        if face is None:
+            skipped.append(path)
+            continue
+        entries.append((path, label))
+        faces.append(face)
+    # Normalized into a reused float32 buffer, valid until the next batch is collected
+    batch = get_preprocessor().normalize(np.stack(faces)) if faces else None
+    return entries, batch, skipped
+
+
+def iter_packed_batches(split_dir, batch_size):
+    """Slice batches straight out of a packed split (see pack_dataset.py), no decoding"""
+    from pack_dataset import load_packed
+    images, labels, paths = load_packed(split_dir)
+    for start in range(0, len(paths), batch_size):
+        end = start + batch_size
+        entries = [(os.path.join(split_dir, path), CLASS_NAMES[label] if label >= 0 else None)
+                   for path, label in zip(paths[start:end], labels[start:end])]
+        batch = get_preprocessor().normalize(images[start:end])
+        yield entries, batch, []
+
+
+def write_results(rows, output):
+    header = ['path', 'label', 'predicted', 'confidence'] + [f'prob_{name}' for name in CLASS_NAMES]
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    if output.endswith('.parquet'):
+        import pandas as pd # requires pyarrow or fastparquet
+        pd.DataFrame(rows, columns=header).to_parquet(output, index=False)
+        return
+    with open(output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def print_report(confusion):
+    n = len(CLASS_NAMES)
+    total = confusion.sum()
+    if total == 0:
+        print("No labelled images, skipping accuracy report")
+        return
+
+    print("\nConfusion matrix (rows = true label, columns = predicted)")
+    print(f"{'':>10}" + ''.join(f"{name[:8]:>9}" for name in CLASS_NAMES))
+    for i in range(n):
+        print(f"{CLASS_NAMES[i]:>10}" + ''.join(f"{confusion[i, j]:>9d}" for j in range(n)))
+
+    print("\nPer-class accuracy (recall)")
+    for i in range(n):
+        support = confusion[i].sum()
+        acc = confusion[i, i] / support if support else float('nan')
+        print(f"  {CLASS_NAMES[i]:<10} {acc:>7.2%}  ({confusion[i, i]}/{support})")
+    print(f"Overall accuracy: {np.trace(confusion) / total:.2%} ({np.trace(confusion)}/{total})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch emotion inference over an image directory tree')
+    parser.add_argument('--data-dir', default=os.path.join('ml','data','raw','test'))
+    parser.add_argument('--model', default=os.path.join('ml','models','emotion_detection_model_final.keras'))
+    parser.add_argument('--output', default=os.path.join('ml','results','predictions.csv'), help='.csv or .parquet')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Decode threads')
+    parser.add_argument('--packed', help='Packed split directory to score instead of --data-dir')
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model # type: ignore
+    model = load_model(args.model)
+
+    rows, skipped = [], []
+    confusion = np.zeros((len(CLASS_NAMES), len(CLASS_NAMES)), dtype=np.int64)
+    predict_time = 0.0
+
+    if args.packed:
+        batches = iter_packed_batches(args.packed, args.batch_size)
+    else:
+        batches = iter_batches(list_images(args.data_dir), args.batch_size, args.workers)
+
+    start = time.perf_counter()
+    for entries, batch, bad in batches:
+        skipped.extend(bad)
+        if batch is None:
+            continue
+        t = time.perf_counter()
+        preds = model.predict_on_batch(batch)
+        predict_time += time.perf_counter() - t
+        preds = np.asarray(preds)
+
+        idx = preds.argmax(axis=1)
+        for (path, label), i, probs in zip(entries, idx, preds):
+            rows.append([path, label, CLASS_NAMES[i], float(probs[i])] + [float(p) for p in probs])
+            if label is not None:
+                confusion[CLASS_NAMES.index(label), i] += 1
+    elapsed = time.perf_counter() - start
+
+    write_results(rows, args.output)
+
+    print(f"Scored {len(rows)} images in {elapsed:.2f}s "
+          f"({len(rows) / elapsed if elapsed else 0:.1f} images/s, model {predict_time:.2f}s)")
+    if skipped:
+        print(f"Skipped {len(skipped)} unreadable files")
+    print(f"Results written to {args.output}")
+    print_report(confusion)
+
+
+if __name__ == '__main__':
+    main()
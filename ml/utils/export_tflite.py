@@ -0,0 +1,129 @@
+# export_tflite.py
+# Convert the Keras emotion model to a quantized TFLite model and check accuracy parity.
+#
+# Usage (from the repository root):
+#   python ml/utils/export_tflite.py --quantization int8      # calibrates on ml/data/raw/train
+#   python ml/utils/export_tflite.py --quantization float16
+#   python ml/utils/export_tflite.py --check-only --tflite ml/models/emotion_detection_model_int8.tflite
+#
+# Serve the result with INFERENCE_BACKEND=tflite (and TFLITE_MODEL_PATH if not the default path).
+import argparse, os, random, sys, time
+import numpy as np # pyright: ignore[reportMissingImports]
+from batch_infer import CLASS_NAMES, iter_batches, list_images
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from backend.inference.model_backends import TFLiteEmotionModel # noqa: E402
+from backend.inference.preprocessing import FacePreprocessor, read_face # noqa: E402
+
+
+def calibration_samples(train_dir, count, seed=0):
+    """Random, class-mixed sample of training faces for int8 range calibration"""
+    paths = [path for path, _ in list_images(train_dir)]
+    random.Random(seed).shuffle(paths)
+    preprocessor = FacePreprocessor(capacity=1)
+    samples = []
+    for path in paths:
+        face = read_face(path)
+        if face is not None:
+            samples.append(preprocessor.normalize(face[np.newaxis]).copy())
+        if len(samples) == count:
+            break
+    return samples
+
+
+def export(keras_path, output, quantization, train_dir, calibration_size):
+    import tensorflow as tf # type: ignore
+
+    model = tf.keras.models.load_model(keras_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        samples = calibration_samples(train_dir, calibration_size)
+        print(f"Calibrating int8 ranges on {len(samples)} training images")
+        converter.representative_dataset = lambda: ([sample] for sample in samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    tflite_model = converter.convert()
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'wb') as f:
+        f.write(tflite_model)
+
+    print(f"Wrote {output} ({len(tflite_model) / 1024:.1f} KB, "
+          f"Keras file {os.path.getsize(keras_path) / 1024:.1f} KB)")
+
+
+def check_parity(keras_path, tflite_path, test_dir, batch_size):
+    """Score the test set with both runtimes and compare predictions"""
+    from tensorflow import keras # type: ignore
+
+    keras_model = keras.models.load_model(keras_path)
+    tflite_model = TFLiteEmotionModel(tflite_path)
+
+    total = labeled = agree = keras_correct = tflite_correct = 0
+    max_diff = 0.0
+    keras_time = tflite_time = 0.0
+
+    for entries, batch, _ in iter_batches(list_images(test_dir), batch_size, os.cpu_count() or 4):
+        if batch is None:
+            continue
+        t = time.perf_counter()
+        keras_preds = np.asarray(keras_model.predict_on_batch(batch))
+        keras_time += time.perf_counter() - t
+
+        t = time.perf_counter()
+        tflite_preds = tflite_model.predict(batch)
+        tflite_time += time.perf_counter() - t
+
+        labels = np.array([CLASS_NAMES.index(label) if label else -1 for _, label in entries])
+        keras_idx, tflite_idx = keras_preds.argmax(axis=1), tflite_preds.argmax(axis=1)
+
+        total += len(entries)
+        labeled += int((labels >= 0).sum())
+        agree += int((keras_idx == tflite_idx).sum())
+        keras_correct += int((keras_idx == labels).sum())
+        tflite_correct += int((tflite_idx == labels).sum())
+        max_diff = max(max_diff, float(np.abs(keras_preds - tflite_preds).max()))
+
+    if not total:
+        print(f"No images found under {test_dir}")
+        return
+
+    print(f"\nParity on {total} test images ({labeled} labeled)")
+    print(f"  top-1 agreement:     {agree / total:.2%}")
+    # Accuracy only over images with a label (agreement above uses all of them)
+    if labeled:
+        print(f"  keras accuracy:      {keras_correct / labeled:.2%}")
+        print(f"  tflite accuracy:     {tflite_correct / labeled:.2%}")
+    else:
+        print("  accuracy:            n/a (no labeled images)")
+    print(f"  max |prob diff|:     {max_diff:.4f}")
+    print(f"  keras per face:      {keras_time / total * 1000:.3f} ms")
+    print(f"  tflite per face:     {tflite_time / total * 1000:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the emotion model to TFLite')
+    parser.add_argument('--keras', default=os.path.join('ml','models','emotion_detection_model_final.keras'))
+    parser.add_argument('--tflite', help='Output path (default: ml/models/emotion_detection_model_<quantization>.tflite)')
+    parser.add_argument('--quantization', choices=['int8', 'float16', 'none'], default='int8')
+    parser.add_argument('--train-dir', default=os.path.join('ml','data','raw','train'))
+    parser.add_argument('--test-dir', default=os.path.join('ml','data','raw','test'))
+    parser.add_argument('--calibration-size', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--check-only', action='store_true', help='Skip export, only run the parity check')
+    parser.add_argument('--skip-check', action='store_true')
+    args = parser.parse_args()
+
+    tflite_path = args.tflite or os.path.join('ml','models',f'emotion_detection_model_{args.quantization}.tflite')
+
+    if not args.check_only:
+        export(args.keras, tflite_path, args.quantization, args.train_dir, args.calibration_size)
+    if not args.skip_check:
+        check_parity(args.keras, tflite_path, args.test_dir, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# pack_dataset.py
+# Decode the FER image folders once into memory-mappable .npy arrays.
+#
+# For every split (<raw-dir>/<split>/<label>/*.jpg) this writes to <out-dir>/<split>/:
+#   images.npy    uint8 (N, 48, 48) grayscale faces
+#   labels.npy    int8  (N,) index into CLASS_NAMES (-1 for unknown folders)
+#   manifest.csv  index, path, label, size, mtime_ns  (path relative to the split folder)
+#
+# Re-running only decodes files that are new or changed since the last pack; unchanged
+# rows keep their index, so pure additions are appended at the end.
+#
+# Usage (from the repository root):
+#   python ml/utils/pack_dataset.py                      # packs train and test
+#   python ml/utils/pack_dataset.py --splits test --rebuild
+#
+# Loading:
+#   from pack_dataset import load_packed
+#   images, labels, paths = load_packed('ml/data/packed/test')   # images is a read-only memmap
+import argparse, csv, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np # pyright: ignore[reportMissingImports]
+from batch_infer import CLASS_NAMES, list_images
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from backend.inference.preprocessing import IMG_SIZE, read_face # noqa: E402
+
+MANIFEST_FIELDS = ['index', 'path', 'label', 'size', 'mtime_ns']
+
+
+def load_packed(split_dir, mmap_mode='r'):
+    """Open a packed split zero-copy: returns (images memmap, labels, relative paths)"""
+    images = np.load(os.path.join(split_dir, 'images.npy'), mmap_mode=mmap_mode)
+    labels = np.load(os.path.join(split_dir, 'labels.npy'))
+    paths = [row['path'] for row in read_manifest(split_dir)]
+    return images, labels, paths
+
+
+def read_manifest(split_dir):
+    path = os.path.join(split_dir, 'manifest.csv')
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row['index'] = int(row['index'])
+        row['size'] = int(row['size'])
+        row['mtime_ns'] = int(row['mtime_ns'])
+    return rows
+
+
+def scan(split_src):
+    """Current files in a split as manifest-style rows (without index)"""
+    rows = []
+    for path, label in list_images(split_src):
+        st = os.stat(path)
+        rows.append({
+            'path': os.path.relpath(path, split_src).replace(os.sep, '/'),
+            'label': label or '',
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns
+        })
+    return rows
+
+
+def pack_split(split_src, split_dir, workers, rebuild=False):
+    os.makedirs(split_dir, exist_ok=True)
+    current = scan(split_src)
+    old_rows = [] if rebuild else read_manifest(split_dir)
+    old_images = None
+    if old_rows and os.path.exists(os.path.join(split_dir, 'images.npy')):
+        old_images = np.load(os.path.join(split_dir, 'images.npy'), mmap_mode='r')
+    else:
+        old_rows = []
+
+    old_by_path = {row['path']: row for row in old_rows}
+    kept, fresh = [], []
+    for row in current:
+        old = old_by_path.get(row['path'])
+        if old is not None and old['size'] == row['size'] and old['mtime_ns'] == row['mtime_ns']:
+            kept.append((old['index'], row))
+        else:
+            fresh.append(row)
+    kept.sort(key=lambda item: item[0])
+
+    if not fresh and len(kept) == len(old_rows):
+        print(f"{split_dir}: up to date ({len(kept)} images)")
+        return
+
+    # Decode new/changed files in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        decoded = list(pool.map(read_face, [os.path.join(split_src, row['path']) for row in fresh]))
+    unreadable = [row['path'] for row, img in zip(fresh, decoded) if img is None]
+    fresh = [(row, img) for row, img in zip(fresh, decoded) if img is not None]
+
+    total = len(kept) + len(fresh)
+    tmp_images = os.path.join(split_dir, 'images.tmp.npy')
+    images = np.lib.format.open_memmap(tmp_images, mode='w+', dtype=np.uint8, shape=(total,) + IMG_SIZE)
+    labels = np.empty(total, dtype=np.int8)
+    rows = []
+
+    for i, (old_index, row) in enumerate(kept):
+        images[i] = old_images[old_index]
+        rows.append(row)
+    for i, (row, img) in enumerate(fresh, start=len(kept)):
+        images[i] = img
+        rows.append(row)
+    for i, row in enumerate(rows):
+        row['index'] = i
+        labels[i] = CLASS_NAMES.index(row['label']) if row['label'] in CLASS_NAMES else -1
+
+    images.flush()
+    del images, old_images
+
+    np.save(os.path.join(split_dir, 'labels.tmp.npy'), labels)
+    with open(os.path.join(split_dir, 'manifest.tmp.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    # Swap in the new files only once everything is written
+    os.replace(tmp_images, os.path.join(split_dir, 'images.npy'))
+    os.replace(os.path.join(split_dir, 'labels.tmp.npy'), os.path.join(split_dir, 'labels.npy'))
+    os.replace(os.path.join(split_dir, 'manifest.tmp.csv'), os.path.join(split_dir, 'manifest.csv'))
+
+    removed = len(old_rows) - len(kept)
+    print(f"{split_dir}: {total} images ({len(kept)} reused, {len(fresh)} decoded, {removed} removed)")
+    if unreadable:
+        print(f"  skipped {len(unreadable)} unreadable files")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack FER image folders into memory-mapped .npy arrays')
+    parser.add_argument('--raw-dir', default=os.path.join('ml','data','raw'))
+    parser.add_argument('--out-dir', default=os.path.join('ml','data','packed'))
+    parser.add_argument('--splits', default='train,test')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the existing pack and decode everything')
+    args = parser.parse_args()
+
+    for split in args.splits.split(','):
+        split = split.strip()
+        split_src = os.path.join(args.raw_dir, split)
+        if not os.path.isdir(split_src):
+            print(f"Skipping {split}: {split_src} not found")
+            continue
+        start = time.perf_counter()
+        pack_split(split_src, os.path.join(args.out_dir, split), args.workers, args.rebuild)
+        print(f"  took {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Query plan regression test for the activity feed (EXPLAIN against MySQL).
+
+Seeds a scratch database with enough rows that the optimizer's choices are
+the ones production gets, then runs backend.config.check_query_plans'
+checks: no full scans, the expected indexes, no temporary table or filesort.
+
+Skipped unless TEST_DB_NAME names a database the DB_* user may create and
+fill (it is created if missing and its tables are emptied first; never
+point it at the application database):
+
+    TEST_DB_NAME=emotune_plan_test python -m pytest tests/test_query_plans.py
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+TEST_DB_NAME = os.getenv('TEST_DB_NAME')
+if not TEST_DB_NAME:
+    pytest.skip('TEST_DB_NAME is not set (MySQL query plan test)', allow_module_level=True)
+if TEST_DB_NAME == os.getenv('DB_NAME', 'emotune'):
+    pytest.skip('TEST_DB_NAME must not be the application database', allow_module_level=True)
+
+connector = pytest.importorskip('mysql.connector')
+
+# The pool reads DB_NAME when the database module is first imported
+os.environ['DB_NAME'] = TEST_DB_NAME
+
+USERS = 5
+DETECTIONS_PER_USER = 4000
+EMOTIONS = ('happy', 'sad', 'angry', 'fear', 'surprise', 'disgust', 'neutral')
+TABLES = ('music_recommendations', 'tracks', 'emotion_rollups', 'user_emotion_counts', 'user_stats',
+          'emotion_history', 'user_sessions', 'users')
+
+
+@pytest.fixture(scope='module')
+def seeded():
+    from backend.config import database
+    from backend.persistence import rollups
+
+    # The tables below are truncated: never let that reach the application database (e.g. when
+    # backend.config.database was imported earlier in the session, before DB_NAME was set above)
+    assert database.DB_CONFIG['database'] == TEST_DB_NAME, \
+        f"DB_CONFIG points at {database.DB_CONFIG['database']!r}, not TEST_DB_NAME={TEST_DB_NAME!r}; refusing to seed it"
+
+    try:
+        server = connector.connect(**{k: v for k, v in database.DB_CONFIG.items() if k != 'database'})
+    except connector.Error as e:
+        pytest.skip(f'MySQL is not reachable: {e}')
+    server.cursor().execute(f"CREATE DATABASE IF NOT EXISTS `{TEST_DB_NAME}`")
+    server.close()
+
+    database.init_database()
+    connection = database.connection_pool.checkout()
+    cursor = connection.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in TABLES:
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+    rng = random.Random(0)
+    cursor.executemany("INSERT INTO users (id, name, email, password) VALUES (%s, %s, %s, %s)",
+                       [(user_id, f'user {user_id}', f'user{user_id}@example.com', 'x')
+                        for user_id in range(1, USERS + 1)])
+    cursor.executemany("INSERT INTO tracks (track_id, name) VALUES (%s, %s)",
+                       [(f'track-{i}', f'Track {i}') for i in range(200)])
+
+    start = datetime.now().replace(microsecond=0) - timedelta(days=60)
+    history_id = 0
+    for user_id in range(1, USERS + 1):
+        detections, recommendations = [], []
+        for i in range(DETECTIONS_PER_USER):
+            history_id += 1
+            created_at = start + timedelta(minutes=20 * i + user_id)
+            count = rng.randint(0, 3)
+            detections.append((history_id, user_id, rng.choice(EMOTIONS), rng.uniform(0.4, 1.0), created_at, count))
+            recommendations.extend((user_id, history_id, f'track-{rng.randrange(200)}') for _ in range(count))
+        cursor.executemany(
+            """INSERT INTO emotion_history (id, user_id, emotion, confidence, created_at, recommendations_count)
+               VALUES (%s, %s, %s, %s, %s, %s)""",
+            detections
+        )
+        cursor.executemany(
+            "INSERT INTO music_recommendations (user_id, emotion_history_id, track_id) VALUES (%s, %s, %s)",
+            recommendations
+        )
+        rollups.record_detections(cursor, [(user_id, emotion, confidence, created_at)
+                                           for _, user_id, emotion, confidence, created_at, _ in detections])
+    connection.commit()
+    for table in ('emotion_history', 'music_recommendations', 'emotion_rollups'):
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+    cursor.close()
+    connection.close()
+    return database
+
+
+def test_activity_feed_query_plans(seeded):
+    from backend.config.check_query_plans import explain_all, sample
+
+    connection = seeded.connection_pool.checkout()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        user_id, rows = sample(cursor, 1)
+        results = explain_all(cursor, user_id, rows)
+    finally:
+        cursor.close()
+        connection.close()
+
+    failures = {name: found for name, found, _ in results if found}
+    assert not failures, failures